@@ -0,0 +1,328 @@
+#! /usr/bin/env python
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Throughput benchmark of the detectors on standardized synthetic and real
+series of growing lengths. For each detector, series and length it reports:
+
+  - records per second of AnomalyDetector.run(), the way NAB runs detectors,
+    and the peak memory it allocates,
+  - p50, p99 and max latency of handleRecord() when the records are streamed
+    one by one, for the detectors handling single records,
+  - the growth exponent of the run() time with the length, about 1 for
+    linear and 2 for quadratic detectors.
+
+e.g.
+
+  python benchmarks/detectors/throughput.py -d null windowedGaussian knncad \\
+    --output benchmarks/results/detectors.json
+"""
+
+import argparse
+import contextlib
+import functools
+import importlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+import numpy
+import pandas
+
+from nab.benchmark_helpers import (compareResults,
+                                   estimateSeconds,
+                                   growthExponent,
+                                   measure,
+                                   writeResults)
+from nab.corpus import DataFile
+from nab.util import recur
+
+
+# Detectors by name, as in run.py. The Python 2 detectors need the Python 2
+# worker, see nab/detectors/python2.py
+DETECTORS = {
+  "bayesChangePt": ("nab.detectors.bayes_changept.bayes_changept_detector",
+                    "BayesChangePtDetector"),
+  "contextOSE": ("nab.detectors.context_ose.context_ose_detector",
+                 "ContextOSEDetector"),
+  "earthgeckoSkyline": (
+    "nab.detectors.earthgecko_skyline.earthgecko_skyline_detector",
+    "EarthgeckoSkylineDetector"),
+  "expose": ("nab.detectors.expose.expose_detector", "ExposeDetector"),
+  "htmcore": ("nab.detectors.htmcore.htmcore_detector", "HtmcoreDetector"),
+  "knncad": ("nab.detectors.knncad.knncad_detector", "KnncadDetector"),
+  "null": ("nab.detectors.null.null_detector", "NullDetector"),
+  "random": ("nab.detectors.random.random_detector", "RandomDetector"),
+  "randomCutForest": (
+    "nab.detectors.random_cut_forest.random_cut_forest_detector",
+    "RandomCutForestDetector"),
+  "relativeEntropy": (
+    "nab.detectors.relative_entropy.relative_entropy_detector",
+    "RelativeEntropyDetector"),
+  "skyline": ("nab.detectors.skyline.skyline_detector", "SkylineDetector"),
+  "threshold": ("nab.detectors.threshold.threshold_detector",
+                "ThresholdDetector"),
+  "windowedGaussian": ("nab.detectors.gaussian.windowedGaussian_detector",
+                       "WindowedGaussianDetector"),
+}
+PYTHON2_DETECTORS = ["numenta", "numentaTM", "htmjava"]
+
+# Real series of the NAB corpus, truncated to each length
+REAL_SERIES = ["realKnownCause/nyc_taxi.csv",
+               "realTweets/Twitter_volume_AAPL.csv"]
+
+PROBATIONARY_PERCENT = 0.15
+
+
+
+def randomWalk(numRows, rng):
+  """Gaussian random walk."""
+  return 100.0 + rng.normal(size=numRows).cumsum()
+
+
+def seasonal(numRows, rng):
+  """Daily and weekly seasonality of 5 minute records with noise and a few
+  spikes."""
+  t = numpy.arange(numRows)
+  values = (50.0 + 20.0 * numpy.sin(2 * numpy.pi * t / 288) +
+            5.0 * numpy.sin(2 * numpy.pi * t / 2016) +
+            rng.normal(scale=2.0, size=numRows))
+  spikes = rng.choice(numRows, size=max(1, numRows // 2000), replace=False)
+  values[spikes] += 40.0
+  return values
+
+
+SYNTHETIC_SERIES = {"randomWalk": randomWalk, "seasonal": seasonal}
+
+
+
+def getDetectorConstructor(name):
+  """Returns the constructor of a detector, or None if its dependencies are
+  not installed."""
+  if name in PYTHON2_DETECTORS:
+    from nab.detectors.python2 import Python2Detector
+    return functools.partial(Python2Detector, name)
+
+  moduleName, className = DETECTORS[name]
+  try:
+    module = importlib.import_module(moduleName)
+  except ImportError as e:
+    print("Skipping %s: %s" % (name, e))
+    return None
+  return getattr(module, className)
+
+
+def getSeries(name, numRows, dataDir, root, seed=0):
+  """Writes a series of numRows records to root and returns it as a DataFile,
+  or None if a real series is shorter than numRows."""
+  if name in SYNTHETIC_SERIES:
+    values = SYNTHETIC_SERIES[name](numRows, numpy.random.default_rng(seed))
+    data = pandas.DataFrame({
+      "timestamp": pandas.date_range("2015-01-01", periods=numRows,
+                                     freq="5min"),
+      "value": values})
+  else:
+    data = pandas.read_csv(os.path.join(dataDir, name))
+    if len(data) < numRows:
+      return None
+    data = data[:numRows]
+
+  path = os.path.join(root, "%s_%d.csv" % (name.replace("/", "_"), numRows))
+  data.to_csv(path, index=False)
+  return DataFile(path)
+
+
+def runDetector(detectorConstructor, dataSet):
+  """Returns a function running a new detector on dataSet."""
+  def run():
+    detector = detectorConstructor(dataSet=dataSet,
+                                   probationaryPercent=PROBATIONARY_PERCENT)
+    detector.initialize()
+    with contextlib.redirect_stdout(io.StringIO()):
+      return detector.run()
+  return run
+
+
+def recordLatencies(detectorConstructor, dataSet):
+  """Returns the seconds taken by handleRecord() for each record, or None if
+  the detector does not handle single records."""
+  detector = detectorConstructor(dataSet=dataSet,
+                                 probationaryPercent=PROBATIONARY_PERCENT)
+  detector.initialize()
+
+  records = dataSet.data.to_dict("records")
+  latencies = numpy.empty(len(records))
+  for i, record in enumerate(records):
+    start = time.perf_counter()
+    try:
+      detector.handleRecord(record)
+    except NotImplementedError:
+      return None
+    latencies[i] = time.perf_counter() - start
+  return latencies
+
+
+def main(args):
+  series = args.series or list(SYNTHETIC_SERIES) + REAL_SERIES
+
+  results = []
+  for detectorName in args.detectors:
+    detectorConstructor = getDetectorConstructor(detectorName)
+    if detectorConstructor is None:
+      continue
+
+    for seriesName in series:
+      timings = []
+      for numRows in sorted(args.lengths):
+        if timings and estimateSeconds(timings, numRows) > args.maxSeconds:
+          print("Skipping %s on %d records of %s, expected to take longer "
+                "than %s s" % (detectorName, numRows, seriesName,
+                               args.maxSeconds))
+          break
+
+        root = tempfile.mkdtemp()
+        try:
+          dataSet = getSeries(seriesName, numRows, args.dataDir, root)
+          if dataSet is None:
+            break
+
+          measured = measure(runDetector(detectorConstructor, dataSet),
+                             args.repeat)
+          timings.append((numRows, measured["seconds"]))
+          result = {
+            "detector": detectorName,
+            "series": seriesName,
+            "rows": numRows,
+            "seconds": measured["seconds"],
+            "recordsPerSecond": numRows / measured["seconds"],
+            "peakMemory": measured["peakMemory"],
+            "growthExponent": growthExponent(timings),
+            "latencyP50": None,
+            "latencyP99": None,
+            "latencyMax": None,
+          }
+
+          if not args.noLatency:
+            latencies = recordLatencies(detectorConstructor, dataSet)
+            if latencies is not None:
+              result["latencyP50"] = numpy.percentile(latencies, 50)
+              result["latencyP99"] = numpy.percentile(latencies, 99)
+              result["latencyMax"] = latencies.max()
+        finally:
+          shutil.rmtree(root)
+
+        results.append(result)
+        print("%-18s %-36s %7d rows %12.0f rec/s %8.1f MB  p50 %s  p99 %s"
+              % (detectorName, seriesName, numRows,
+                 result["recordsPerSecond"], result["peakMemory"] / 1e6,
+                 formatLatency(result["latencyP50"]),
+                 formatLatency(result["latencyP99"])))
+        sys.stdout.flush()
+
+  if args.output:
+    writeResults(args.output, results)
+    print("Results have been written to %s" % args.output)
+
+  if args.baseline:
+    with open(args.baseline) as baselineFile:
+      baseline = json.load(baselineFile)["results"]
+    regressions = compareResults(baseline, results, args.tolerance,
+                                 keys=("detector", "series", "rows"))
+    for key, baselineSeconds, seconds in regressions:
+      print("Regression of %s: %.4f s, was %.4f s"
+            % (key, seconds, baselineSeconds))
+    if regressions:
+      sys.exit(1)
+
+
+def formatLatency(seconds):
+  if seconds is None:
+    return "-"
+  return "%.1f us" % (seconds * 1e6)
+
+
+
+if __name__ == "__main__":
+  root = recur(os.path.dirname, os.path.realpath(__file__), 3)
+  parser = argparse.ArgumentParser()
+
+  parser.add_argument("-d", "--detectors",
+                      nargs="*",
+                      default=sorted(DETECTORS),
+                      choices=sorted(DETECTORS) + PYTHON2_DETECTORS,
+                      help="Detectors to benchmark, all the Python 3 ones by "
+                      "default.")
+
+  parser.add_argument("--series",
+                      nargs="*",
+                      help="Series to run the detectors on: %s or paths of "
+                      "data files relative to --dataDir. By default %s."
+                      % (", ".join(SYNTHETIC_SERIES),
+                         ", ".join(list(SYNTHETIC_SERIES) + REAL_SERIES)))
+
+  parser.add_argument("--lengths",
+                      nargs="*",
+                      type=int,
+                      default=[1000, 4000, 16000],
+                      help="Numbers of records of the series.")
+
+  parser.add_argument("--dataDir",
+                      default=os.path.join(root, "data"),
+                      help="Directory of the real series.")
+
+  parser.add_argument("--repeat",
+                      type=int,
+                      default=1,
+                      help="Number of timed runs, the fastest is reported.")
+
+  parser.add_argument("--maxSeconds",
+                      type=float,
+                      default=60.0,
+                      help="Lengths a detector is expected to take longer "
+                      "than this for, extrapolating from the shorter "
+                      "lengths, are skipped.")
+
+  parser.add_argument("--noLatency",
+                      default=False,
+                      action="store_true",
+                      help="Do not measure the latency of single records.")
+
+  parser.add_argument("--output",
+                      help="JSON file the results are written to.")
+
+  parser.add_argument("--baseline",
+                      help="JSON results of a previous run to compare with.")
+
+  parser.add_argument("--tolerance",
+                      type=float,
+                      default=1.25,
+                      help="Ratio of the baseline time above which a "
+                      "result is a regression.")
+
+  args = parser.parse_args()
+  main(args)
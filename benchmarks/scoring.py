@@ -0,0 +1,263 @@
+#! /usr/bin/env python
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Benchmarks of the scoring internals on synthetic corpora: throughput and peak
+memory of Sweeper.calcSweepScore, Sweeper.calcScoreByThreshold,
+optimizeThreshold, scoreCorpus, CorpusLabel construction and Corpus loading,
+for each number of records and label windows, e.g.
+
+  python benchmarks/scoring.py --sizes 1000 100000 --windows 0 100 \\
+    --output benchmarks/results/scoring.json
+
+A previous output can be given with --baseline, the benchmarks slower than
+tolerance times their baseline are then reported and the script fails.
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+from nab.benchmark_helpers import (compareResults,
+                                   estimateSeconds,
+                                   generateSeries,
+                                   measure,
+                                   windowIndices,
+                                   writeCorpus,
+                                   writeResults)
+from nab.corpus import Corpus
+from nab.labeler import CorpusLabel
+from nab.optimizer import optimizeThreshold
+from nab.scorer import scoreCorpus
+from nab.sweeper import Sweeper
+
+
+DETECTOR_NAME = "bench"
+PROBATIONARY_PERCENT = 0.15
+COST_MATRIX = {"tpWeight": 1.0,
+               "fnWeight": 1.0,
+               "fpWeight": 0.11,
+               "tnWeight": 1.0}
+
+# Benchmarks of a single data file, and of a corpus of numFiles files
+SERIES_BENCHMARKS = ["calcSweepScore", "calcScoreByThreshold"]
+CORPUS_BENCHMARKS = ["corpus", "corpusLabel", "optimizeThreshold",
+                     "scoreCorpus"]
+
+
+
+def quiet(function):
+  """Returns function, not printing to the standard output."""
+  def wrapper():
+    with contextlib.redirect_stdout(io.StringIO()):
+      return function()
+  return wrapper
+
+
+def seriesFunctions(numRows, numWindows):
+  """Returns the functions of SERIES_BENCHMARKS on a data file."""
+  data, windows = generateSeries(numRows, numWindows)
+  sweeper = Sweeper(probationPercent=PROBATIONARY_PERCENT,
+                    costMatrix=COST_MATRIX)
+  anomalyList = sweeper.calcSweepScore(data["timestamp"],
+                                       data["anomaly_score"],
+                                       windows,
+                                       "synthetic")
+  return {
+    "calcSweepScore": lambda: sweeper.calcSweepScore(data["timestamp"],
+                                                     data["anomaly_score"],
+                                                     windows,
+                                                     "synthetic"),
+    "calcScoreByThreshold": lambda: sweeper.calcScoreByThreshold(anomalyList),
+  }
+
+
+def corpusFunctions(root, numRows, numWindows, numFiles, pool):
+  """Returns the functions of CORPUS_BENCHMARKS on a corpus written to
+  root."""
+  dataDir, resultsDir, labelsPath = writeCorpus(
+    root, numRows, numWindows, numFiles, DETECTOR_NAME)
+  resultsDetectorDir = os.path.join(resultsDir, DETECTOR_NAME)
+
+  corpus = Corpus(dataDir)
+  corpusLabel = CorpusLabel(labelsPath, corpus)
+  resultsCorpus = Corpus(resultsDetectorDir)
+
+  return {
+    "corpus": lambda: Corpus(dataDir),
+    "corpusLabel": lambda: CorpusLabel(labelsPath, corpus),
+    "optimizeThreshold": quiet(lambda: optimizeThreshold(
+      (DETECTOR_NAME, COST_MATRIX, resultsCorpus, corpusLabel,
+       PROBATIONARY_PERCENT))),
+    "scoreCorpus": lambda: scoreCorpus(
+      0.5, (pool, DETECTOR_NAME, "standard", COST_MATRIX, resultsDetectorDir,
+            resultsCorpus, corpusLabel, PROBATIONARY_PERCENT, False)),
+  }
+
+
+def fits(numRows, numWindows, numFiles):
+  """Whether numWindows windows fit in numRows records, also when split in
+  numFiles files."""
+  try:
+    windowIndices(numRows, numWindows)
+    windowIndices(numRows // numFiles, numWindows // numFiles)
+  except ValueError:
+    return False
+  return True
+
+
+def main(args):
+  benchmarks = args.benchmarks or SERIES_BENCHMARKS + CORPUS_BENCHMARKS
+  pool = multiprocessing.Pool(args.numCPUs)
+
+  results = []
+  for numWindows in args.windows:
+    # (records, seconds) of each benchmark, benchmarks expected to take
+    # longer than maxSeconds are not run for larger sizes
+    timings = {name: [] for name in benchmarks}
+
+    for numRows in sorted(args.sizes):
+      if not fits(numRows, numWindows, args.numFiles):
+        print("Skipping %d windows in %d records" % (numWindows, numRows))
+        continue
+
+      names = [name for name in benchmarks
+               if not timings[name] or
+               estimateSeconds(timings[name], numRows) <= args.maxSeconds]
+      if not names:
+        break
+      functions = {}
+      root = tempfile.mkdtemp()
+      try:
+        if set(names) & set(SERIES_BENCHMARKS):
+          functions.update(seriesFunctions(numRows, numWindows))
+        if set(names) & set(CORPUS_BENCHMARKS):
+          functions.update(corpusFunctions(root, numRows, numWindows,
+                                           args.numFiles, pool))
+
+        for name in names:
+          measured = measure(functions[name], args.repeat)
+          result = {
+            "benchmark": name,
+            "rows": numRows,
+            "windows": numWindows,
+            "seconds": measured["seconds"],
+            "rowsPerSecond": numRows / measured["seconds"],
+            "peakMemory": measured["peakMemory"],
+          }
+          results.append(result)
+          print("%-22s %10d rows %5d windows %10.4f s %14.0f rows/s %8.1f MB"
+                % (name, numRows, numWindows, result["seconds"],
+                   result["rowsPerSecond"], result["peakMemory"] / 1e6))
+          sys.stdout.flush()
+
+          timings[name].append((numRows, measured["seconds"]))
+      finally:
+        shutil.rmtree(root)
+
+  pool.close()
+  pool.join()
+
+  if args.output:
+    writeResults(args.output, results)
+    print("Results have been written to %s" % args.output)
+
+  if args.baseline:
+    with open(args.baseline) as baselineFile:
+      baseline = json.load(baselineFile)["results"]
+    regressions = compareResults(baseline, results, args.tolerance,
+                                 keys=("benchmark", "rows", "windows"))
+    for key, baselineSeconds, seconds in regressions:
+      print("Regression of %s: %.4f s, was %.4f s"
+            % (key, seconds, baselineSeconds))
+    if regressions:
+      sys.exit(1)
+
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+
+  parser.add_argument("--benchmarks",
+                      nargs="*",
+                      choices=SERIES_BENCHMARKS + CORPUS_BENCHMARKS,
+                      help="Benchmarks to run, all of them by default.")
+
+  parser.add_argument("--sizes",
+                      nargs="*",
+                      type=int,
+                      default=[1000, 10000, 100000, 1000000, 10000000],
+                      help="Numbers of records of the synthetic corpora.")
+
+  parser.add_argument("--windows",
+                      nargs="*",
+                      type=int,
+                      default=[0, 10, 100, 1000],
+                      help="Numbers of label windows of the synthetic "
+                      "corpora. Sizes too small for them are skipped.")
+
+  parser.add_argument("--numFiles",
+                      type=int,
+                      default=10,
+                      help="Number of files the records and windows of the "
+                      "corpus benchmarks are split into.")
+
+  parser.add_argument("--repeat",
+                      type=int,
+                      default=3,
+                      help="Number of timed runs, the fastest is reported.")
+
+  parser.add_argument("--maxSeconds",
+                      type=float,
+                      default=60.0,
+                      help="Benchmarks are not run for sizes they are "
+                      "expected to take longer than this for, extrapolating "
+                      "from the smaller sizes.")
+
+  parser.add_argument("--numCPUs",
+                      type=int,
+                      default=None,
+                      help="Number of processes of scoreCorpus, all CPUs by "
+                      "default.")
+
+  parser.add_argument("--output",
+                      help="JSON file the results are written to.")
+
+  parser.add_argument("--baseline",
+                      help="JSON results of a previous run to compare with.")
+
+  parser.add_argument("--tolerance",
+                      type=float,
+                      default=1.25,
+                      help="Ratio of the baseline time above which a "
+                      "benchmark is a regression.")
+
+  args = parser.parse_args()
+  main(args)
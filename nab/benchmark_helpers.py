@@ -0,0 +1,257 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Helpers for the benchmarks in the benchmarks directory: timing and peak memory
+of a function, synthetic data sets, and JSON results that can be compared
+across commits.
+"""
+
+import datetime
+import gc
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy
+import pandas
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+from nab.util import createPath, strf
+
+
+
+def measure(function, repeat=3, maxSeconds=10.0):
+  """Times function and measures the peak memory it allocates.
+
+  The function is timed up to repeat times without tracing, then run once
+  more with tracemalloc to get its peak memory, which counts Python and numpy
+  allocations but not those of other processes.
+
+  @param function   (callable)  Function to measure, called without arguments.
+  @param repeat     (int)       Number of timed calls, the fastest is reported.
+  @param maxSeconds (float)     No more timed calls are made once they took
+                                this long in total.
+
+  @return (dict) "seconds" of the fastest call, "peakMemory" in bytes and
+                 the "result" of the last call.
+  """
+  times = []
+  for _ in range(repeat):
+    gc.collect()
+    start = time.perf_counter()
+    result = function()
+    times.append(time.perf_counter() - start)
+    del result
+    if sum(times) > maxSeconds:
+      break
+
+  gc.collect()
+  tracemalloc.start()
+  try:
+    result = function()
+    _, peak = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+
+  return {"seconds": min(times), "peakMemory": peak, "result": result}
+
+
+def growthExponent(timings):
+  """Returns the exponent of the growth of the time of a benchmark with the
+  number of records between its last two (records, seconds) timings, e.g. 1
+  for linear and 2 for quadratic time, or None if there is only one."""
+  if len(timings) < 2:
+    return None
+  (previousRows, previousSeconds), (rows, seconds) = timings[-2:]
+  return (math.log(seconds / previousSeconds) /
+          math.log(float(rows) / previousRows))
+
+
+def estimateSeconds(timings, numRows):
+  """Extrapolates the time of a benchmark for numRows records from its
+  (records, seconds) timings at smaller sizes, with their growthExponent()
+  bounded between linear and quadratic, or linear growth if there is only
+  one."""
+  rows, seconds = timings[-1]
+  exponent = growthExponent(timings)
+  exponent = 1.0 if exponent is None else min(2.0, max(1.0, exponent))
+  return seconds * (float(numRows) / rows) ** exponent
+
+
+def generateSeries(numRows, numWindows, seed=0, windowSize=0.1,
+                   probationaryPercent=0.15, start="2015-01-01",
+                   freq="5min"):
+  """Returns a synthetic data file with anomaly scores and label windows.
+
+  Windows are of equal length, together covering windowSize of the records
+  like NAB windows, and evenly spaced after the probationary period. Anomaly
+  scores are uniform, higher inside the windows.
+
+  @param numRows              (int)    Number of records.
+  @param numWindows           (int)    Number of label windows.
+  @param seed                 (int)    Seed of the values and anomaly scores.
+  @param windowSize           (float)  Fraction of the records in windows.
+  @param probationaryPercent  (float)  Fraction of the records before the
+                                       first window.
+  @param start                (string) First timestamp.
+  @param freq                 (string) Interval between timestamps.
+
+  @return (tuple) Contains:
+    data    (pandas.DataFrame)  "timestamp", "value", "anomaly_score" and
+                                "label" columns.
+    windows (list)              [start, end] timestamps of each window.
+  """
+  rng = numpy.random.default_rng(seed)
+  timestamps = pandas.date_range(start, periods=numRows, freq=freq)
+  windowStarts, windowLength = windowIndices(numRows, numWindows, windowSize,
+                                             probationaryPercent)
+
+  labels = numpy.zeros(numRows, dtype=int)
+  for first in windowStarts:
+    labels[first:first + windowLength] = 1
+
+  data = pandas.DataFrame({
+    "timestamp": timestamps,
+    "value": rng.normal(size=numRows).cumsum(),
+    "anomaly_score": rng.random(numRows) ** (2.0 - labels),
+    "label": labels,
+  })
+  windows = [[timestamps[first], timestamps[first + windowLength - 1]]
+             for first in windowStarts]
+  return data, windows
+
+
+def windowIndices(numRows, numWindows, windowSize=0.1,
+                  probationaryPercent=0.15):
+  """Returns the first record of each window and the length of the windows,
+  at least two records as the Sweeper requires.
+
+  @raise ValueError if the windows do not fit in the records after the
+         probationary period, with one record between consecutive windows.
+  """
+  if numWindows == 0:
+    return [], 0
+
+  windowLength = max(2, int(numRows * windowSize / numWindows))
+  first = int(numRows * probationaryPercent)
+  spacing = (numRows - first) // numWindows
+  if spacing <= windowLength:
+    raise ValueError("%d windows do not fit in %d records"
+                     % (numWindows, numRows))
+  return [first + i * spacing for i in range(numWindows)], windowLength
+
+
+def writeCorpus(root, numRows, numWindows, numFiles=10, detectorName="bench",
+                seed=0):
+  """Writes a synthetic corpus of numFiles files totalling numRows records,
+  with the results of a detector and their label windows, under root:
+  root/data, root/results/<detectorName> and root/labels/windows.json.
+
+  @return (tuple) Paths of the data directory, the results directory and
+                  the labels file.
+  """
+  dataDir = os.path.join(root, "data")
+  resultsDir = os.path.join(root, "results")
+  labelsPath = os.path.join(root, "labels", "windows.json")
+
+  allWindows = {}
+  for i in range(numFiles):
+    relativePath = "synthetic/series_%d.csv" % i
+    data, windows = generateSeries(numRows // numFiles, numWindows // numFiles,
+                                   seed=seed + i)
+
+    dataPath = os.path.join(dataDir, relativePath)
+    createPath(dataPath)
+    data[["timestamp", "value"]].to_csv(dataPath, index=False)
+
+    resultsPath = os.path.join(resultsDir, detectorName, "synthetic",
+                               "%s_series_%d.csv" % (detectorName, i))
+    createPath(resultsPath)
+    data.to_csv(resultsPath, index=False)
+
+    allWindows[relativePath] = [[strf(t1), strf(t2)] for t1, t2 in windows]
+
+  createPath(labelsPath)
+  with open(labelsPath, "w") as labelsFile:
+    json.dump(allWindows, labelsFile, indent=4, sort_keys=True)
+
+  return dataDir, resultsDir, labelsPath
+
+
+def environment():
+  """Returns a description of the machine and code the benchmarks ran on."""
+  try:
+    commit = subprocess.check_output(
+      ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+      cwd=os.path.dirname(os.path.realpath(__file__))).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    commit = None
+
+  return {
+    "commit": commit,
+    "date": datetime.datetime.now().isoformat(),
+    "python": sys.version.split()[0],
+    "numpy": numpy.__version__,
+    "pandas": pandas.__version__,
+    "platform": platform.platform(),
+    "processor": platform.processor(),
+    "cpuCount": os.cpu_count(),
+  }
+
+
+def writeResults(path, results):
+  """Writes benchmark results, with a description of the environment, to a
+  JSON file."""
+  createPath(path)
+  with open(path, "w") as outFile:
+    json.dump({"environment": environment(), "results": results}, outFile,
+              indent=2, sort_keys=True)
+
+
+def compareResults(baseline, results, tolerance=1.25, keys=("benchmark",)):
+  """Compares the throughput of results with a baseline.
+
+  @param baseline   (list)  Results of a previous run, as written by
+                            writeResults().
+  @param results    (list)  Results of this run.
+  @param tolerance  (float) Ratio of the baseline time above which a result is
+                            a regression.
+  @param keys       (tuple) Keys identifying a result, the same in both lists.
+
+  @return (list) (key, baseline seconds, seconds) of the regressions.
+  """
+  baselineSeconds = {tuple(r[k] for k in keys): r["seconds"]
+                     for r in baseline if r.get("seconds") is not None}
+  regressions = []
+  for result in results:
+    key = tuple(result[k] for k in keys)
+    if result.get("seconds") is None or key not in baselineSeconds:
+      continue
+    if result["seconds"] > tolerance * baselineSeconds[key]:
+      regressions.append((key, baselineSeconds[key], result["seconds"]))
+  return regressions
@@ -23,11 +23,186 @@ This contains the objects to store and manipulate a database of csv files.
 """
 
 import copy
+import hashlib
+import io
+import multiprocessing
 import os
 import pandas
+import tempfile
 
+from nab.labeler import windowIntervals
 from nab.util import (absoluteFilePaths,
-                      createPath)
+                      createPath,
+                      labelVector)
+
+# Transform of the data files of a corpus transform process
+_transform = None
+
+
+
+def dataFilePaths(srcRoot):
+  """
+  Relative paths of the CSV data files of a corpus directory, without reading
+  them.
+
+  @param srcRoot  (string)  Source directory of corpus.
+
+  @return         (list)    Relative paths, with "/" separators.
+  """
+  paths = []
+  for path in absoluteFilePaths(srcRoot):
+    if ".csv" in path:
+      paths.append(os.path.relpath(path, srcRoot).replace(os.path.sep, "/"))
+  return sorted(paths)
+
+
+def writeAtomically(path, content):
+  """Writes content to path through a temporary file in the same directory, so
+  that path never holds a partially written file. The file keeps the mode of
+  the file it replaces, or gets the default mode of new files."""
+  createPath(path)
+  if os.path.exists(path):
+    mode = os.stat(path).st_mode & 0o7777
+  else:
+    umask = os.umask(0)
+    os.umask(umask)
+    mode = 0o666 & ~umask
+
+  handle, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+  try:
+    with os.fdopen(handle, "wb") as tmpFile:
+      tmpFile.write(content)
+    os.chmod(tmpPath, mode)
+    os.replace(tmpPath, path)
+  except BaseException:
+    os.remove(tmpPath)
+    raise
+
+
+def _setTransform(transform):
+  """Initializer of the corpus transform processes."""
+  global _transform
+  _transform = transform
+
+
+def transformDataFile(args):
+  """
+  Function called in each corpus transform process to transform a data file.
+
+  The file is read with all its columns as strings, as they are in the file,
+  and written with its line terminators, so the values the transform does not
+  change are written back unchanged.
+  The transformed file is only written if its content hash differs from the
+  one of the destination file.
+
+  @param args   (tuple)   Relative path, source root and destination root.
+
+  @return       (tuple)   Relative path, whether the destination file was
+                          written and the SHA-256 digest of its content.
+  """
+  (relativePath, srcRoot, destRoot) = args
+
+  srcPath = os.path.join(srcRoot, relativePath)
+  destPath = os.path.join(destRoot, relativePath)
+
+  with open(srcPath, "rb") as srcFile:
+    content = srcFile.read()
+  data = pandas.read_csv(io.BytesIO(content), header=0, dtype=str,
+                         keep_default_na=False)
+
+  data = _transform(data, relativePath)
+  output = io.StringIO()
+  data.to_csv(output, index=False)
+  newContent = output.getvalue().encode("utf-8")
+  if b"\r\n" in content[:content.find(b"\n") + 1]:
+    newContent = newContent.replace(b"\n", b"\r\n")
+  if not content.endswith(b"\n"):
+    newContent = newContent.rstrip(b"\r\n")
+  digest = hashlib.sha256(newContent).hexdigest()
+
+  if destPath != srcPath:
+    content = None
+    if os.path.exists(destPath):
+      with open(destPath, "rb") as destFile:
+        content = destFile.read()
+
+  if content is not None and hashlib.sha256(content).hexdigest() == digest:
+    return relativePath, False, digest
+
+  writeAtomically(destPath, newContent)
+  return relativePath, True, digest
+
+
+def transformCorpus(srcRoot, transform, destRoot=None, relativePaths=None,
+                    numCPUs=None):
+  """
+  Applies a transform to the data files of a corpus directory in parallel,
+  without loading the corpus. Each file is read, transformed and written by a
+  pool process, see transformDataFile().
+
+  @param srcRoot        (string)    Source directory of corpus.
+
+  @param transform      (function)  Picklable function of the data of a file,
+                                    a pandas.DataFrame of strings, and of its
+                                    relative path, returning the new data.
+
+  @param destRoot       (string)    Directory of the transformed corpus, the
+                                    files are transformed in place by default.
+
+  @param relativePaths  (list)      Data files to transform, all by default.
+
+  @param numCPUs        (int)       Number of processes, all CPUs by default.
+
+  @return               (dict)      Relative paths mapped to whether their
+                                    transformed file was written, i.e. was not
+                                    already up to date.
+  """
+  if destRoot is None:
+    destRoot = srcRoot
+  if relativePaths is None:
+    relativePaths = dataFilePaths(srcRoot)
+
+  args = [(relativePath, srcRoot, destRoot) for relativePath in relativePaths]
+
+  pool = multiprocessing.Pool(numCPUs, _setTransform, (transform,))
+  try:
+    # Using `map_async` instead of `map` so interrupts are properly handled.
+    # See: http://stackoverflow.com/a/1408476
+    results = pool.map_async(transformDataFile, args).get(99999999)
+  finally:
+    pool.close()
+    pool.join()
+
+  return {relativePath: written for relativePath, written, _ in results}
+
+
+def sortRows(data, relativePath):
+  """Transform sorting the rows of a data file by timestamp, keeping the order
+  of the rows with the same timestamp."""
+  timestamps = pandas.to_datetime(data["timestamp"])
+  return data.iloc[timestamps.argsort(kind="mergesort").values]
+
+
+def removeColumns(data, relativePath, columnNames):
+  """Transform removing columns of a data file, if it has them."""
+  return data.drop(columns=[c for c in columnNames if c in data])
+
+
+def addLabels(data, relativePath, windows):
+  """Transform adding the label column of the anomaly windows to a data file,
+  1 in a window and 0 otherwise. Files without windows are left unchanged.
+
+  @param windows  (dict)  Relative paths mapped to the (start, end) timestamps
+                          of their windows, as in combined_windows.json.
+  """
+  if relativePath not in windows:
+    return data
+
+  intervals = windowIntervals(pandas.to_datetime(data["timestamp"]),
+                              windows[relativePath])
+  data = data.copy()
+  data["label"] = labelVector(intervals, len(data))
+  return data
 
 
 
@@ -211,6 +386,35 @@ class Corpus(object):
     self.numDataFiles = len(self.dataFiles)
 
 
+  def transform(self, transform, newRoot=None, numCPUs=None):
+    """
+    Applies a transform to the data files of the corpus in parallel, writing
+    them to newRoot or in place, see transformCorpus(). The data files
+    transformed in place are reloaded.
+
+    @param transform    (function)  Function of the data of a file, as strings,
+                                    and of its relative path, returning the
+                                    new data.
+
+    @param newRoot      (string)    Directory of the transformed corpus.
+
+    @param numCPUs      (int)       Number of processes, all CPUs by default.
+
+    @return             (dict)      Relative paths mapped to whether their
+                                    transformed file was written.
+    """
+    written = transformCorpus(self.srcRoot, transform, newRoot,
+                              sorted(self.dataFiles), numCPUs)
+
+    if newRoot is None:
+      for relativePath, changed in written.items():
+        if changed:
+          self.dataFiles[relativePath] = DataFile(
+            self.dataFiles[relativePath].srcPath)
+
+    return written
+
+
   def getDataSubset(self, query):
     """
     Get subset of the corpus given a query to match the datafile filename or
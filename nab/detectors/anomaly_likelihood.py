@@ -0,0 +1,190 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Anomaly likelihood of whole series of raw anomaly scores.
+
+Computes the same likelihoods as feeding the records one by one to
+AnomalyLikelihood.anomalyProbability() of NuPIC / htm.core: the moving average
+of the raw scores is compared to a normal distribution, re-estimated every
+reestimationPeriod records from a window of the previous moving averages.
+Since the likelihood does not change the raw scores, it is applied to the raw
+scores of whole data files, e.g. to the "raw_score" column of results files.
+
+Also imported by the Python 2 detectors, see python2.py.
+"""
+
+import math
+
+import numpy
+
+# Likelihoods above 1 - RED_THRESHOLD following another one are lowered to
+# 1 - YELLOW_THRESHOLD
+RED_THRESHOLD = 0.99999
+YELLOW_THRESHOLD = 0.999
+
+# Moving averages of metrics varying less than this are not anomalous
+METRIC_VARIANCE_THRESHOLD = 1.5e-5
+
+_erfc = numpy.vectorize(math.erfc, otypes=[float])
+
+
+
+def nabLikelihoodParameters(probationaryPeriod, reestimationPeriod=100):
+  """Returns the parameters of anomalyLikelihoods() used by the NAB HTM
+  detectors, learning during the first half of the probationary period and
+  estimating the distribution during the second.
+
+  @param probationaryPeriod (int)  Number of records of the probationary
+                                   period of the data file.
+  """
+  probationaryPeriod = int(probationaryPeriod)
+  learningPeriod = int(math.floor(probationaryPeriod / 2.0))
+  return {"learningPeriod": learningPeriod,
+          "estimationSamples": probationaryPeriod - learningPeriod,
+          "reestimationPeriod": reestimationPeriod}
+
+
+def anomalyLikelihoods(rawScores,
+                       values,
+                       learningPeriod=288,
+                       estimationSamples=100,
+                       historicWindowSize=8640,
+                       reestimationPeriod=100,
+                       averagingWindow=10):
+  """Returns the anomaly likelihood of each record.
+
+  @param rawScores          (numpy.ndarray)  Raw anomaly scores, in order.
+  @param values             (numpy.ndarray)  Metric values of the records.
+  @param learningPeriod     (int)  Number of first records not used to
+                                   estimate the distribution.
+  @param estimationSamples  (int)  Number of records used for the first
+                                   estimate, after the learning period. The
+                                   likelihood is 0.5 until it is made.
+  @param historicWindowSize (int)  Number of previous records the
+                                   distribution is estimated from.
+  @param reestimationPeriod (int)  The distribution is estimated again at each
+                                   multiple of this many records.
+  @param averagingWindow    (int)  Size of the moving average of raw scores.
+
+  @return (numpy.ndarray) Likelihoods, between 0 and 1.
+  """
+  rawScores = numpy.asarray(rawScores, dtype=float)
+  values = numpy.asarray(values, dtype=float)
+  probationaryPeriod = int(learningPeriod + estimationSamples)
+  if probationaryPeriod < 1:
+    raise ValueError("The likelihood needs at least one record to estimate "
+                     "its distribution")
+
+  numRecords = len(rawScores)
+  likelihoods = numpy.full(numRecords, 0.5)
+  if numRecords <= probationaryPeriod:
+    return likelihoods
+
+  averages = _movingAverage(rawScores, averagingWindow)
+
+  # First record of each span of records sharing a distribution
+  firstPeriod = -(-(probationaryPeriod + 1) // reestimationPeriod)
+  starts = [probationaryPeriod] + list(
+    range(firstPeriod * reestimationPeriod, numRecords, reestimationPeriod))
+  ends = starts[1:] + [numRecords]
+
+  red = 1.0 - RED_THRESHOLD
+  yellow = 1.0 - YELLOW_THRESHOLD
+  for start, end in zip(starts, ends):
+    mean, stdev = _estimateDistribution(rawScores, values, averages, start,
+                                        learningPeriod, historicWindowSize,
+                                        averagingWindow)
+    # The tail probability of the previous record is needed for filtering
+    tail = _tailProbability(averages[start - 1:end], mean, stdev)
+    previous, current = tail[:-1], tail[1:]
+    filtered = numpy.where((current <= red) & (previous <= red),
+                           yellow, current)
+    likelihoods[start:end] = 1.0 - filtered
+
+  return likelihoods
+
+
+def logLikelihoods(likelihoods):
+  """Returns log scaled likelihoods, like
+  AnomalyLikelihood.computeLogLikelihood(), so that 0.99999 gives 0.5."""
+  return (numpy.log(1.0000000001 - numpy.asarray(likelihoods)) /
+          -23.02585084720009)
+
+
+def setLikelihoodScores(results, **parameters):
+  """Sets the "anomaly_score" of results to the log likelihood of their
+  "raw_score".
+
+  @param results    (pandas.DataFrame)  Results of a detector, with "value",
+                                        "anomaly_score" and "raw_score"
+                                        columns.
+  @param parameters                     See anomalyLikelihoods().
+  """
+  likelihoods = anomalyLikelihoods(results["raw_score"].values,
+                                   results["value"].values,
+                                   **parameters)
+  results["anomaly_score"] = logLikelihoods(likelihoods)
+  return results
+
+
+def _movingAverage(scores, windowSize):
+  """Average of each score and the previous ones in a window of windowSize,
+  over fewer scores at the beginning."""
+  sums = numpy.convolve(scores, numpy.ones(windowSize))[:len(scores)]
+  counts = numpy.minimum(numpy.arange(1, len(scores) + 1), windowSize)
+  return sums / counts
+
+
+def _estimateDistribution(rawScores, values, averages, record, learningPeriod,
+                          historicWindowSize, averagingWindow):
+  """Returns the (mean, stdev) of the moving averages of the raw scores before
+  record, as estimated by AnomalyLikelihood when it reaches record."""
+  start = max(0, record - historicWindowSize)
+  windowAverages = averages[start:record].copy()
+  if start > 0:
+    # The moving average restarts at the beginning of the window
+    head = min(averagingWindow - 1, record - start)
+    windowAverages[:head] = (numpy.cumsum(rawScores[start:start + head]) /
+                             numpy.arange(1, head + 1))
+
+  # Skip the learning period, unless it is out of the window
+  skip = min(record, max(0, learningPeriod - start))
+  if record - start <= skip:
+    return _nullDistribution()
+  if values[start + skip:record].var() < METRIC_VARIANCE_THRESHOLD:
+    return _nullDistribution()
+
+  mean = max(windowAverages[skip:].mean(), 0.03)
+  variance = max(windowAverages[skip:].var(), 0.0003)
+  return mean, math.sqrt(variance)
+
+
+def _nullDistribution():
+  return 0.5, 1000.0
+
+
+def _tailProbability(x, mean, stdev):
+  """Probability of values above x, computed from the symmetrical value above
+  the mean for values below it."""
+  below = x < mean
+  x = numpy.where(below, 2 * mean - x, x)
+  tail = 0.5 * _erfc((x - mean) / stdev / 1.4142)
+  return numpy.where(below, 1.0 - tail, tail)
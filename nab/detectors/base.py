@@ -22,12 +22,14 @@
 from __future__ import print_function
 
 import abc
+import hashlib
 import os
 import pandas
+import struct
 import sys
 
 from datetime import datetime
-from nab.util import createPath, getProbationPeriod
+from nab.util import createPath, getProbationPeriod, labelVector
 
 # python 2/3 compatibility for ABC
 # see https://stackoverflow.com/questions/35673474/using-abc-abcmeta-in-a-way-it-is-compatible-both-with-python-2-7-and-python-3-5 
@@ -54,6 +56,49 @@ class AnomalyDetector(ABC):
     self.inputMin = self.dataSet.data["value"].min()
     self.inputMax = self.dataSet.data["value"].max()
 
+    # Identify the detection task for getSeedSequence(), set by setTask()
+    self.detectorName = self.__class__.__name__
+    self.relativePath = dataSet.fileName
+
+
+  def setTask(self, detectorName, relativePath):
+    """Sets the names of the detector and of the data file it runs on, from
+    which its random streams are derived.
+
+    @param detectorName   (string)  Name of the detector, e.g. "random".
+    @param relativePath   (string)  Path of the data file relative to the
+                                    corpus, e.g. "realKnownCause/nyc_taxi.csv".
+    """
+    self.detectorName = detectorName
+    self.relativePath = relativePath
+
+
+  def getSeedSequence(self, seed):
+    """Returns a numpy.random.SeedSequence derived from seed, the detector name
+    and the data file. Stochastic detectors should draw their random numbers
+    from it, e.g. with getRandomGenerator(), rather than from global random
+    states: their results then only depend on the task, not on which pool
+    worker runs it, the number of CPUs or the order of the files.
+
+    @param seed   (int)   Seed of the detector.
+    """
+    from numpy.random import SeedSequence
+
+    task = "%s:%s" % (self.detectorName,
+                      self.relativePath.replace(os.sep, "/"))
+    digest = hashlib.sha256(task.encode("utf-8")).digest()
+    return SeedSequence([seed] + list(struct.unpack("<8I", digest)))
+
+
+  def getRandomGenerator(self, seed):
+    """Returns a numpy.random.Generator of the stream of getSeedSequence().
+
+    @param seed   (int)   Seed of the detector.
+    """
+    import numpy
+
+    return numpy.random.default_rng(self.getSeedSequence(seed))
+
 
   def initialize(self):
     """Do anything to initialize your detector in before calling run.
@@ -134,8 +179,13 @@ def detectDataSet(args):
   given.
 
   @param args   (tuple)   Arguments to run a detector on a file and then
+                          write its results: index, detector, detector name,
+                          (first, last) row intervals of the windows of the
+                          file (see CorpusLabel.getLabels()), results
+                          directory and relative path of the file.
   """
-  (i, detectorInstance, detectorName, labels, outputDir, relativePath) = args
+  (i, detectorInstance, detectorName, labelIntervals, outputDir,
+   relativePath) = args
 
   relativeDir, fileName = os.path.split(relativePath)
   fileName =  detectorName + "_" + fileName
@@ -144,12 +194,13 @@ def detectDataSet(args):
 
   print("%s: Beginning detection with %s for %s" % \
                                                 (i, detectorName, relativePath))
+  detectorInstance.setTask(detectorName, relativePath)
   detectorInstance.initialize()
 
   results = detectorInstance.run()
 
   # label=1 for relaxed windows, 0 otherwise
-  results["label"] = labels
+  results["label"] = labelVector(labelIntervals, len(results))
 
   results.to_csv(outputPath, index=False)
 
@@ -18,7 +18,10 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
-from nab.detectors.context_ose.context_operator import ContextOperator
+from collections import deque
+
+from nab.detectors.context_ose.context_operator import (ContextOperator,
+                                                        activeContextKey)
 
 class ContextualAnomalyDetectorOSE(object):
 
@@ -56,7 +59,9 @@ class ContextualAnomalyDetectorOSE(object):
 
     self.potentialNewContexts = []
 
-    self.aScoresHistory = [ 1.0 ]
+    # Only the last restPeriod scores are ever looked at. A restPeriod below
+    # one keeps the whole history, as slicing with [-0:] did.
+    self.aScoresHistory = deque([ 1.0 ], maxlen = int(self.restPeriod) or None)
 
 
   def step(self, inpFacts):
@@ -90,8 +95,9 @@ class ContextualAnomalyDetectorOSE(object):
     else :
       percentSelectedContextActive = 0.0
 
-    srtAContexts = sorted(activeContexts, cmp=aContextsCMP)
-    activeNeurons = [ cInf[0] for cInf in srtAContexts[-self.maxActNeurons:] ]
+    srtAContexts = sorted(activeContexts, key=activeContextKey)
+    activeNeurons = [ context.id
+                      for context in srtAContexts[-self.maxActNeurons:] ]
 
     currNeurFacts = set([ 2 ** 31 + fact for fact in activeNeurons ])
 
@@ -128,7 +134,7 @@ class ContextualAnomalyDetectorOSE(object):
     anomalyVal1, anomalyVal2 = self.step(setOutSens)
     currentAnomalyScore = (1.0 - anomalyVal1 + anomalyVal2) / 2.0
 
-    if max(self.aScoresHistory[-int(self.restPeriod):]) < self.baseThreshold :
+    if max(self.aScoresHistory) < self.baseThreshold :
       returnedAnomalyScore = currentAnomalyScore
     else :
       returnedAnomalyScore = 0.0
@@ -136,12 +142,3 @@ class ContextualAnomalyDetectorOSE(object):
     self.aScoresHistory.append(currentAnomalyScore)
 
     return returnedAnomalyScore
-
-
-def aContextsCMP(x, y):
-  if cmp(x[1], y[1]) !=0 :
-    return cmp(x[1], y[1])
-  elif cmp(x[2], y[2]) !=0 :
-    return cmp(x[2], y[2])
-  else :
-    return cmp(x[3], y[3])
@@ -18,8 +18,58 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
+from array import array
+from operator import attrgetter
+
+import numpy
+
+
+
+class SemiContext(object):
+  """
+  Left or right part of a context.
+
+  id          (int)     Index of the semi-context in its side's lists.
+  offset      (int)     Position of its sorted facts in the side's facts pool.
+  contexts    (dict)    Left semi-contexts only: maps the ID of each right
+                        semi-context it is combined with to the context ID.
+  """
+  __slots__ = ("id", "offset", "contexts")
+
+  def __init__(self, semiContextID, offset, contexts=None):
+    self.id = semiContextID
+    self.offset = offset
+    self.contexts = contexts
+
+
+
+class Context(object):
+  """
+  A context stored in the context memory.
+
+  count      (int)   Number of times the context has been active.
+  zeroLevel  (int)   Flag set for contexts built from two consecutive inputs.
+  leftHash   (int)   Hash of the facts of the left semi-context.
+  rightHash  (int)   Hash of the facts of the right semi-context.
+  """
+  __slots__ = ("id", "count", "zeroLevel", "leftHash", "rightHash")
+
+  def __init__(self, contextID, zeroLevel, leftHash, rightHash):
+    self.id = contextID
+    self.count = 0
+    self.zeroLevel = zeroLevel
+    self.leftHash = leftHash
+    self.rightHash = rightHash
+
+
+
+# Order in which active contexts compete to become active neurons.
+activeContextKey = attrgetter("count", "leftHash", "rightHash")
+
+
+
 class ContextOperator(object):
-  
+
   """
   Contextual Anomaly Detector - Open Source Edition
   2016, Mikhail Smirnov   smirmik@gmail.com
@@ -33,7 +83,14 @@ class ContextOperator(object):
     self.factsDics = [{},{}]
     self.semiContextDics = [{},{}]
     self.semiContValLists = [[],[]]
-    self.crossedSemiContextsLists = [[],[]]
+    # Facts of all semi-contexts of a side, packed one after the other, and
+    # the number of facts of each semi-context. The arrays in factsDics hold
+    # the IDs of the semi-contexts containing each fact.
+    self.factsPools = [array("q"), array("q")]
+    self.semiContextLengths = [array("i"), array("i")]
+    # number of facts of each semi-context in the most recent crossing, by ID
+    self.crossedCounts = [numpy.zeros(0, dtype=numpy.intp)] * 2
+    self.crossedFactsSets = [frozenset(), frozenset()]
     self.contextsValuesList = []
 
     self.newContextID = False
@@ -69,55 +126,70 @@ class ContextOperator(object):
       leftHash = leftFacts.__hash__()
       rightHash = rightFacts.__hash__()
 
-      nextLeftSemiContextNumber = len(self.semiContextDics[0])
-      leftSemiContextID = self.semiContextDics[0].setdefault(
-        leftHash,
-        nextLeftSemiContextNumber
-      )
-      if leftSemiContextID == nextLeftSemiContextNumber :
-        leftSemiContVal = [[] , len(leftFacts), 0, {}]
-        self.semiContValLists[0].append(leftSemiContVal)
-        for fact in leftFacts :
-          semiContextList = self.factsDics[0].setdefault(fact, [])
-          semiContextList.append(leftSemiContVal)
-
-      nextRightSemiContextNumber = len(self.semiContextDics[1])
-      rightSemiContextID = self.semiContextDics[1].setdefault(
-        rightHash,
-        nextRightSemiContextNumber
-      )
-      if  rightSemiContextID == nextRightSemiContextNumber :
-        rightSemiContextValues = [[] , len(rightFacts), 0]
-        self.semiContValLists[1].append(rightSemiContextValues)
-        for fact in rightFacts :
-          semiContextList = self.factsDics[1].setdefault(fact, [])
-          semiContextList.append(rightSemiContextValues)
+      leftSemiContext = self._getSemiContext(0, leftHash, leftFacts)
+      rightSemiContext = self._getSemiContext(1, rightHash, rightFacts)
 
       nextFreeContextIDNumber = len(self.contextsValuesList)
-      contextID = self.semiContValLists[0][leftSemiContextID][3].setdefault(
-        rightSemiContextID,
+      contextID = leftSemiContext.contexts.setdefault(
+        rightSemiContext.id,
         nextFreeContextIDNumber
       )
 
       if contextID == nextFreeContextIDNumber :
         numAddedContexts += 1
-        contextValues = [0, zerolevel, leftHash, rightHash]
+        context = Context(contextID, zerolevel, leftHash, rightHash)
 
-        self.contextsValuesList.append(contextValues)
+        self.contextsValuesList.append(context)
         if zerolevel :
           self.newContextID = contextID
           return True
       else :
-        contextValues = self.contextsValuesList[contextID]
+        context = self.contextsValuesList[contextID]
 
         if zerolevel :
-          contextValues[1] = 1
+          context.zeroLevel = 1
           return False
 
 
     return numAddedContexts
 
 
+  def _getSemiContext(self, leftOrRight, factsHash, facts):
+    """Returns the semi-context stored under factsHash, creating it from
+    facts if it does not exist yet."""
+    semiContextDic = self.semiContextDics[leftOrRight]
+    semiContextID = semiContextDic.get(factsHash)
+    if semiContextID is not None:
+      return self.semiContValLists[leftOrRight][semiContextID]
+
+    semiContextID = len(semiContextDic)
+    semiContextDic[factsHash] = semiContextID
+    factsPool = self.factsPools[leftOrRight]
+    semiContext = SemiContext(semiContextID,
+                              len(factsPool),
+                              {} if leftOrRight == 0 else None)
+    self.semiContValLists[leftOrRight].append(semiContext)
+    self.semiContextLengths[leftOrRight].append(len(facts))
+    factsPool.extend(facts)
+    factsDic = self.factsDics[leftOrRight]
+    for fact in facts :
+      factIndex = factsDic.get(fact)
+      if factIndex is None :
+        factIndex = factsDic[fact] = array("i")
+      factIndex.append(semiContextID)
+    return semiContext
+
+
+  def crossedFacts(self, leftOrRight, semiContext):
+    """Returns the facts of semiContext present in the most recent crossing.
+    Facts lists are kept sorted, so they come out in crossing order."""
+    crossedFactsSet = self.crossedFactsSets[leftOrRight]
+    start = semiContext.offset
+    end = start + self.semiContextLengths[leftOrRight][semiContext.id]
+    return tuple(fact for fact in self.factsPools[leftOrRight][start:end]
+                 if fact in crossedFactsSet)
+
+
   def contextCrosser( self,
                       leftOrRight,
                       factsList,
@@ -130,23 +202,22 @@ class ContextOperator(object):
       else :
         numNewContexts = 0
 
-    for semiContextValues in self.crossedSemiContextsLists[leftOrRight] :
-      semiContextValues[0] = []
-      semiContextValues[2] = 0
-
-    for fact in factsList :
-      for semiContextValues in self.factsDics[leftOrRight].get(fact, []) :
-        semiContextValues[0].append(fact)
-
-    newCrossedValues = []
-
-    for semiContextValues in self.semiContValLists[leftOrRight] :
-      lenSemiContextValues0 = len(semiContextValues[0])
-      semiContextValues[2] = lenSemiContextValues0
-      if lenSemiContextValues0 > 0 :
-        newCrossedValues.append(semiContextValues)
+    # Count the crossed facts of every semi-context at once from the fact
+    # indices.
+    numSemiContexts = len(self.semiContValLists[leftOrRight])
+    factsDic = self.factsDics[leftOrRight]
+    factIndices = [numpy.frombuffer(factsDic[fact], dtype=numpy.int32)
+                   for fact in factsList if fact in factsDic]
+    if factIndices :
+      counts = numpy.bincount(numpy.concatenate(factIndices),
+                              minlength=numSemiContexts)
+    else :
+      counts = numpy.zeros(numSemiContexts, dtype=numpy.intp)
+    # release the buffers so the fact indices can grow again
+    del factIndices
 
-    self.crossedSemiContextsLists[leftOrRight] = newCrossedValues
+    self.crossedCounts[leftOrRight] = counts
+    self.crossedFactsSets[leftOrRight] = frozenset(factsList)
 
     if  leftOrRight :
       return self.updateContextsAndGetActive(newContextFlag)
@@ -168,7 +239,7 @@ class ContextOperator(object):
                     already exist and there is no need to
                     create new ones.
 
-    @return activeContexts:     list of identifiers of the contexts which
+    @return activeContexts:     list of the contexts which
                     completely coincide with the input stream,
                     should be considered active and be
                     recorded to the input stream of "neurons"
@@ -185,41 +256,62 @@ class ContextOperator(object):
 
     potentialNewContexts = []
 
-    for leftSemiContVal in self.crossedSemiContextsLists[0]:
+    leftSemiContexts = self.semiContValLists[0]
+    rightSemiContexts = self.semiContValLists[1]
+    contexts = self.contextsValuesList
+    newContextID = self.newContextID
+
+    # Left semi-contexts crossed in full are selected. When new contexts may
+    # be created, the partially crossed ones short enough to be extended are
+    # reviewed as well. Nothing can come out of the others.
+    leftCounts = self.crossedCounts[0]
+    leftLengths = numpy.frombuffer(self.semiContextLengths[0],
+                                   dtype=numpy.int32)[:len(leftCounts)]
+    leftComplete = leftCounts == leftLengths
+    if newContextFlag :
+      leftExpandable = ((leftCounts > 0) &
+                        (leftCounts <= self.maxLeftSemiContextsLenght))
+      reviewed = numpy.flatnonzero(leftComplete | leftExpandable)
+      leftExpandable = leftExpandable[reviewed].tolist()
+    else :
+      reviewed = numpy.flatnonzero(leftComplete)
+      leftExpandable = [False] * len(reviewed)
+    leftComplete = leftComplete[reviewed].tolist()
+
+    rightCounts = self.crossedCounts[1]
+    rightLengths = numpy.frombuffer(self.semiContextLengths[1],
+                                    dtype=numpy.int32)[:len(rightCounts)]
+    rightComplete = ((rightCounts > 0) & (rightCounts == rightLengths)).tolist()
+    rightCounts = rightCounts.tolist()
+
+    for leftID, complete, expandable in zip(reviewed.tolist(),
+                                            leftComplete,
+                                            leftExpandable):
 
-      for rightSemiContextID, contextID in leftSemiContVal[3].items():
+      leftSemiContext = leftSemiContexts[leftID]
+      leftFacts = None
 
-        if self.newContextID != contextID :
+      for rightSemiContextID, contextID in leftSemiContext.contexts.items():
 
-          contextValues = self.contextsValuesList[contextID]
-          rightSemiContVal = self.semiContValLists[1][rightSemiContextID]
-          rightSemConVal0,  rightSemConVal1, rightSemConVal2 = rightSemiContVal
+        if newContextID != contextID :
 
-          if leftSemiContVal[1] == leftSemiContVal[2] :
+          if complete :
 
             numSelectedContext += 1
 
-            if rightSemConVal2 > 0 :
-
-              if rightSemConVal1 == rightSemConVal2 :
-                contextValues[0] += 1
-                activeContexts.append([ contextID,
-                                        contextValues[0],
-                                        contextValues[2],
-                                        contextValues[3]
-                                      ])
-
-              elif contextValues[1] and newContextFlag :
-                if leftSemiContVal[2] <= self.maxLeftSemiContextsLenght :
-                  leftFacts = tuple(leftSemiContVal[0])
-                  rightFacts = tuple(rightSemConVal0)
-                  potentialNewContexts.append(tuple([leftFacts, rightFacts]))
-
-          elif contextValues[1] and newContextFlag and rightSemConVal2 > 0 :
-            if leftSemiContVal[2] <= self.maxLeftSemiContextsLenght :
-              leftFacts = tuple(leftSemiContVal[0])
-              rightFacts = tuple(rightSemConVal0)
-              potentialNewContexts.append(tuple([leftFacts, rightFacts]))
+            if rightComplete[rightSemiContextID] :
+              context = contexts[contextID]
+              context.count += 1
+              activeContexts.append(context)
+              continue
+
+          if (expandable and rightCounts[rightSemiContextID] > 0 and
+              contexts[contextID].zeroLevel) :
+            if leftFacts is None :
+              leftFacts = self.crossedFacts(0, leftSemiContext)
+            rightFacts = self.crossedFacts(
+              1, rightSemiContexts[rightSemiContextID])
+            potentialNewContexts.append((leftFacts, rightFacts))
 
     self.newContextID = False
 
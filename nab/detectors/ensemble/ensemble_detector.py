@@ -0,0 +1,128 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Combines the stored results of other detectors instead of running a model.
+
+Ensembles are declared in config/ensembles.json, e.g.
+
+  "numentaContextOSEMax": {
+    "detectors": ["numenta", "contextOSE"],
+    "combine": "max"
+  }
+
+and run like any other detector once the results of their detectors exist:
+
+  python run.py -d numentaContextOSEMax --detect --optimize --score --normalize
+"""
+
+import os
+
+import numpy
+
+from nab.corpus import DataFile
+from nab.detectors.base import AnomalyDetector
+
+COMBINE_FUNCTIONS = ("max", "mean")
+
+
+
+class EnsembleDetector(AnomalyDetector):
+  """
+  Scores each record with the maximum or the (weighted) mean of the anomaly
+  scores of other detectors, read from their results files.
+  """
+
+  def __init__(self, *args, **kwargs):
+    """
+    @param dataDir    (string)  Directory of the data files, the results files
+                                have the same relative paths.
+    @param resultsDir (string)  Directory of the results of the detectors.
+    @param detectors  (list)    Names of the detectors to combine.
+    @param combine    (string)  One of COMBINE_FUNCTIONS.
+    @param weights    (list)    Optional weights of the detectors in the mean,
+                                e.g. fitted by scripts/fit_ensemble_weights.py.
+    @param fit        (dict)    Optional record of how the weights were
+                                fitted, not used by the detector.
+    """
+    self.dataDir = kwargs.pop("dataDir")
+    self.resultsDir = kwargs.pop("resultsDir")
+    self.detectors = kwargs.pop("detectors")
+    self.combine = kwargs.pop("combine", "mean")
+    self.weights = kwargs.pop("weights", None)
+    kwargs.pop("fit", None)
+
+    super(EnsembleDetector, self).__init__(*args, **kwargs)
+
+    if self.combine not in COMBINE_FUNCTIONS:
+      raise ValueError("Unknown combine function '%s', expected one of %s"
+                       % (self.combine, ", ".join(COMBINE_FUNCTIONS)))
+    if self.weights is not None and len(self.weights) != len(self.detectors):
+      raise ValueError("Expected one weight per detector of the ensemble")
+
+
+  def getAdditionalHeaders(self):
+    """The scores of each detector of the ensemble."""
+    return [detectorName + "_score" for detectorName in self.detectors]
+
+
+  def handleRecord(self, inputData):
+    raise NotImplementedError("EnsembleDetector combines whole results files, "
+                              "use run()")
+
+
+  def getResultsPath(self, detectorName):
+    relativePath = os.path.relpath(self.dataSet.srcPath, self.dataDir)
+    relativeDir, fileName = os.path.split(relativePath)
+    return os.path.join(self.resultsDir, detectorName, relativeDir,
+                        detectorName + "_" + fileName)
+
+
+  def loadScores(self):
+    """Returns the anomaly scores of the detectors, one row per detector."""
+    timestamps = self.dataSet.data["timestamp"].values
+    scores = numpy.empty((len(self.detectors), len(timestamps)))
+    for i, detectorName in enumerate(self.detectors):
+      resultsPath = self.getResultsPath(detectorName)
+      if not os.path.isfile(resultsPath):
+        raise IOError("No results file %s. You must run the %s detector "
+                      "before the ensembles using it."
+                      % (resultsPath, detectorName))
+      results = DataFile(resultsPath).data
+      if not numpy.array_equal(results["timestamp"].values, timestamps):
+        raise ValueError("The records of %s do not match the data file %s"
+                         % (resultsPath, self.dataSet.srcPath))
+      scores[i] = results["anomaly_score"].values
+    return scores
+
+
+  def run(self):
+    scores = self.loadScores()
+
+    if self.combine == "max":
+      anomalyScores = scores.max(axis=0)
+    else:
+      anomalyScores = numpy.average(scores, axis=0, weights=self.weights)
+
+    results = self.dataSet.data.copy()
+    results["anomaly_score"] = anomalyScores
+    for name, detectorScores in zip(self.getAdditionalHeaders(), scores):
+      results[name] = detectorScores
+    return results
@@ -32,12 +32,21 @@ class ExposeDetector(AnomalyDetector):
     self.decay = 0.01
     self.timestep = 0
 
+    # Number of records transformed and scored together in run(). Each block
+    # holds a (blockSize x n_components) feature matrix in memory.
+    self.blockSize = 64
+
 
   def initialize(self):
-    """Initializes RBFSampler for the detector"""
+    """Initializes RBFSampler for the detector.
+
+    The random Fourier feature map only depends on the input dimension and the
+    fixed random_state, so it is fitted once here instead of for every record.
+    """
     self.kernel = RBFSampler(gamma=0.5,
                              n_components=20000,
                              random_state=290)
+    self.kernel.fit(numpy.zeros((1, 1)))
 
 
   def handleRecord(self, inputData):
@@ -46,7 +55,7 @@ class ExposeDetector(AnomalyDetector):
 
     # Transform the input by approximating feature map of a Radial Basis
     # Function kernel using Random Kitchen Sinks approximation
-    inputFeature = self.kernel.fit_transform(
+    inputFeature = self.kernel.transform(
       numpy.array([[inputData["value"]]]))
 
     # Compute expose model as a weighted sum of new data point's feature
@@ -65,7 +74,66 @@ class ExposeDetector(AnomalyDetector):
     # with expose model. The similarity measure, calculated via inner
     # product, is the likelihood of data point being normal. Resulting
     # anomaly scores are in the range of -0.02 to 1.02.
-    anomalyScore = numpy.asscalar(1 - numpy.inner(inputFeature, exposeModel))
+    anomalyScore = float(1 - numpy.inner(inputFeature, exposeModel).item())
     self.timestep += 1
 
     return [anomalyScore]
+
+
+  def run(self):
+    """
+    Computes the anomaly scores for the whole data file at once.
+
+    The decayed model obeys the linear recurrence
+
+      model[t] = decay * phi[t] + (1 - decay) * model[t-1]
+
+    so within a block of records the scores phi[t] . model[t] only need the
+    block's Gram matrix, a lower triangular matrix of decay weights and the
+    model carried over from the previous block. Features of a block are
+    computed with one call to the fitted kernel. The scores match those of
+    handleRecord() up to floating point rounding.
+    """
+    values = self.dataSet.data["value"].to_numpy(dtype=float)
+    scores = self.computeScores(values)
+
+    ans = self.dataSet.data.copy()
+    ans["anomaly_score"] = scores
+    return ans[self.getHeader()]
+
+
+  def computeScores(self, values):
+    """Returns a numpy array of anomaly scores for the sequence of values,
+    continuing from the detector's current model state."""
+    scores = numpy.empty(len(values))
+    keep = 1 - self.decay
+
+    for start in range(0, len(values), self.blockSize):
+      block = values[start:start + self.blockSize]
+      features = self.kernel.transform(block.reshape(-1, 1))
+      n = len(block)
+
+      if self.timestep == 0:
+        # model[0] is phi[0], which is what the recurrence gives when the
+        # previous model equals phi[0].
+        previous = features[0]
+      else:
+        previous = numpy.ravel(self.previousExposeModel)
+
+      # weights[i, j] = decay * keep^(i-j) for j <= i, else 0
+      steps = numpy.arange(n)
+      lags = steps[:, None] - steps[None, :]
+      weights = numpy.where(lags >= 0,
+                            self.decay * keep ** numpy.maximum(lags, 0), 0.)
+      carry = keep ** (steps + 1)
+
+      gram = features.dot(features.T)
+      similarity = ((weights * gram).sum(axis=1) +
+                    carry * features.dot(previous))
+      scores[start:start + n] = 1 - similarity
+
+      self.previousExposeModel = (weights[-1].dot(features) +
+                                  carry[-1] * previous).reshape(1, -1)
+      self.timestep += n
+
+    return scores
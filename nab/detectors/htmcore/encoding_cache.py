@@ -0,0 +1,129 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+On disk cache of the input encodings of whole data files.
+
+The encoder output only depends on the encoder parameters and the data, so
+runs that only change SP/TM parameters can share it. Encodings are stored as
+one row of packed bits per record in a .npy file, and loaded memory-mapped so
+that processes using the same file share the pages.
+"""
+
+import hashlib
+import os
+import tempfile
+
+import numpy
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+
+
+def datasetHash(data):
+  """Returns a hex digest of the timestamps and values of a data file.
+
+  @param data (pandas.DataFrame)  Data with "timestamp" and "value" columns.
+  """
+  digest = hashlib.sha1()
+  timestamps = data["timestamp"].values.astype("datetime64[ns]")
+  digest.update(numpy.ascontiguousarray(timestamps).view(numpy.int64).tobytes())
+  digest.update(numpy.ascontiguousarray(data["value"].values,
+                                        dtype=numpy.float64).tobytes())
+  return digest.hexdigest()
+
+
+def encodingKey(encoderParams, data):
+  """Returns the cache key of the encodings of data.
+
+  @param encoderParams  (dict)              Parameters of all the encoders.
+  @param data           (pandas.DataFrame)  Data with "timestamp" and "value".
+  """
+  digest = hashlib.sha1(json.dumps(encoderParams, sort_keys=True).encode())
+  digest.update(datasetHash(data).encode())
+  return digest.hexdigest()
+
+
+def packEncoding(dense):
+  """Packs a dense binary encoding into a row of bits."""
+  return numpy.packbits(dense.reshape(-1).astype(bool))
+
+
+def unpackEncoding(packed):
+  """Returns the sorted indices of the active bits of a packed encoding."""
+  return numpy.flatnonzero(numpy.unpackbits(packed)).astype(numpy.uint32)
+
+
+
+class EncodingCache(object):
+  """
+  Directory of packed encodings, one .npy file per cache key. Files are
+  written atomically, so concurrent runs may share the directory.
+  """
+
+  def __init__(self, cacheDir):
+    """
+    @param cacheDir (string)  Directory of the cache, created if needed.
+    """
+    self.cacheDir = cacheDir
+    if not os.path.isdir(cacheDir):
+      try:
+        os.makedirs(cacheDir)
+      except OSError:
+        # created by another process in the meantime
+        if not os.path.isdir(cacheDir):
+          raise
+
+
+  def path(self, key):
+    return os.path.join(self.cacheDir, key + ".npy")
+
+
+  def load(self, key):
+    """Returns the memory-mapped packed encodings for key, None if missing."""
+    try:
+      return numpy.load(self.path(key), mmap_mode="r")
+    except IOError:
+      return None
+
+
+  def store(self, key, packed):
+    """Stores packed encodings, an array of (records x bytes) uint8, for key
+    and returns them memory-mapped."""
+    fd, tmpPath = tempfile.mkstemp(dir=self.cacheDir, suffix=".tmp")
+    try:
+      with os.fdopen(fd, "wb") as f:
+        numpy.save(f, numpy.asarray(packed, dtype=numpy.uint8))
+      os.replace(tmpPath, self.path(key))
+    except BaseException:
+      os.remove(tmpPath)
+      raise
+    return self.load(key)
+
+
+  def getOrCompute(self, key, encodeAll):
+    """Returns the packed encodings for key, computing and storing them with
+    encodeAll() if they are not cached yet."""
+    packed = self.load(key)
+    if packed is None:
+      packed = self.store(key, encodeAll())
+    return packed
@@ -23,6 +23,7 @@
 import os
 import json
 import math
+import numpy
 
 # htm.core imports
 from htm.bindings.sdr import SDR, Metrics
@@ -30,16 +31,14 @@ from htm.encoders.rdse import RDSE, RDSE_Parameters
 from htm.encoders.date import DateEncoder
 from htm.bindings.algorithms import SpatialPooler
 from htm.bindings.algorithms import TemporalMemory
-from htm.algorithms.anomaly_likelihood import AnomalyLikelihood
 from htm.bindings.algorithms import Predictor
 
+from nab.detectors.anomaly_likelihood import (nabLikelihoodParameters,
+                                              setLikelihoodScores)
 from nab.detectors.base import AnomalyDetector
-
-# Fraction outside of the range of values seen so far that will be considered
-# a spatial anomaly regardless of the anomaly likelihood calculation. This
-# accounts for the human labelling bias for spatial values larger than what
-# has been seen so far.
-SPATIAL_TOLERANCE = 0.05
+from nab.detectors.htmcore.encoding_cache import (EncodingCache, encodingKey,
+                                                  packEncoding, unpackEncoding)
+from nab.detectors.spatial_anomaly import setSpatialAnomalies
 
 PANDA_VIS_BAKE_DATA = False # if we want to bake data for pandaVis tool (repo at https://github.com/htm-community/HTMpandaVis )
 
@@ -111,6 +110,13 @@ class HtmcoreDetector(AnomalyDetector):
   """
 
   def __init__(self, *args, **kwargs):
+    # Parameters to run with instead of the defaults below, in the format of
+    # `parameters_numenta_comparable`. See nab/paramsearch.py
+    self.parameters = kwargs.pop("parameters", None)
+    # Directory of a cache of the input encodings shared by runs on the same
+    # data with the same encoder parameters, e.g. a parameter search only
+    # changing SP/TM parameters. See encoding_cache.py
+    self.encodingCacheDir = kwargs.pop("encodingCacheDir", None)
 
     super(HtmcoreDetector, self).__init__(*args, **kwargs)
 
@@ -123,6 +129,10 @@ class HtmcoreDetector(AnomalyDetector):
     self.useLikelihood      = True
     self.useSpatialAnomaly  = True
     self.verbose            = True
+    # Set this to True to track SDR statistics (htm.bindings.sdr.Metrics) of the
+    # encoder, SP and TM. They are printed every 1000 records when `verbose`.
+    # Off by default as it costs time on every record.
+    self.collectMetrics     = PANDA_VIS_BAKE_DATA
 
     # Set this to true if you want to use the optimization.
     # If true, it reads the parameters from ./params.json
@@ -136,13 +146,19 @@ class HtmcoreDetector(AnomalyDetector):
     self.encValue       = None
     self.sp             = None
     self.tm             = None
-    self.anLike         = None
-    # optional debug info
+    self.likelihoodParameters = None
+    # SDR buffers, allocated once and reused for every record
+    self.dateBits       = None
+    self.valueBits      = None
+    self.encoding       = None
+    self.activeColumns  = None
+    # packed encodings of the whole data file, when using the encoding cache
+    self.encodings      = None
+    # optional debug info, see `collectMetrics`
     self.enc_info       = None
     self.sp_info        = None
     self.tm_info        = None
     # internal helper variables:
-    self.inputs_ = []
     self.iteration_ = 0
 
 
@@ -159,23 +175,30 @@ class HtmcoreDetector(AnomalyDetector):
     @return tuple (anomalyScore, <any other fields specified in `getAdditionalHeaders()`>, ...)
     """
     # Send it to Numenta detector and get back the results
-    return self.modelRun(inputData["timestamp"], inputData["value"]) 
+    return self.modelRun(inputData["timestamp"], inputData["value"])
+
 
+  def run(self):
+    results = super(HtmcoreDetector, self).run()
+    if self.useLikelihood:
+      # The likelihood only depends on the raw scores, see anomaly_likelihood.py
+      setLikelihoodScores(results, **self.likelihoodParameters)
+    if self.useSpatialAnomaly:
+      # Values out of the range seen so far are anomalies regardless of the
+      # HTM model, see spatial_anomaly.py
+      setSpatialAnomalies(results)
+    return results
 
 
   def initialize(self):
     # toggle parameters here
-    if self.use_optimization:
+    if self.parameters is not None:
+      parameters = self.parameters
+    elif self.use_optimization:
       parameters = get_params('params.json')
     else:
       parameters = parameters_numenta_comparable
 
-    # setup spatial anomaly
-    if self.useSpatialAnomaly:
-      # Keep track of value range for spatial anomaly detection
-      self.minVal = None
-      self.maxVal = None
-
     ## setup Enc, SP, TM, Likelihood
     # Make the Encoders.  These will convert input data into binary representations.
     self.encTimestamp = DateEncoder(timeOfDay= parameters["enc"]["time"]["timeOfDay"],
@@ -188,7 +211,14 @@ class HtmcoreDetector(AnomalyDetector):
 
     self.encValue = RDSE( scalarEncoderParams )
     encodingWidth = (self.encTimestamp.size + self.encValue.size)
-    self.enc_info = Metrics( [encodingWidth], 999999999 )
+    # Buffers reused by every modelRun() call
+    self.dateBits = SDR( self.encTimestamp.size )
+    self.valueBits = SDR( self.encValue.size )
+    self.encoding = SDR( encodingWidth )
+
+    if self.encodingCacheDir is not None and not PANDA_VIS_BAKE_DATA:
+      self.encodings = EncodingCache(self.encodingCacheDir).getOrCompute(
+        encodingKey(parameters["enc"], self.dataSet.data), self.encodeAll)
 
     # Make the HTM.  SpatialPooler & TemporalMemory & associated tools.
     # SpatialPooler
@@ -206,7 +236,9 @@ class HtmcoreDetector(AnomalyDetector):
       boostStrength              = spParams["boostStrength"],
       wrapAround                 = True
     )
-    self.sp_info = Metrics( self.sp.getColumnDimensions(), 999999999 )
+    # Create an SDR to represent active columns, This will be populated by the
+    # compute method of the SP. It must have the same dimensions as the SP.
+    self.activeColumns = SDR( self.sp.getColumnDimensions() )
 
     # TemporalMemory
     tmParams = parameters["tm"]
@@ -224,16 +256,18 @@ class HtmcoreDetector(AnomalyDetector):
       maxSegmentsPerCell        = tmParams["maxSegmentsPerCell"],
       maxSynapsesPerSegment     = tmParams["maxSynapsesPerSegment"]
     )
-    self.tm_info = Metrics( [self.tm.numberOfCells()], 999999999 )
+
+    if self.collectMetrics:
+      self.enc_info = Metrics( [encodingWidth], 999999999 )
+      self.sp_info = Metrics( self.sp.getColumnDimensions(), 999999999 )
+      self.tm_info = Metrics( [self.tm.numberOfCells()], 999999999 )
 
     # setup likelihood, these settings are used in NAB
     if self.useLikelihood:
       anParams = parameters["anomaly"]["likelihood"]
-      learningPeriod     = int(math.floor(self.probationaryPeriod / 2.0))
-      self.anomalyLikelihood = AnomalyLikelihood(
-                                 learningPeriod= learningPeriod,
-                                 estimationSamples= self.probationaryPeriod - learningPeriod,
-                                 reestimationPeriod= anParams["reestimationPeriod"])
+      self.likelihoodParameters = nabLikelihoodParameters(
+                                    self.probationaryPeriod,
+                                    reestimationPeriod= anParams["reestimationPeriod"])
     # Predictor
     # self.predictor = Predictor( steps=[1, 5], alpha=parameters["predictor"]['sdrc_alpha'] )
     # predictor_resolution = 1
@@ -242,6 +276,34 @@ class HtmcoreDetector(AnomalyDetector):
     if PANDA_VIS_BAKE_DATA:
       self.BuildPandaSystem(self.sp, self.tm, parameters["enc"]["value"]["size"], self.encTimestamp.size)
 
+  def encode(self, ts, val):
+      """
+         Encodes a record into the SDR buffers
+
+         @return tuple (dateBits, valueBits, encoding) of SDRs
+      """
+      # Call the encoders to create bit representations for each value. The
+      # SDR buffers are overwritten in place.
+      self.encTimestamp.encode(ts, self.dateBits)
+      self.encValue.encode(float(val), self.valueBits)
+      # Concatenate all these encodings into one large encoding for Spatial Pooling.
+      self.encoding.concatenate([self.valueBits, self.dateBits])
+      return self.dateBits, self.valueBits, self.encoding
+
+  def encodeAll(self):
+      """
+         Encodes all the records of the data file
+
+         @return numpy array of the encodings packed in rows of bits
+      """
+      data = self.dataSet.data
+      packed = numpy.empty((len(data), (self.encoding.size + 7) // 8),
+                           dtype=numpy.uint8)
+      for i, (ts, val) in enumerate(zip(data["timestamp"], data["value"])):
+        _, _, encoding = self.encode(ts, val)
+        packed[i] = packEncoding(encoding.dense)
+      return packed
+
   def modelRun(self, ts, val):
       """
          Run a single pass through HTM model
@@ -252,24 +314,24 @@ class HtmcoreDetector(AnomalyDetector):
          @return rawAnomalyScore computed for the `val` in this step
       """
       ## run data through our model pipeline: enc -> SP -> TM -> Anomaly
-      self.inputs_.append( val )
       self.iteration_ += 1
-      
+
       # 1. Encoding
-      # Call the encoders to create bit representations for each value.  These are SDR objects.
-      dateBits        = self.encTimestamp.encode(ts)
-      valueBits       = self.encValue.encode(float(val))
-      # Concatenate all these encodings into one large encoding for Spatial Pooling.
-      encoding = SDR( self.encTimestamp.size + self.encValue.size ).concatenate([valueBits, dateBits])
-      self.enc_info.addData( encoding )
+      if self.encodings is not None:
+        # Cached encoding of this record of the data file
+        encoding = self.encoding
+        encoding.sparse = unpackEncoding(self.encodings[self.iteration_ - 1])
+      else:
+        dateBits, valueBits, encoding = self.encode(ts, val)
+      if self.collectMetrics:
+        self.enc_info.addData( encoding )
 
       # 2. Spatial Pooler
-      # Create an SDR to represent active columns, This will be populated by the
-      # compute method below. It must have the same dimensions as the Spatial Pooler.
-      activeColumns = SDR( self.sp.getColumnDimensions() )
       # Execute Spatial Pooling algorithm over input space.
+      activeColumns = self.activeColumns
       self.sp.compute(encoding, True, activeColumns)
-      self.sp_info.addData( activeColumns )
+      if self.collectMetrics:
+        self.sp_info.addData( activeColumns )
 
       # 3. Temporal Memory
       # Execute Temporal Memory algorithm over active mini-columns.
@@ -285,46 +347,25 @@ class HtmcoreDetector(AnomalyDetector):
       else:
         self.tm.compute(activeColumns, learn=True)
 
-      self.tm_info.addData( self.tm.getActiveCells().flatten() )
+      if self.collectMetrics:
+        self.tm_info.addData( self.tm.getActiveCells().flatten() )
 
       # 4.1 (optional) Predictor #TODO optional
       #TODO optional: also return an error metric on predictions (RMSE, R2,...)
 
       # 4.2 Anomaly 
-      # handle spatial, contextual (raw, likelihood) anomalies
-      # -Spatial
-      spatialAnomaly = 0.0 #TODO optional: make this computed in SP (and later improve)
-      if self.useSpatialAnomaly:
-        # Update min/max values and check if there is a spatial anomaly
-        if self.minVal != self.maxVal:
-          tolerance = (self.maxVal - self.minVal) * SPATIAL_TOLERANCE
-          maxExpected = self.maxVal + tolerance
-          minExpected = self.minVal - tolerance
-          if val > maxExpected or val < minExpected:
-            spatialAnomaly = 1.0
-        if self.maxVal is None or val > self.maxVal:
-          self.maxVal = val
-        if self.minVal is None or val < self.minVal:
-          self.minVal = val
-
-      # -temporal (raw)
+      # -temporal (raw). The likelihood and spatial anomalies are computed for
+      # the whole file in `run()`
       raw= self.tm.anomaly
       temporalAnomaly = raw
 
-      if self.useLikelihood:
-        # Compute log(anomaly likelihood)
-        like = self.anomalyLikelihood.anomalyProbability(val, raw, ts)
-        logScore = self.anomalyLikelihood.computeLogLikelihood(like)
-        temporalAnomaly = logScore #TODO optional: TM to provide anomaly {none, raw, likelihood}, compare correctness with the py anomaly_likelihood
-
-      anomalyScore = max(spatialAnomaly, temporalAnomaly) # this is the "main" anomaly, compared in NAB
+      anomalyScore = temporalAnomaly # this is the "main" anomaly, compared in NAB
 
       # 5. print stats
-      if self.verbose and self.iteration_ % 1000 == 0:
-          # print(self.enc_info)
-          # print(self.sp_info)
-          # print(self.tm_info)
-          pass
+      if self.collectMetrics and self.verbose and self.iteration_ % 1000 == 0:
+          print(self.enc_info)
+          print(self.sp_info)
+          print(self.tm_info)
 
       # 6. panda vis
       if PANDA_VIS_BAKE_DATA:
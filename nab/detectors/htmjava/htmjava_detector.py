@@ -18,21 +18,18 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
-import math
-import simplejson as json
-from subprocess import Popen, PIPE
-
-from nupic.algorithms import anomaly_likelihood
 from nupic.frameworks.opf.common_models.cluster_params import (
   getScalarMetricWithTimeOfDayAnomalyParams)
 
+from nab.detectors.anomaly_likelihood import (nabLikelihoodParameters,
+                                              setLikelihoodScores)
 from nab.detectors.base import AnomalyDetector
+from nab.detectors.htmjava.htmjava_worker import discardWorker, getWorker
+from nab.detectors.spatial_anomaly import setSpatialAnomalies
+
+# Number of records sent to the JVM in a single request
+BATCH_SIZE = 1000
 
-# Fraction outside of the range of values seen so far that will be considered
-# a spatial anomaly regardless of the anomaly likelihood calculation. This
-# accounts for the human labelling bias for spatial values larger than what
-# has been seen so far.
-SPATIAL_TOLERANCE = 0.05
 
 
 class HtmjavaDetector(AnomalyDetector):
@@ -44,13 +41,9 @@ class HtmjavaDetector(AnomalyDetector):
 
     super(HtmjavaDetector, self).__init__(*args, **kwargs)
 
-    self.model = None
     self.sensorParams = None
     self.modelParams = None
-    self.anomalyLikelihood = None
-    # Keep track of value range for spatial anomaly detection
-    self.minVal = None
-    self.maxVal = None
+    self.likelihoodParameters = None
 
 
   def getAdditionalHeaders(self):
@@ -59,43 +52,8 @@ class HtmjavaDetector(AnomalyDetector):
 
 
   def handleRecord(self, inputData):
-    """Returns a tuple (anomalyScore, rawScore).
-
-    Internally to NuPIC "anomalyScore" corresponds to "likelihood_score"
-    and "rawScore" corresponds to "anomaly_score". Sorry about that.
-    """
-    # Send input to HTM Java detector
-    line = "{0},{1}\n".format(inputData['timestamp'], inputData['value'])
-    self.model.stdin.writelines(line)
-
-    # Get the value
-    value = inputData["value"]
-
-    # Retrieve the anomaly score
-    result = self.model.stdout.readline()
-    rawScore = float(result)
-
-    # Update min/max values and check if there is a spatial anomaly
-    spatialAnomaly = False
-    if self.minVal != self.maxVal:
-      tolerance = (self.maxVal - self.minVal) * SPATIAL_TOLERANCE
-      maxExpected = self.maxVal + tolerance
-      minExpected = self.minVal - tolerance
-      if value > maxExpected or value < minExpected:
-        spatialAnomaly = True
-    if self.maxVal is None or value > self.maxVal:
-      self.maxVal = value
-    if self.minVal is None or value < self.minVal:
-      self.minVal = value
-
-    # Compute log(anomaly likelihood)
-    anomalyScore = self.anomalyLikelihood.anomalyProbability(
-      inputData["value"], rawScore, inputData["timestamp"])
-    logScore = self.anomalyLikelihood.computeLogLikelihood(anomalyScore)
-    if spatialAnomaly:
-      logScore = 1.0
-
-    return (logScore, rawScore)
+    raise NotImplementedError("HtmjavaDetector sends whole files to HTM Java, "
+                              "use run()")
 
 
   def initialize(self):
@@ -112,38 +70,40 @@ class HtmjavaDetector(AnomalyDetector):
     self._setupEncoderParams(
       self.modelParams["modelParams"]["sensorParams"]["encoders"])
 
-    # Initialize the anomaly likelihood object
-    numentaLearningPeriod = int(math.floor(self.probationaryPeriod / 2.0))
-    self.anomalyLikelihood = anomaly_likelihood.AnomalyLikelihood(
-      learningPeriod=numentaLearningPeriod,
-      estimationSamples=self.probationaryPeriod-numentaLearningPeriod,
-      reestimationPeriod=100
-    )
-
-
-  def _stopModel(self):
-    """
-    Stop HTM Java model process
-    """
-    if self.model:
-      self.model.terminate()
-      self.model = None
+    self.likelihoodParameters = nabLikelihoodParameters(
+      self.probationaryPeriod, reestimationPeriod=100)
 
 
   def run(self):
-
-    # Launch HTM Java detector per process passing OPF model parameters
-    self.model = Popen(["java", "-jar",
-                        "./nab/detectors/htmjava/build/libs/htm.java-nab.jar",
-                        json.dumps(self.modelParams)],
-                       stdin=PIPE, stdout=PIPE)
-
-    response = super(HtmjavaDetector, self).run()
-
-    # Terminate HTM Java
-    self.model.stdin.writelines("\n")
-    self._stopModel()
-    return response
+    # The HTM model does not depend on the likelihood, so the raw scores of
+    # the whole file are computed first, in batches, by this process' worker.
+    data = self.dataSet.data
+    records = ["{0},{1}".format(timestamp, value)
+               for timestamp, value in zip(data["timestamp"], data["value"])]
+
+    worker = getWorker()
+    try:
+      modelId = worker.createModel(self.modelParams)
+      try:
+        rawScores = []
+        for start in range(0, len(records), BATCH_SIZE):
+          rawScores.extend(
+            worker.process(modelId, records[start:start + BATCH_SIZE]))
+      finally:
+        worker.deleteModel(modelId)
+    except IOError:
+      # The next data file of this process gets a new worker
+      discardWorker()
+      raise
+
+    results = data.copy()
+    results["anomaly_score"] = rawScores
+    results["raw_score"] = rawScores
+    # The likelihood only depends on the raw scores, see anomaly_likelihood.py
+    setLikelihoodScores(results, **self.likelihoodParameters)
+    # Values out of the range seen so far are anomalies regardless of the
+    # model, see spatial_anomaly.py
+    return setSpatialAnomalies(results)
 
 
   def _setupEncoderParams(self, encoderParams):
@@ -0,0 +1,137 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2016, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Client of the 'htm.java' model server, see 'HTMModelServer.java'. Kept apart
+from htmjava_detector.py, which needs nupic for the model parameters.
+"""
+
+import atexit
+import os
+import struct
+import simplejson as json
+from subprocess import Popen, PIPE
+
+HTMJAVA_JAR = "./nab/detectors/htmjava/build/libs/htm.java-nab.jar"
+
+
+
+class HtmjavaWorker(object):
+  """
+  Long lived 'htm.java' JVM hosting many models over one stdin/stdout pipe.
+
+  Requests are length prefixed binary frames, see 'HTMModelServer.java' for
+  the protocol. Keeping the JVM alive saves its startup and JIT warmup for
+  every data file, and batching records saves a pipe round trip per record.
+  """
+
+  def __init__(self, jarPath=HTMJAVA_JAR):
+    self.jvm = Popen(["java", "-jar", jarPath, "--server"],
+                         stdin=PIPE, stdout=PIPE)
+    self.nextModelId = 0
+
+
+  def _read(self, size):
+    data = self.jvm.stdout.read(size)
+    if len(data) != size:
+      raise IOError("htm.java worker exited unexpectedly")
+    return data
+
+
+  def createModel(self, modelParams):
+    """Creates a model from OPF model parameters and returns its ID."""
+    modelId = self.nextModelId
+    self.nextModelId += 1
+    params = json.dumps(modelParams).encode("utf-8")
+    self.jvm.stdin.write(struct.pack(">cii", b"C", modelId, len(params)))
+    self.jvm.stdin.write(params)
+    return modelId
+
+
+  def process(self, modelId, records):
+    """Feeds "timestamp,value" records to a model.
+
+    @param modelId  (int)   Model created by createModel().
+    @param records  (list)  Records as strings, in time order.
+
+    @return (list) Raw anomaly score of each record.
+    """
+    frame = [struct.pack(">cii", b"R", modelId, len(records))]
+    for record in records:
+      record = record.encode("utf-8")
+      frame.append(struct.pack(">H", len(record)))
+      frame.append(record)
+    self.jvm.stdin.write(b"".join(frame))
+    self.jvm.stdin.flush()
+
+    status = self._read(1)
+    if status == b"E":
+      length, = struct.unpack(">H", self._read(2))
+      raise RuntimeError("htm.java: " + self._read(length).decode("utf-8"))
+    count, = struct.unpack(">i", self._read(4))
+    return list(struct.unpack(">%dd" % count, self._read(8 * count)))
+
+
+  def deleteModel(self, modelId):
+    self.jvm.stdin.write(struct.pack(">ci", b"D", modelId))
+
+
+  def close(self):
+    if self.jvm.poll() is None:
+      try:
+        self.jvm.stdin.write(b"Q")
+        self.jvm.stdin.close()
+      except IOError:
+        pass
+      self.jvm.wait()
+
+
+
+# One worker per process, shared by all the data files the process handles.
+_worker = None
+_workerPid = None
+
+
+def getWorker():
+  """Returns the htm.java worker of the current process, starting it on
+  first use. Processes forked from a parent holding a worker start their own,
+  and a worker whose JVM exited is replaced.
+  """
+  global _worker, _workerPid
+  if (_worker is None or _workerPid != os.getpid() or
+      _worker.jvm.poll() is not None):
+    _worker = HtmjavaWorker()
+    _workerPid = os.getpid()
+    atexit.register(_worker.close)
+  return _worker
+
+
+def discardWorker():
+  """Stops the htm.java worker of the current process after a failure, e.g. a
+  pipe error leaving its frames out of sync, so that getWorker() starts a new
+  one.
+  """
+  global _worker, _workerPid
+  if _worker is not None and _workerPid == os.getpid():
+    if _worker.jvm.poll() is None:
+      _worker.jvm.kill()
+      _worker.jvm.wait()
+  _worker = None
+  _workerPid = None
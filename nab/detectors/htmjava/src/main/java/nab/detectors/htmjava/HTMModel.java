@@ -297,6 +297,11 @@ public class HTMModel {
      *
      *          java -jar htm.java-nab.jar --help
      *
+     *      As a long lived worker serving many models over a framed binary
+     *      protocol on stdin/stdout (see 'HTMModelServer'):
+     *
+     *          java -jar htm.java-nab.jar --server
+     *
      *      As a NAB detector (see 'htmjava_detector.py'):
      *
      *          python run.py --detect --score --normalize -d htmjava
@@ -332,6 +337,7 @@ public class HTMModel {
                 .withOptionalArg()
                 .ofType(Integer.class)
                 .defaultsTo(0);
+            parser.accepts("server", "Serve many models over a framed binary protocol on stdin/stdout");
             parser.acceptsAll(Arrays.asList("h", "?", "help"), "Help");
             OptionSet options = parser.parse(args);
             if (args.length == 0 || options.has("h")) {
@@ -339,6 +345,17 @@ public class HTMModel {
                 return;
             }
 
+            if (options.has("server")) {
+                // Force timezone to UTC
+                DateTimeZone.setDefault(DateTimeZone.UTC);
+                // Keep stdout for the protocol, anything else printed goes to stderr
+                PrintStream protocol = System.out;
+                System.setOut(System.err);
+                new HTMModelServer(System.in, protocol).serve();
+                LOGGER.trace("Done serving models");
+                return;
+            }
+
             // Get in/out files
             final PrintStream output;
             final InputStream input;
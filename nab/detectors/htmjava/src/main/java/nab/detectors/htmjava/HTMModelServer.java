@@ -0,0 +1,220 @@
+/* ---------------------------------------------------------------------
+ * Numenta Platform for Intelligent Computing (NuPIC)
+ * Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+ * with Numenta, Inc., for a separate license for this software code, the
+ * following terms and conditions apply:
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ *
+ * http://numenta.org/licenses/
+ * ---------------------------------------------------------------------
+ */
+package nab.detectors.htmjava;
+
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.EOFException;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.nio.charset.StandardCharsets;
+import java.util.HashMap;
+import java.util.Map;
+import java.util.concurrent.BlockingQueue;
+import java.util.concurrent.LinkedBlockingQueue;
+import java.util.concurrent.TimeUnit;
+
+import org.numenta.nupic.network.Network;
+import org.numenta.nupic.network.sensor.Publisher;
+import org.slf4j.Logger;
+import org.slf4j.LoggerFactory;
+
+import com.fasterxml.jackson.databind.JsonNode;
+import com.fasterxml.jackson.databind.ObjectMapper;
+
+/**
+ * Long lived htm.java worker serving many NAB models over one connection.
+ *
+ * Requests and responses are framed with big-endian integers (see
+ * {@link DataInputStream}). Every request starts with a one byte opcode:
+ *
+ *      'C' int modelId, int length, byte[length] OPF parameters (UTF-8 JSON)
+ *          Create a model. No response.
+ *
+ *      'R' int modelId, int count, count x (unsigned short length, byte[length])
+ *          Feed "timestamp,value" records to a model. Response:
+ *          'K' int count, count x double raw anomaly score
+ *          or 'E' unsigned short length, byte[length] error message.
+ *
+ *      'D' int modelId
+ *          Delete a model. No response.
+ *
+ *      'Q'
+ *          Quit.
+ *
+ * See 'htmjava_detector.py' for the Python side.
+ */
+public class HTMModelServer {
+    protected static final Logger LOGGER = LoggerFactory.getLogger(HTMModelServer.class);
+
+    public static final byte CREATE = 'C';
+    public static final byte RECORDS = 'R';
+    public static final byte DELETE = 'D';
+    public static final byte QUIT = 'Q';
+    public static final byte OK = 'K';
+    public static final byte ERROR = 'E';
+
+    /** Maximum time to wait for the network to score a single record */
+    private static final long RECORD_TIMEOUT_SECONDS = 600;
+
+    /**
+     * A running model and the queue its anomaly scores are published to.
+     */
+    private static class ModelWorker {
+        private final Network network;
+        private final Publisher publisher;
+        private final BlockingQueue<Double> scores = new LinkedBlockingQueue<>();
+        private volatile Throwable error;
+
+        ModelWorker(JsonNode params) {
+            HTMModel model = new HTMModel(params);
+            network = model.getNetwork();
+            network.observe().subscribe((inference) -> {
+                scores.add(inference.getAnomalyScore());
+            }, (error) -> {
+                LOGGER.error("Error processing data", error);
+                this.error = error;
+            }, () -> {
+                LOGGER.trace("Done processing data");
+            });
+            network.start();
+            publisher = model.getPublisher();
+        }
+
+        double[] process(String[] records) throws IOException {
+            for (String record : records) {
+                publisher.onNext(record);
+            }
+            double[] result = new double[records.length];
+            for (int i = 0; i < records.length; i++) {
+                Double score = null;
+                long waited = 0;
+                while (score == null) {
+                    if (error != null) {
+                        throw new IOException("Model failed: " + error);
+                    }
+                    try {
+                        score = scores.poll(1, TimeUnit.SECONDS);
+                    } catch (InterruptedException e) {
+                        throw new IOException("Interrupted while waiting for scores", e);
+                    }
+                    if (score == null && ++waited > RECORD_TIMEOUT_SECONDS) {
+                        throw new IOException("Timed out waiting for scores");
+                    }
+                }
+                result[i] = score;
+            }
+            return result;
+        }
+
+        void close() {
+            publisher.onComplete();
+            network.halt();
+        }
+    }
+
+    private final DataInputStream in;
+    private final DataOutputStream out;
+    private final ObjectMapper mapper = new ObjectMapper();
+    private final Map<Integer, ModelWorker> models = new HashMap<>();
+
+    public HTMModelServer(InputStream input, OutputStream output) {
+        in = new DataInputStream(new BufferedInputStream(input, 1 << 16));
+        out = new DataOutputStream(new BufferedOutputStream(output, 1 << 16));
+    }
+
+    /**
+     * Serve requests until 'Q' or the end of the input stream.
+     */
+    public void serve() throws IOException {
+        try {
+            while (true) {
+                byte opcode;
+                try {
+                    opcode = in.readByte();
+                } catch (EOFException e) {
+                    break;
+                }
+                if (opcode == QUIT) {
+                    break;
+                } else if (opcode == CREATE) {
+                    int modelId = in.readInt();
+                    byte[] json = new byte[in.readInt()];
+                    in.readFully(json);
+                    JsonNode params = mapper.readTree(new String(json, StandardCharsets.UTF_8));
+                    models.put(modelId, new ModelWorker(params));
+                    LOGGER.trace("Created model {}", modelId);
+                } else if (opcode == RECORDS) {
+                    int modelId = in.readInt();
+                    String[] records = new String[in.readInt()];
+                    for (int i = 0; i < records.length; i++) {
+                        byte[] record = new byte[in.readUnsignedShort()];
+                        in.readFully(record);
+                        records[i] = new String(record, StandardCharsets.UTF_8);
+                    }
+                    processRecords(modelId, records);
+                } else if (opcode == DELETE) {
+                    ModelWorker model = models.remove(in.readInt());
+                    if (model != null) {
+                        model.close();
+                    }
+                } else {
+                    throw new IOException("Unknown opcode " + opcode);
+                }
+            }
+        } finally {
+            for (ModelWorker model : models.values()) {
+                model.close();
+            }
+            models.clear();
+            out.flush();
+        }
+    }
+
+    private void processRecords(int modelId, String[] records) throws IOException {
+        ModelWorker model = models.get(modelId);
+        double[] scores;
+        try {
+            if (model == null) {
+                throw new IOException("Unknown model " + modelId);
+            }
+            scores = model.process(records);
+        } catch (IOException e) {
+            LOGGER.error("Error processing records", e);
+            byte[] message = String.valueOf(e.getMessage()).getBytes(StandardCharsets.UTF_8);
+            out.writeByte(ERROR);
+            out.writeShort(Math.min(message.length, 0xFFFF));
+            out.write(message, 0, Math.min(message.length, 0xFFFF));
+            out.flush();
+            return;
+        }
+        out.writeByte(OK);
+        out.writeInt(scores.length);
+        for (double score : scores) {
+            out.writeDouble(score);
+        }
+        out.flush();
+    }
+}
@@ -1,5 +1,7 @@
 from nab.detectors.base import AnomalyDetector
 
+import bisect
+from collections import deque
 import numpy as np
 import math
 
@@ -8,59 +10,114 @@ class KnncadDetector(AnomalyDetector):
     def __init__(self, *args, **kwargs):
         super(KnncadDetector, self).__init__(*args, **kwargs)
 
-        self.buf = []
-        self.training = []
-        self.calibration = []
-        self.scores = []
+        self.buf = deque()
+        self.calibration = deque()
+        self.scores = deque()
+        # calibration scores kept sorted for O(log n) rank queries
+        self.sortedScores = []
         self.record_count = 0
         self.pred = -1
         self.k = 27
         self.dim = 19
         self.sigma = np.diag(np.ones(self.dim))
-            
+
+        # Training vectors live in a fixed size ring buffer. It fills up
+        # during the probationary period and afterwards the oldest vector is
+        # overwritten in place. `whitened` mirrors `training` transformed by
+        # `whitener`, a factor L of sigma = L.L^T, so the Mahalanobis metric
+        # becomes a plain squared euclidean distance.
+        capacity = max(int(math.ceil(self.probationaryPeriod)) - self.dim, 0)
+        self.training = np.empty((capacity, self.dim))
+        self.whitened = np.empty((capacity, self.dim))
+        self.trainingSize = 0
+        self.trainingStart = 0
+        self.whitener = np.diag(np.ones(self.dim))
+
     def metric(self,a,b):
         diff = a-np.array(b)
         return np.dot(np.dot(diff,self.sigma),diff.T)
 
+    def distances(self, item):
+        """Metric between item and every training vector, in buffer order."""
+        if self.whitener is not None:
+            diff = self.whitened[:self.trainingSize] - np.dot(item, self.whitener)
+            return np.einsum('ij,ij->i', diff, diff)
+        diff = self.training[:self.trainingSize] - item
+        return np.einsum('ij,ij->i', np.dot(diff, self.sigma), diff)
+
     def ncm(self,item, item_in_array=False):
-        arr = [self.metric(x,item) for x in self.training]
+        arr = self.distances(item)
         return np.sum(np.partition(arr, self.k+item_in_array)[:self.k+item_in_array])
 
+    def updateSigma(self):
+        training = self.training[:self.trainingSize]
+        try:
+            self.sigma = np.linalg.inv(np.dot(training.T, training))
+        except np.linalg.LinAlgError:
+            print('Singular Matrix at record', self.record_count)
+            return
+        try:
+            self.whitener = np.linalg.cholesky(self.sigma)
+            self.whitened[:self.trainingSize] = np.dot(training, self.whitener)
+        except np.linalg.LinAlgError:
+            # numerically not positive definite, use the metric directly
+            self.whitener = None
+
+    def appendTraining(self, item):
+        if self.trainingSize < len(self.training):
+            index = self.trainingSize
+            self.trainingSize += 1
+        else:
+            # overwrite the oldest training vector
+            index = self.trainingStart
+            self.trainingStart = (self.trainingStart + 1) % self.trainingSize
+        self.training[index] = item
+        if self.whitener is not None:
+            self.whitened[index] = np.dot(item, self.whitener)
+
+    def appendScore(self, score):
+        self.scores.append(score)
+        bisect.insort(self.sortedScores, score)
+
+    def popScore(self):
+        score = self.scores.popleft()
+        del self.sortedScores[bisect.bisect_left(self.sortedScores, score)]
+
     def handleRecord(self, inputData):
         """
         inputRow = [inputData["timestamp"], inputData["value"]]
         """
         self.buf.append(inputData['value'])
+        if len(self.buf) > self.dim:
+            self.buf.popleft()
         self.record_count += 1
-        
+
         if len(self.buf) < self.dim:
             return [0.0]
         else:
-            new_item = self.buf[-self.dim:]
+            new_item = np.array(self.buf, dtype=float)
             if self.record_count < self.probationaryPeriod:
-                self.training.append(new_item)
+                self.appendTraining(new_item)
                 return [0.0]
             else:
                 ost = self.record_count % self.probationaryPeriod
                 if ost == 0 or ost == int(self.probationaryPeriod/2):
-                    try:
-                        self.sigma = np.linalg.inv(np.dot(np.array(self.training).T, self.training))
-                    except np.linalg.linalg.LinAlgError:
-                        print('Singular Matrix at record', self.record_count) 
+                    self.updateSigma()
                 if len(self.scores) == 0:
-                    self.scores = [self.ncm(v, True) for v in self.training]
-                    
+                    for v in self.training[:self.trainingSize]:
+                        self.appendScore(self.ncm(v, True))
+
                 new_score = self.ncm(new_item)
-                result = 1.*len(np.where(np.array(self.scores) < new_score)[0])/len(self.scores)
-                
+                rank = bisect.bisect_left(self.sortedScores, new_score)
+                result = 1.*rank/len(self.scores)
+
                 if self.record_count >= 2*self.probationaryPeriod:
-                    self.training.pop(0)
-                    self.training.append(self.calibration.pop(0))
-                
-                self.scores.pop(0)    
+                    self.appendTraining(self.calibration.popleft())
+
+                self.popScore()
                 self.calibration.append(new_item)
-                self.scores.append(new_score)
-                
+                self.appendScore(new_score)
+
                 if self.pred > 0:
                     self.pred -= 1
                     return [0.5]
@@ -33,3 +33,10 @@ class NullDetector(AnomalyDetector):
     """The anomaly score is simply a constant 0.5."""
     anomalyScore = 0.5
     return (anomalyScore, )
+
+
+  def run(self):
+    """Same results as handleRecord, for the whole file at once."""
+    results = self.dataSet.data.copy()
+    results["anomaly_score"] = 0.5
+    return results
@@ -19,10 +19,8 @@
 # ----------------------------------------------------------------------
 
 import os
-import math
 import simplejson as json
 
-from nupic.algorithms import anomaly_likelihood
 from nupic.frameworks.opf.common_models.cluster_params import (
   getScalarMetricWithTimeOfDayAnomalyParams)
 try:
@@ -31,6 +29,7 @@ except:
   # Try importing it the old way (version < 0.7.0.dev0)
   from nupic.frameworks.opf.modelfactory import ModelFactory
 
+from nab.detectors.anomaly_likelihood import nabLikelihoodParameters
 from nab.detectors.numenta.numenta_detector import NumentaDetector
 
 
@@ -66,10 +65,6 @@ class NumentaTMDetector(NumentaDetector):
 
     self.model.enableInference({"predictedField": "value"})
 
-    # Initialize the anomaly likelihood object
-    numentaLearningPeriod = int(math.floor(self.probationaryPeriod / 2.0))
-    self.anomalyLikelihood = anomaly_likelihood.AnomalyLikelihood(
-      learningPeriod=numentaLearningPeriod,
-      estimationSamples=self.probationaryPeriod-numentaLearningPeriod,
-      reestimationPeriod=100
-    )
+    # Parameters of the anomaly likelihood, applied in run()
+    self.likelihoodParameters = nabLikelihoodParameters(
+      self.probationaryPeriod, reestimationPeriod=100)
@@ -18,9 +18,6 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
-import math
-
-from nupic.algorithms import anomaly_likelihood
 from nupic.frameworks.opf.common_models.cluster_params import (
   getScalarMetricWithTimeOfDayAnomalyParams)
 try:
@@ -29,13 +26,10 @@ except:
   # Try importing it the old way (version < 0.7.0.dev0)
   from nupic.frameworks.opf.modelfactory import ModelFactory
 
+from nab.detectors.anomaly_likelihood import (nabLikelihoodParameters,
+                                              setLikelihoodScores)
 from nab.detectors.base import AnomalyDetector
-
-# Fraction outside of the range of values seen so far that will be considered
-# a spatial anomaly regardless of the anomaly likelihood calculation. This
-# accounts for the human labelling bias for spatial values larger than what
-# has been seen so far.
-SPATIAL_TOLERANCE = 0.05
+from nab.detectors.spatial_anomaly import setSpatialAnomalies
 
 
 
@@ -50,10 +44,7 @@ class NumentaDetector(AnomalyDetector):
 
     self.model = None
     self.sensorParams = None
-    self.anomalyLikelihood = None
-    # Keep track of value range for spatial anomaly detection
-    self.minVal = None
-    self.maxVal = None
+    self.likelihoodParameters = None
 
     # Set this to False if you want to get results based on raw scores
     # without using AnomalyLikelihood. This will give worse results, but
@@ -68,46 +59,29 @@ class NumentaDetector(AnomalyDetector):
 
 
   def handleRecord(self, inputData):
-    """Returns a tuple (anomalyScore, rawScore).
+    """Returns a tuple (rawScore, rawScore). run() replaces the first one with
+    the anomaly likelihood.
 
-    Internally to NuPIC "anomalyScore" corresponds to "likelihood_score"
-    and "rawScore" corresponds to "anomaly_score". Sorry about that.
+    Internally to NuPIC "rawScore" corresponds to "anomaly_score".
     """
     # Send it to Numenta detector and get back the results
     result = self.model.run(inputData)
 
-    # Get the value
-    value = inputData["value"]
-
     # Retrieve the anomaly score and write it to a file
     rawScore = result.inferences["anomalyScore"]
 
-    # Update min/max values and check if there is a spatial anomaly
-    spatialAnomaly = False
-    if self.minVal != self.maxVal:
-      tolerance = (self.maxVal - self.minVal) * SPATIAL_TOLERANCE
-      maxExpected = self.maxVal + tolerance
-      minExpected = self.minVal - tolerance
-      if value > maxExpected or value < minExpected:
-        spatialAnomaly = True
-    if self.maxVal is None or value > self.maxVal:
-      self.maxVal = value
-    if self.minVal is None or value < self.minVal:
-      self.minVal = value
+    # The likelihood is computed for the whole file in run()
+    return (rawScore, rawScore)
 
-    if self.useLikelihood:
-      # Compute log(anomaly likelihood)
-      anomalyScore = self.anomalyLikelihood.anomalyProbability(
-        inputData["value"], rawScore, inputData["timestamp"])
-      logScore = self.anomalyLikelihood.computeLogLikelihood(anomalyScore)
-      finalScore = logScore
-    else:
-      finalScore = rawScore
-
-    if spatialAnomaly:
-      finalScore = 1.0
 
-    return (finalScore, rawScore)
+  def run(self):
+    results = super(NumentaDetector, self).run()
+    if self.useLikelihood:
+      # The likelihood only depends on the raw scores, see anomaly_likelihood.py
+      setLikelihoodScores(results, **self.likelihoodParameters)
+    # Values out of the range seen so far are anomalies regardless of the
+    # model, see spatial_anomaly.py
+    return setSpatialAnomalies(results)
 
 
   def initialize(self):
@@ -129,13 +103,8 @@ class NumentaDetector(AnomalyDetector):
     self.model.enableInference({"predictedField": "value"})
 
     if self.useLikelihood:
-      # Initialize the anomaly likelihood object
-      numentaLearningPeriod = int(math.floor(self.probationaryPeriod / 2.0))
-      self.anomalyLikelihood = anomaly_likelihood.AnomalyLikelihood(
-        learningPeriod=numentaLearningPeriod,
-        estimationSamples=self.probationaryPeriod-numentaLearningPeriod,
-        reestimationPeriod=100
-      )
+      self.likelihoodParameters = nabLikelihoodParameters(
+        self.probationaryPeriod, reestimationPeriod=100)
 
 
   def _setupEncoderParams(self, encoderParams):
@@ -0,0 +1,251 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014-2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Bridge running the Python 2 detectors (`numenta`, `numentaTM`, `htmjava`) from
+the Python 3 runner.
+
+`Python2Detector` stands in for a Python 2 detector in `Runner.detect()`, so
+its files are scheduled by the same pool as the native detectors and written
+by the same `detectDataSet()`. Its `run()` hands the data file over to a
+Python 2 worker process, started on first use and kept alive for every file
+the pool process handles.
+
+The worker is this module run with the Python 2 interpreter. It reads one JSON
+task per line on stdin and writes one JSON result per line on stdout. This
+module must therefore remain valid Python 2.
+"""
+
+from __future__ import print_function
+
+import atexit
+import importlib
+import os
+import sys
+import traceback
+from subprocess import Popen, PIPE
+
+import pandas
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+from nab.detectors.base import AnomalyDetector
+
+
+# Python 2 interpreter, relative to the NAB root
+PYTHON2 = os.path.join(".", "pyenv2", "bin", "python")
+
+# Module and class of each Python 2 detector
+PYTHON2_DETECTORS = {
+  "numenta": ("nab.detectors.numenta.numenta_detector", "NumentaDetector"),
+  "numentaTM": ("nab.detectors.numenta.numentaTM_detector",
+                "NumentaTMDetector"),
+  "htmjava": ("nab.detectors.htmjava.htmjava_detector", "HtmjavaDetector"),
+}
+
+NAB_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+  os.path.realpath(__file__))))
+
+
+
+class Python2Worker(object):
+  """
+  Python 2 process running detectors on the data files it is sent.
+  """
+
+  def __init__(self, python=PYTHON2):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+      [NAB_ROOT] + [p for p in [env.get("PYTHONPATH")] if p])
+    self.process = Popen([python, "-m", "nab.detectors.python2"],
+                         stdin=PIPE, stdout=PIPE, cwd=NAB_ROOT, env=env,
+                         universal_newlines=True)
+
+
+  def runDetector(self, detectorName, dataSet, probationaryPercent,
+                  relativePath):
+    """Runs a Python 2 detector on a data file. The worker is discarded if it
+    fails, see discardWorker().
+
+    @param detectorName         (string)        Name of a Python 2 detector.
+    @param dataSet              (DataFile)      Data file to run it on.
+    @param probationaryPercent  (float)         Passed to the detector.
+    @param relativePath         (string)        Path of the data file relative
+                                                to the corpus, passed to the
+                                                detector's setTask().
+
+    @return (pandas.DataFrame) Results in the format of AnomalyDetector.run().
+    """
+    data = dataSet.data
+    task = {
+      "detector": detectorName,
+      "srcPath": dataSet.srcPath,
+      "relativePath": relativePath,
+      "probationaryPercent": probationaryPercent,
+      "timestamp": data["timestamp"].astype(str).tolist(),
+      "value": data["value"].astype(float).tolist(),
+    }
+    try:
+      self.process.stdin.write(json.dumps(task) + "\n")
+      self.process.stdin.flush()
+      line = self.process.stdout.readline()
+    except IOError:
+      discardWorker(self)
+      raise
+    if not line:
+      discardWorker(self)
+      raise RuntimeError("Python 2 worker exited unexpectedly")
+    response = json.loads(line)
+    if "error" in response:
+      raise RuntimeError("Python 2 detector %s failed:\n%s"
+                         % (detectorName, response["error"]))
+
+    results = data.copy()
+    for name, column in zip(response["headers"], response["columns"]):
+      results[name] = column
+    return results[["timestamp", "value"] + response["headers"]]
+
+
+  def close(self):
+    if self.process.poll() is None:
+      try:
+        self.process.stdin.close()
+      except IOError:
+        pass
+      self.process.wait()
+
+
+  def kill(self):
+    if self.process.poll() is None:
+      self.process.kill()
+      self.process.wait()
+
+
+
+# One worker per process, shared by all the data files the process handles.
+_worker = None
+_workerPid = None
+
+
+def getWorker():
+  """Returns the Python 2 worker of the current process, starting it on first
+  use. Processes forked from a parent holding a worker start their own, and a
+  worker whose process exited is replaced.
+  """
+  global _worker, _workerPid
+  if (_worker is None or _workerPid != os.getpid() or
+      _worker.process.poll() is not None):
+    _worker = Python2Worker()
+    _workerPid = os.getpid()
+    atexit.register(_worker.close)
+  return _worker
+
+
+def discardWorker(worker):
+  """Stops a worker after a failure, e.g. a pipe error leaving its requests
+  and responses out of sync, so that getWorker() starts a new one.
+  """
+  global _worker, _workerPid
+  worker.kill()
+  if worker is _worker:
+    _worker = None
+    _workerPid = None
+
+
+
+class Python2Detector(AnomalyDetector):
+  """
+  Proxy for a detector requiring Python 2. Use functools.partial to bind the
+  detector name, e.g. `partial(Python2Detector, "numenta")`.
+  """
+
+  def __init__(self, detectorName, dataSet, probationaryPercent):
+    super(Python2Detector, self).__init__(dataSet, probationaryPercent)
+
+    if detectorName not in PYTHON2_DETECTORS:
+      raise ValueError("Unknown Python 2 detector: %s" % detectorName)
+    self.detectorName = detectorName
+    self.probationaryPercent = probationaryPercent
+
+
+  def handleRecord(self, inputData):
+    raise NotImplementedError("Records are handled by the Python 2 worker")
+
+
+  def run(self):
+    return getWorker().runDetector(self.detectorName,
+                                   self.dataSet,
+                                   self.probationaryPercent,
+                                   self.relativePath)
+
+
+
+class _DataFile(object):
+  """Data file received from the parent process."""
+
+  def __init__(self, srcPath, data):
+    self.srcPath = srcPath
+    self.fileName = os.path.split(srcPath)[1]
+    self.data = data
+
+
+
+def _handleTask(task):
+  moduleName, className = PYTHON2_DETECTORS[task["detector"]]
+  detectorClass = getattr(importlib.import_module(moduleName), className)
+
+  data = pandas.DataFrame({
+    "timestamp": pandas.to_datetime(task["timestamp"]),
+    "value": task["value"],
+  }, columns=["timestamp", "value"])
+
+  detector = detectorClass(dataSet=_DataFile(task["srcPath"], data),
+                           probationaryPercent=task["probationaryPercent"])
+  detector.setTask(task["detector"], task["relativePath"])
+  detector.initialize()
+  results = detector.run()
+
+  headers = detector.getHeader()[2:]
+  return {
+    "headers": headers,
+    "columns": [results[name].tolist() for name in headers],
+  }
+
+
+def main():
+  """Worker loop: one JSON task in, one JSON result out, until end of input.
+  """
+  # Keep stdout for the protocol, detectors print their progress to stderr.
+  protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+  os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+  for line in iter(sys.stdin.readline, ""):
+    try:
+      response = _handleTask(json.loads(line))
+    except Exception:
+      response = {"error": traceback.format_exc()}
+    protocol.write(json.dumps(response) + "\n")
+    protocol.flush()
+
+
+if __name__ == "__main__":
+  main()
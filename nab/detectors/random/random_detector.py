@@ -18,7 +18,6 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
-import random
 from nab.detectors.base import AnomalyDetector
 
 
@@ -30,15 +29,23 @@ class RandomDetector(AnomalyDetector):
     super(RandomDetector, self).__init__(*args, **kwargs)
 
     self.seed = 42
+    self.random = None
 
 
   def handleRecord(self, inputData):
     """Returns a tuple (anomalyScore).
     The anomalyScore is simply a random value from 0 to 1
     """
-    anomalyScore = random.uniform(0,1)
+    anomalyScore = self.random.random()
     return (anomalyScore, )
 
 
   def initialize(self):
-    random.seed(self.seed)
+    self.random = self.getRandomGenerator(self.seed)
+
+
+  def run(self):
+    """Same results as handleRecord, for the whole file at once."""
+    results = self.dataSet.data.copy()
+    results["anomaly_score"] = self.random.random(len(results))
+    return results
@@ -0,0 +1,374 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Streaming Robust Random Cut Forest [1], scored like the RANDOM_CUT_FOREST
+function of AWS Kinesis Analytics [2].
+
+Each tree keeps a time decayed reservoir sample of the points and is stored in
+flat arrays indexed by node number, the leaves and branches being allocated
+from a free list. Trees only share the stream of points, so a batch of points
+is processed one tree at a time; each tree has its own random generator, so
+the results do not depend on the batch size.
+
+[1]: http://proceedings.mlr.press/v48/guha16.pdf
+[2]: https://docs.aws.amazon.com/kinesisanalytics/latest/sqlref/sqlrf-random-cut-forest.html
+"""
+
+import heapq
+import math
+import random
+
+import numpy
+
+
+
+class RandomCutTree(object):
+  """
+  Random cut tree of a sample of at most sampleSize points. Branch nodes have
+  a cut (dimension and value), points with coordinate <= value on the cut
+  dimension going left. Leaves hold one point and the number of copies of it
+  in the sample. All the nodes hold their bounding box and mass.
+  """
+
+  def __init__(self, sampleSize, dimensions, timeDecay, seed):
+    """
+    @param sampleSize   (int)    Maximum number of points in the tree.
+    @param dimensions   (int)    Number of coordinates of the points.
+    @param timeDecay    (float)  Points older than about timeDecay records are
+                                 less likely to stay in the sample.
+    @param seed         (int)    Seed of the random generator of the tree.
+    """
+    self.sampleSize = sampleSize
+    self.dimensions = dimensions
+    self.timeDecay = float(timeDecay)
+    self.random = random.Random(seed)
+
+    numNodes = 2 * sampleSize
+    self.left = [-1] * numNodes
+    self.right = [-1] * numNodes
+    self.parent = [-1] * numNodes
+    self.mass = [0] * numNodes
+    self.cutDimension = [0] * numNodes
+    self.cutValue = [0.0] * numNodes
+    # Bounding boxes, coordinate k of node n at index n * dimensions + k
+    self.minValues = [0.0] * (numNodes * dimensions)
+    self.maxValues = [0.0] * (numNodes * dimensions)
+    self.free = list(range(numNodes - 1, -1, -1))
+    self.root = -1
+
+    # Reservoir of (-weight, sequence number), largest weight first, and leaf
+    # of each sampled sequence number.
+    self.sample = []
+    self.leaves = {}
+
+
+  def process(self, points, startSequence):
+    """Scores each point then updates the tree with it.
+
+    @param points         (list)  Points, tuples of floats.
+    @param startSequence  (int)   Sequence number of the first point.
+
+    @return (list) Raw score of each point.
+    """
+    scores = []
+    for i, point in enumerate(points):
+      scores.append(self.score(point))
+      self.update(point, startSequence + i)
+    return scores
+
+
+  def update(self, point, sequence):
+    """Samples point, inserting it in the tree if it is kept."""
+    # Exponential time decay sampling, the points with the smallest weights
+    # are kept.
+    weight = (math.log(-math.log(1.0 - self.random.random())) -
+              sequence / self.timeDecay)
+    if len(self.sample) < self.sampleSize:
+      heapq.heappush(self.sample, (-weight, sequence))
+    elif weight < -self.sample[0][0]:
+      _, evicted = heapq.heapreplace(self.sample, (-weight, sequence))
+      self.delete(evicted)
+    else:
+      return
+    self.insert(point, sequence)
+
+
+  def score(self, point):
+    """Returns the anomaly score of point without changing the tree, 0 for an
+    empty tree. The score is about 1 for points like the sampled ones, and at
+    most log2(sampleSize + 1)."""
+    if self.root == -1:
+      return 0.0
+
+    d = self.dimensions
+    left = self.left
+    right = self.right
+    cutDimension = self.cutDimension
+    cutValue = self.cutValue
+
+    path = []
+    node = self.root
+    while left[node] != -1:
+      path.append(node)
+      if point[cutDimension[node]] <= cutValue[node]:
+        node = left[node]
+      else:
+        node = right[node]
+
+    depth = len(path)
+    treeMass = self.mass[self.root]
+    leafMass = self.mass[node]
+    if tuple(self.minValues[node * d:node * d + d]) == point:
+      score = ((1.0 - leafMass / (2.0 * treeMass)) /
+               (depth + math.log(leafMass + 1, 2)))
+    else:
+      score = 1.0 / (depth + 1)
+
+    # Going up, the point may be cut from the box of each ancestor before
+    # reaching it. Once inside a box it is inside all the enclosing ones.
+    minValues = self.minValues
+    maxValues = self.maxValues
+    while path:
+      node = path.pop()
+      span = 0.0
+      mergedSpan = 0.0
+      for k in range(d):
+        low = minValues[node * d + k]
+        high = maxValues[node * d + k]
+        value = point[k]
+        span += high - low
+        mergedSpan += max(high, value) - min(low, value)
+      if mergedSpan <= span:
+        break
+      separation = (mergedSpan - span) / mergedSpan
+      score = separation / (len(path) + 1) + (1.0 - separation) * score
+
+    return score * math.log(treeMass + 1, 2)
+
+
+  def insert(self, point, sequence):
+    d = self.dimensions
+    left = self.left
+    right = self.right
+    mass = self.mass
+    minValues = self.minValues
+    maxValues = self.maxValues
+
+    if self.root == -1:
+      self.root = self._newLeaf(point, sequence)
+      return
+
+    node = self.root
+    while True:
+      base = node * d
+      spans = []
+      for k in range(d):
+        spans.append(max(maxValues[base + k], point[k]) -
+                     min(minValues[base + k], point[k]))
+      total = sum(spans)
+
+      if total == 0.0:
+        # Copy of the point of this leaf, the ancestors are already counted
+        self.leaves[sequence] = node
+        mass[node] += 1
+        return
+
+      dimension, cut = self._randomCut(point, base, spans, total)
+
+      if cut < minValues[base + dimension]:
+        self._split(node, point, sequence, dimension, cut, leafOnLeft=True)
+        return
+      if cut >= maxValues[base + dimension]:
+        self._split(node, point, sequence, dimension, cut, leafOnLeft=False)
+        return
+
+      # The cut does not separate the point from the box, so the point goes
+      # below this branch.
+      mass[node] += 1
+      for k in range(d):
+        if point[k] < minValues[base + k]:
+          minValues[base + k] = point[k]
+        elif point[k] > maxValues[base + k]:
+          maxValues[base + k] = point[k]
+      if point[self.cutDimension[node]] <= self.cutValue[node]:
+        node = left[node]
+      else:
+        node = right[node]
+
+
+  def delete(self, sequence):
+    d = self.dimensions
+    left = self.left
+    right = self.right
+    parent = self.parent
+    mass = self.mass
+
+    leaf = self.leaves.pop(sequence)
+    if mass[leaf] > 1:
+      node = leaf
+      while node != -1:
+        mass[node] -= 1
+        node = parent[node]
+      return
+
+    branch = parent[leaf]
+    self.free.append(leaf)
+    if branch == -1:
+      self.root = -1
+      return
+
+    sibling = right[branch] if left[branch] == leaf else left[branch]
+    node = parent[branch]
+    parent[sibling] = node
+    if node == -1:
+      self.root = sibling
+    elif left[node] == branch:
+      left[node] = sibling
+    else:
+      right[node] = sibling
+    left[branch] = -1
+    right[branch] = -1
+    self.free.append(branch)
+
+    minValues = self.minValues
+    maxValues = self.maxValues
+    while node != -1:
+      mass[node] -= 1
+      base = node * d
+      leftBase = left[node] * d
+      rightBase = right[node] * d
+      for k in range(d):
+        minValues[base + k] = min(minValues[leftBase + k],
+                                  minValues[rightBase + k])
+        maxValues[base + k] = max(maxValues[leftBase + k],
+                                  maxValues[rightBase + k])
+      node = parent[node]
+
+
+  def _randomCut(self, point, base, spans, total):
+    """Draws a cut with dimension probability proportional to the span of the
+    box merged with point, returns (dimension, value)."""
+    while True:
+      r = self.random.random() * total
+      for dimension, span in enumerate(spans):
+        if r < span or dimension == len(spans) - 1:
+          break
+        r -= span
+      low = min(self.minValues[base + dimension], point[dimension])
+      cut = low + r
+      # Rounding may put the cut on the upper bound, which cuts nothing
+      if cut < low + spans[dimension]:
+        return dimension, cut
+
+
+  def _newLeaf(self, point, sequence):
+    leaf = self.free.pop()
+    d = self.dimensions
+    self.minValues[leaf * d:leaf * d + d] = point
+    self.maxValues[leaf * d:leaf * d + d] = point
+    self.mass[leaf] = 1
+    self.parent[leaf] = -1
+    self.left[leaf] = -1
+    self.right[leaf] = -1
+    self.leaves[sequence] = leaf
+    return leaf
+
+
+  def _split(self, node, point, sequence, dimension, cut, leafOnLeft):
+    """Replaces node with a branch cutting it from a new leaf of point."""
+    d = self.dimensions
+    leaf = self._newLeaf(point, sequence)
+    branch = self.free.pop()
+
+    up = self.parent[node]
+    self.parent[branch] = up
+    if up == -1:
+      self.root = branch
+    elif self.left[up] == node:
+      self.left[up] = branch
+    else:
+      self.right[up] = branch
+
+    if leafOnLeft:
+      self.left[branch], self.right[branch] = leaf, node
+    else:
+      self.left[branch], self.right[branch] = node, leaf
+    self.parent[node] = branch
+    self.parent[leaf] = branch
+    self.cutDimension[branch] = dimension
+    self.cutValue[branch] = cut
+    self.mass[branch] = self.mass[node] + 1
+    for k in range(d):
+      self.minValues[branch * d + k] = min(self.minValues[node * d + k],
+                                           point[k])
+      self.maxValues[branch * d + k] = max(self.maxValues[node * d + k],
+                                           point[k])
+
+
+
+class RandomCutForest(object):
+  """
+  Forest of random cut trees updated with a stream of points. The score of a
+  point is the average of the tree scores, computed before the point is used
+  to update the trees.
+  """
+
+  def __init__(self, numberOfTrees=100, sampleSize=256, timeDecay=100000,
+               dimensions=1, seed=42):
+    """
+    @param numberOfTrees  (int)    Number of trees.
+    @param sampleSize     (int)    Number of points sampled by each tree.
+    @param timeDecay      (float)  Sampling time decay, in records.
+    @param dimensions     (int)    Number of coordinates of the points.
+    @param seed           (int or numpy.random.SeedSequence)  Seed of the
+                                   forest. Trees are seeded with independent
+                                   streams spawned from it.
+    """
+    self.sampleSize = sampleSize
+    self.dimensions = dimensions
+    if not isinstance(seed, numpy.random.SeedSequence):
+      seed = numpy.random.SeedSequence(seed)
+    seeds = seed.spawn(numberOfTrees)
+    self.trees = [RandomCutTree(sampleSize, dimensions, timeDecay,
+                                int(s.generate_state(1)[0]))
+                  for s in seeds]
+    self.sequence = 0
+
+
+  def process(self, points):
+    """Scores a batch of points, updating the forest with each point after
+    scoring it.
+
+    @param points (numpy.ndarray)  Points, of shape (n, dimensions).
+
+    @return (numpy.ndarray) Score of each point.
+    """
+    points = [tuple(p) for p in numpy.asarray(points, dtype=float).tolist()]
+    scores = numpy.zeros(len(points))
+    for tree in self.trees:
+      scores += tree.process(points, self.sequence)
+    self.sequence += len(points)
+    return scores / len(self.trees)
+
+
+  def update(self, point):
+    """Returns the score of one point, then updates the forest with it."""
+    return self.process([point])[0]
@@ -0,0 +1,120 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+from __future__ import print_function
+
+import math
+import sys
+from collections import deque
+
+import numpy
+import pandas
+
+from nab.detectors.base import AnomalyDetector
+from nab.detectors.random_cut_forest.forest import RandomCutForest
+
+
+
+# Parameters of random_cut_forest.sql, which gave the best NAB scores with
+# AWS Kinesis Analytics.
+DEFAULT_PARAMETERS = {
+  "numberOfTrees": 100,
+  "sampleSize": 256,
+  "timeDecay": 100000,
+  "shingleSize": 1,
+  "seed": 42,
+}
+
+# Number of records the forest is updated with at once by run()
+BATCH_SIZE = 1000
+
+
+
+class RandomCutForestDetector(AnomalyDetector):
+  """
+  Robust Random Cut Forest computed locally, see forest.py. Scores are
+  normalized by log2(sampleSize) to be within [0, 1], like the scores of
+  random_cut_forest.sql.
+  """
+
+  def __init__(self, *args, **kwargs):
+    # Optional overrides of DEFAULT_PARAMETERS, as used by nab/paramsearch.py
+    parameters = kwargs.pop("parameters", None)
+
+    super(RandomCutForestDetector, self).__init__(*args, **kwargs)
+
+    self.parameters = dict(DEFAULT_PARAMETERS)
+    if parameters is not None:
+      self.parameters.update(parameters)
+
+    self.forest = None
+    self.shingle = None
+
+
+  def initialize(self):
+    self.forest = RandomCutForest(
+      numberOfTrees=self.parameters["numberOfTrees"],
+      sampleSize=self.parameters["sampleSize"],
+      timeDecay=self.parameters["timeDecay"],
+      dimensions=self.parameters["shingleSize"],
+      seed=self.getSeedSequence(self.parameters["seed"]))
+    self.shingle = deque(maxlen=self.parameters["shingleSize"])
+
+
+  def normalize(self, scores):
+    return numpy.minimum(
+      1.0, scores / math.log(self.parameters["sampleSize"], 2))
+
+
+  def handleRecord(self, inputData):
+    """Returns a tuple (anomalyScore). Records are scored once a whole shingle
+    of values is available, before that the score is 0.
+    """
+    self.shingle.append(float(inputData["value"]))
+    if len(self.shingle) < self.shingle.maxlen:
+      return (0.0, )
+
+    score = self.forest.update(tuple(self.shingle))
+    return (float(self.normalize(score)), )
+
+
+  def run(self):
+    """Same results as scoring the records one by one with handleRecord, but
+    updates the forest with batches of records.
+    """
+    data = self.dataSet.data
+    values = data["value"].values.astype(float)
+    shingleSize = self.parameters["shingleSize"]
+
+    scores = numpy.zeros(len(values))
+    if len(values) >= shingleSize:
+      # Row i is the shingle ending with record i + shingleSize - 1
+      shingles = numpy.lib.stride_tricks.sliding_window_view(values,
+                                                             shingleSize)
+      for start in range(0, len(shingles), BATCH_SIZE):
+        batch = shingles[start:start + BATCH_SIZE]
+        scores[start + shingleSize - 1:
+               start + shingleSize - 1 + len(batch)] = self.forest.process(batch)
+        print(".", end=' ')
+        sys.stdout.flush()
+
+    results = data.copy()
+    results["anomaly_score"] = self.normalize(scores)
+    return pandas.DataFrame(results, columns=self.getHeader())
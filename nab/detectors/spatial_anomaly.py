@@ -0,0 +1,75 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Spatial anomalies: values out of the range of the values seen so far.
+
+Used by the HTM based detectors to flag such values regardless of their model,
+and as a detector on its own by the threshold detector. Since they only depend
+on the values, they are computed for a whole data file at once.
+
+Also imported by the Python 2 detectors, see python2.py.
+"""
+
+import numpy
+
+# Fraction outside of the range of values seen so far that will be considered
+# a spatial anomaly regardless of the anomaly likelihood calculation. This
+# accounts for the human labelling bias for spatial values larger than what
+# has been seen so far.
+SPATIAL_TOLERANCE = 0.05
+
+
+
+def spatialAnomalies(values, tolerance=SPATIAL_TOLERANCE):
+  """Returns whether each value is a spatial anomaly, i.e. it is out of the
+  range of the previous values widened by tolerance times its width on each
+  side. There is no spatial anomaly until the previous values differ.
+
+  @param values     (numpy.ndarray)  Values of a data file, in order.
+  @param tolerance  (float)          Fraction of the range of the previous
+                                     values allowed outside of it.
+
+  @return (numpy.ndarray) Boolean array with an element per value.
+  """
+  values = numpy.asarray(values)
+
+  # Min/max of the values before each one, the first value has none
+  minVals = numpy.empty(len(values))
+  maxVals = numpy.empty(len(values))
+  minVals[1:] = numpy.minimum.accumulate(values[:-1])
+  maxVals[1:] = numpy.maximum.accumulate(values[:-1])
+  minVals[:1] = maxVals[:1] = numpy.nan
+
+  margin = (maxVals - minVals) * tolerance
+  return ((minVals != maxVals) &
+          ((values > maxVals + margin) | (values < minVals - margin)))
+
+
+def setSpatialAnomalies(results, tolerance=SPATIAL_TOLERANCE):
+  """Sets the "anomaly_score" of the spatial anomalies of results to 1.0.
+
+  @param results    (pandas.DataFrame)  Results of a detector, with "value"
+                                        and "anomaly_score" columns.
+  @param tolerance  (float)             See spatialAnomalies().
+  """
+  anomalies = spatialAnomalies(results["value"].values, tolerance)
+  results.loc[anomalies, "anomaly_score"] = 1.0
+  return results
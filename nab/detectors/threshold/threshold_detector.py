@@ -4,32 +4,29 @@ Hence, this file is for demonstrating how "powerful" it is on NAB.
 """
 
 from nab.detectors.base import AnomalyDetector
-
-SPATIAL_TOLERANCE = 0.05
+from nab.detectors.spatial_anomaly import spatialAnomalies
 
 class ThresholdDetector(AnomalyDetector):
     def __init__(self, *args, **kwargs):
         super(ThresholdDetector, self).__init__(*args, **kwargs)
 
-        self.minVal = None
-        self.maxVal = None
+        # Spatial anomalies of the whole data file, see spatial_anomaly.py
+        self.spatialAnomalies = None
+        self.recordIndex = 0
 
-    def handleRecord(self, inputData):
-        ts = inputData["timestamp"]
-        val = inputData["value"]
+    def initialize(self):
+        self.spatialAnomalies = spatialAnomalies(
+            self.dataSet.data["value"].values)
+        self.recordIndex = 0
 
-        spatialAnomaly = 0.0
+    def handleRecord(self, inputData):
+        spatialAnomaly = float(self.spatialAnomalies[self.recordIndex])
+        self.recordIndex += 1
 
-        # Update min/max values and check if there is a spatial anomaly
-        if self.minVal != self.maxVal:
-            tolerance = (self.maxVal - self.minVal) * SPATIAL_TOLERANCE
-            maxExpected = self.maxVal + tolerance
-            minExpected = self.minVal - tolerance
-            if val > maxExpected or val < minExpected:
-                spatialAnomaly = 1.0
-        if self.maxVal is None or val > self.maxVal:
-            self.maxVal = val
-        if self.minVal is None or val < self.minVal:
-            self.minVal = val
+        return (spatialAnomaly,)
 
-        return (spatialAnomaly,)
\ No newline at end of file
+    def run(self):
+        """Same results as handleRecord, for the whole file at once."""
+        results = self.dataSet.data.copy()
+        results["anomaly_score"] = self.spatialAnomalies.astype(float)
+        return results
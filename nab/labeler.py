@@ -20,6 +20,11 @@
 
 import datetime
 import itertools
+import multiprocessing
+try:
+  from collections.abc import Mapping
+except ImportError: # Python 2
+  from collections import Mapping
 import numpy
 import os
 try:
@@ -39,6 +44,7 @@ from nab.util import (absoluteFilePaths,
                       strp,
                       deepmap,
                       createPath,
+                      labelVector,
                       writeJSON)
 
 
@@ -100,6 +106,187 @@ def checkForOverlap(labels, buffer, labelsFileName, dataFileName):
 
 
 
+def parseTimestamps(times):
+  """
+  Parses the timestamps of a label file to a numpy.datetime64 array.
+  """
+  if len(times) == 0:
+    return numpy.array([], dtype="datetime64[ns]")
+  try:
+    parsed = pandas.to_datetime(times)
+  except (ValueError, TypeError):
+    parsed = pandas.to_datetime([strp(t) for t in times])
+  return numpy.asarray(parsed, dtype="datetime64[ns]")
+
+
+def bucketSorted(rawTimes, buffer):
+  """
+  Vectorized bucket() of a sorted numpy.datetime64 array: a bucket holds the
+  timestamps within buffer of its first one.
+  """
+  rawBuckets = []
+  start = 0
+  while start < len(rawTimes):
+    end = numpy.searchsorted(rawTimes, rawTimes[start] + buffer, side="right")
+    rawBuckets.append(rawTimes[start:end])
+    start = end
+
+  return rawBuckets
+
+
+def mergeBuckets(rawBuckets, threshold):
+  """
+  merge() of the buckets of bucketSorted(): the most frequent timestamp of each
+  bucket holding at least threshold labels, the earliest one on ties.
+  """
+  truths = []
+  passed = []
+
+  for bucket in rawBuckets:
+    if len(bucket) >= threshold:
+      times, counts = numpy.unique(bucket, return_counts=True)
+      truths.append(times[counts.argmax()])
+    else:
+      passed.append(bucket)
+
+  return truths, passed
+
+
+def toDatetime(t):
+  """Converts a numpy.datetime64 to a datetime.datetime."""
+  return Timestamp(t).to_pydatetime()
+
+
+def combineFileLabels(args):
+  """
+  Function called in each label combining process to combine the raw labels of
+  a data file.
+
+  @param args   (tuple)   Contains:
+    relativePath  (string)          Relative path of the data file.
+    timestamps    (numpy.ndarray)   Timestamps of the data file.
+    rawLabels     (list)            (path, timestamps) of the labels of the data
+                                    file in each raw label file, to check them.
+    userLabels    (list)            (path, timestamps) of the labels of the
+                                    data file by each user labeling it.
+    knownLabels   (numpy.ndarray)   Timestamps of the known anomalies of the
+                                    data file, or None to combine the user
+                                    labels.
+    threshold     (float)           Agreement threshold.
+    windowSize    (float)           Estimated size of an anomaly window, as a
+                                    ratio of the dataset length.
+
+  @return       (tuple)   Relative path, true anomalies, their indices and the
+                          raw labels that did not pass the threshold, None if
+                          no user labels were combined.
+  """
+  (relativePath, timestamps, rawLabels, userLabels, knownLabels, threshold,
+   windowSize) = args
+
+  index = pandas.Index(timestamps)
+  for path, times in rawLabels:
+    if len(index.get_indexer_non_unique(times)[1]):
+      raise ValueError("In the label file %s, one of the timestamps used for "
+                       "the datafile %s doesn't match; it does not exist in "
+                       "the file. Timestamps in json label files have to "
+                       "exactly match timestamps in corresponding datafiles."
+                       % (path, relativePath))
+
+  passedAnomalies = None
+  if knownLabels is not None:
+    trueAnomalies = list(knownLabels)
+
+  else:
+    # Calculate the window buffer -- used for bucketing labels identifying
+    # the same anomaly.
+    granularity = Timestamp(timestamps[1]) - Timestamp(timestamps[0])
+    buffer = datetime.timedelta(minutes=
+      granularity.total_seconds()/60 * len(timestamps) * windowSize/10)
+
+    for path, times in userLabels:
+      if (numpy.diff(times) <= numpy.timedelta64(buffer)).any():
+        checkForOverlap([toDatetime(t) for t in times], buffer, path,
+                        relativePath)
+
+    # Bucket and merge the anomaly timestamps.
+    rawTimes = numpy.sort(numpy.concatenate(
+      [times for _, times in userLabels] +
+      [numpy.array([], dtype="datetime64[ns]")]))
+    trueAnomalies, passed = mergeBuckets(
+      bucketSorted(rawTimes, numpy.timedelta64(buffer)),
+      len(userLabels) * threshold)
+    if userLabels:
+      passedAnomalies = [[toDatetime(t) for t in bucket] for bucket in passed]
+
+  indices = numpy.unique(index.get_indexer_non_unique(
+    numpy.array(trueAnomalies, dtype="datetime64[ns]"))[0])
+
+  return (relativePath,
+          [toDatetime(t) for t in trueAnomalies],
+          indices.tolist(),
+          passedAnomalies)
+
+
+def windowIntervals(timestamps, windows):
+  """
+  Returns the rows of a data file in its anomaly windows, as (first, last)
+  row intervals, inclusive. Windows without rows have no interval.
+
+  @param timestamps (pandas.Series)  Timestamps of the data file.
+  @param windows    (list)           (start, end) timestamps of the windows.
+
+  @return           (numpy.ndarray)  Intervals, one row each.
+  """
+  if not windows:
+    return numpy.empty((0, 2), dtype=numpy.int64)
+
+  if timestamps.is_monotonic_increasing:
+    starts = timestamps.searchsorted([Timestamp(t1) for t1, _ in windows],
+                                     side="left")
+    ends = timestamps.searchsorted([Timestamp(t2) for _, t2 in windows],
+                                   side="right") - 1
+    intervals = numpy.column_stack((starts, ends)).astype(numpy.int64)
+    return intervals[intervals[:, 0] <= intervals[:, 1]]
+
+  # Rows out of order: runs of consecutive rows in the windows
+  inWindow = numpy.zeros(len(timestamps) + 2, dtype=numpy.int8)
+  for t1, t2 in windows:
+    inWindow[1:-1] |= ((timestamps >= t1) & (timestamps <= t2)).values
+  changes = numpy.flatnonzero(numpy.diff(inWindow))
+  return numpy.column_stack((changes[::2], changes[1::2] - 1))
+
+
+
+class LabelFrames(Mapping):
+  """
+  Dense labels of the data files of a CorpusLabel, by relative path: a
+  DataFrame with the timestamp and label columns of a file, built from its
+  label intervals when it is accessed.
+  """
+
+  def __init__(self, corpusLabel):
+    self.corpusLabel = corpusLabel
+
+
+  def __getitem__(self, relativePath):
+    return pandas.DataFrame({
+      "timestamp": self.corpusLabel.getTimestamps(relativePath),
+      "label": self.corpusLabel.getLabelVector(relativePath)})
+
+
+  def __contains__(self, relativePath):
+    return relativePath in self.corpusLabel.intervals
+
+
+  def __iter__(self):
+    return iter(self.corpusLabel.intervals)
+
+
+  def __len__(self):
+    return len(self.corpusLabel.intervals)
+
+
+
 class CorpusLabel(object):
   """
   Class to store and manipulate a single set of labels for the whole
@@ -118,6 +305,7 @@ class CorpusLabel(object):
     self.path = path
 
     self.windows = None
+    self.intervals = None
     self.labels = None
 
     self.corpus = corpus
@@ -194,29 +382,65 @@ class CorpusLabel(object):
 
   def getLabels(self):
     """
-    Get Labels as a dictionary of key-value pairs of a relative path and its
-    corresponding binary vector of anomaly labels. Labels are simply a more
-    verbose version of the windows.
+    Get the labels of each data file as the (first, last) row intervals of its
+    windows, in a dictionary of key-value pairs of a relative path and its
+    intervals. The dense labels, a binary vector of anomaly labels, are only
+    built on demand: by getLabelVector(), or as a DataFrame with the timestamps
+    of the file by self.labels[relativePath].
     """
-    self.labels = {}
+    self.intervals = {}
 
     for relativePath, dataSet in self.corpus.dataFiles.items():
       if relativePath in self.windows:
-        windows = self.windows[relativePath]
+        self.intervals[relativePath] = windowIntervals(
+          dataSet.data["timestamp"], self.windows[relativePath])
+
+      else:
+        print("Warning: no label for datafile",relativePath)
+
+    self.labels = LabelFrames(self)
 
-        labels = pandas.DataFrame({"timestamp": dataSet.data["timestamp"]})
-        labels['label'] = 0
 
-        for t1, t2 in windows:
-          moreThanT1 = labels[labels["timestamp"] >= t1]
-          betweenT1AndT2 = moreThanT1[moreThanT1["timestamp"] <= t2]
-          indices = betweenT1AndT2.loc[:,"label"].index
-          labels["label"].values[indices.values] = 1
+  def getTimestamps(self, relativePath):
+    """
+    Timestamps of a data file, the column of its DataFile rather than a copy.
+    """
+    return self.corpus.dataFiles[relativePath].data["timestamp"]
 
-        self.labels[relativePath] = labels
 
-      else:
-        print("Warning: no label for datafile",relativePath)
+  def getLabelVector(self, relativePath):
+    """
+    Binary vector of the anomaly labels of a data file, 1 in its windows.
+    """
+    return labelVector(self.intervals[relativePath],
+                       len(self.corpus.dataFiles[relativePath].data))
+
+
+class RawLabels(object):
+  """
+  The labels of a raw label file, i.e. of a single labeler, as timestamps.
+  """
+
+  def __init__(self, path, corpus):
+    """
+    @param path    (string)      Name of the raw label file.
+    @param corpus  (nab.Corpus)  Corpus object.
+    """
+    self.path = path
+
+    with open(path) as labelFile:
+      labels = json.load(labelFile)
+
+    for relativePath, times in labels.items():
+      if times and relativePath not in corpus.dataFiles:
+        raise KeyError(relativePath)
+
+    # Parse all the timestamps at once, then split them by data file
+    allTimes = parseTimestamps(list(itertools.chain.from_iterable(
+      labels.values())))
+    ends = numpy.cumsum([len(times) for times in labels.values()])
+    self.windows = dict(zip(labels, numpy.split(allTimes, ends[:-1])))
+
 
 
 class LabelCombiner(object):
@@ -231,7 +455,7 @@ class LabelCombiner(object):
 
   def __init__(self, labelDir, corpus,
                      threshold, windowSize,
-                     probationaryPercent, verbosity):
+                     probationaryPercent, verbosity, numCPUs=None):
     """
     @param labelDir   (string)   A directory name containing user label files.
                                  This directory should contain one label file
@@ -247,6 +471,8 @@ class LabelCombiner(object):
                                  ratio the dataset length.
     @param verbosity  (int)      0, 1, or 2 to print out select labeling
                                  metrics; 0 is none, 2 is the most.
+    @param numCPUs    (int)      Number of processes combining the labels of
+                                 the data files, all CPUs by default.
     """
     self.labelDir = labelDir
     self.corpus = corpus
@@ -254,6 +480,7 @@ class LabelCombiner(object):
     self.windowSize = windowSize
     self.probationaryPercent = probationaryPercent
     self.verbosity = verbosity
+    self.numCPUs = numCPUs
 
     self.userLabels = None
     self.nLabelers = None
@@ -292,15 +519,17 @@ class LabelCombiner(object):
 
 
   def getRawLabels(self):
-    """Collect the raw user labels from specified directory."""
+    """Collect the raw user labels from specified directory. Each label file
+    is read once; its timestamps are checked against the data files when they
+    are combined."""
     labelPaths = absoluteFilePaths(self.labelDir)
     self.userLabels = []
     self.knownLabels = []
     for path in labelPaths:
       if "known" in path:
-        self.knownLabels.append(CorpusLabel(path, self.corpus))
+        self.knownLabels.append(RawLabels(path, self.corpus))
       else:
-        self.userLabels.append(CorpusLabel(path, self.corpus))
+        self.userLabels.append(RawLabels(path, self.corpus))
 
     self.nLabelers = len(self.userLabels)
     if self.nLabelers == 0:
@@ -320,57 +549,50 @@ class LabelCombiner(object):
     labeled because we know the direct causes of the anomalies. They are added
     as if they are the result of the bucket-merge process.
 
+    The data files are combined in parallel by combineFileLabels().
+
     If verbosity > 0, the dictionary passedLabels -- the raw labels that did not
     pass the threshold qualification -- is printed to the console.
     """
-    def setTruthLabels(dataSet, trueAnomalies):
-      """Returns the indices of the ground truth anomalies for a data file."""
-      timestamps = dataSet.data["timestamp"]
-      labels = numpy.array(timestamps.isin(trueAnomalies), dtype=int)
-      return [i for i in range(len(labels)) if labels[i]==1]
-
-    self.labelTimestamps = {}
-    self.labelIndices = {}
+    args = []
     for relativePath, dataSet in self.corpus.dataFiles.items():
-      if ("Known" in relativePath) or ("artificial" in relativePath):
-        knownAnomalies = self.knownLabels[0].windows[relativePath]
-        self.labelTimestamps[relativePath] = [str(t) for t in knownAnomalies]
-        self.labelIndices[relativePath] = setTruthLabels(dataSet, knownAnomalies)
-        continue
+      rawLabels = [(labels.path, labels.windows[relativePath])
+                   for labels in self.userLabels + self.knownLabels
+                   if relativePath in labels.windows]
 
-      # Calculate the window buffer -- used for bucketing labels identifying
-      # the same anomaly.
-      granularity = dataSet.data["timestamp"][1] - dataSet.data["timestamp"][0]
-      buffer = datetime.timedelta(minutes=
-        granularity.total_seconds()/60 * len(dataSet.data) * self.windowSize/10)
-
-      rawTimesLists = []
-      userCount = 0
-      for user in self.userLabels:
-        if relativePath in user.windows:
-          # the user has labels for this file
-          checkForOverlap(
-            user.windows[relativePath], buffer, user.path, relativePath)
-          rawTimesLists.append(user.windows[relativePath])
-          userCount += 1
-      if not rawTimesLists:
-        # no labeled anomalies for this data file
-        self.labelTimestamps[relativePath] = []
-        self.labelIndices[relativePath] = setTruthLabels(dataSet, [])
-        continue
+      if ("Known" in relativePath) or ("artificial" in relativePath):
+        userLabels = []
+        knownLabels = self.knownLabels[0].windows[relativePath]
       else:
-        rawTimes = list(itertools.chain.from_iterable(rawTimesLists))
-        rawTimes.sort()
-
-      # Bucket and merge the anomaly timestamps.
-      threshold = userCount * self.threshold
-      trueAnomalies, passedAnomalies = merge(
-        bucket(rawTimes, buffer), threshold)
+        userLabels = [(labels.path, labels.windows[relativePath])
+                      for labels in self.userLabels
+                      if relativePath in labels.windows]
+        knownLabels = None
+
+      args.append((relativePath,
+                   dataSet.data["timestamp"].values,
+                   rawLabels,
+                   userLabels,
+                   knownLabels,
+                   self.threshold,
+                   self.windowSize))
+
+    pool = multiprocessing.Pool(self.numCPUs)
+    try:
+      # Using `map_async` instead of `map` so interrupts are properly handled.
+      # See: http://stackoverflow.com/a/1408476
+      results = pool.map_async(combineFileLabels, args).get(99999999)
+    finally:
+      pool.close()
+      pool.join()
 
+    self.labelTimestamps = {}
+    self.labelIndices = {}
+    for relativePath, trueAnomalies, indices, passedAnomalies in results:
       self.labelTimestamps[relativePath] = [str(t) for t in trueAnomalies]
-      self.labelIndices[relativePath] = setTruthLabels(dataSet, trueAnomalies)
+      self.labelIndices[relativePath] = indices
 
-      if self.verbosity>0:
+      if self.verbosity>0 and passedAnomalies is not None:
         print("----")
         print("For %s the passed raw labels and qualified true labels are,"\
               " respectively:" % relativePath)
@@ -426,8 +648,8 @@ class LabelCombiner(object):
 
       windows = []
       for a in anomalies:
-        front = max(a - windowLength/2, 0)
-        back = min(a + windowLength/2, length-1)
+        front = max(a - windowLength//2, 0)
+        back = min(a + windowLength//2, length-1)
 
         windowLimit = [strf(data["timestamp"][front]),
                        strf(data["timestamp"][back])]
@@ -74,12 +74,11 @@ def optimizeThreshold(args):
 
     try:
       windows = corpusLabel.windows[relativePath]
-      labels = corpusLabel.labels[relativePath]
+      timestamps = corpusLabel.getTimestamps(relativePath)
     except KeyError:
       print("Does not contain file: "+str(relativePath))
       continue
 
-    timestamps = labels['timestamp']
     anomalyScores = dataSet.data["anomaly_score"]
 
     curAnomalyRows = sweeper.calcSweepScore(
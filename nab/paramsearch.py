@@ -0,0 +1,435 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014-2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+In-process parameter search for detectors taking a `parameters` dict, such as
+`HtmcoreDetector`.
+
+Candidates are run on the corpus by the Runner's process pool, all candidates
+at once, and their results are kept in memory. They are then scored by the
+same optimizeThreshold() and scoreCorpus() functions as `run.py`, and the
+scores are normalized against the null detector.
+
+Candidates can also be evaluated on a subset of the corpus. successiveHalving()
+evaluates many candidates on a small stratified subset first, and only the best
+ones on larger subsets up to the whole corpus. Detection results are cached,
+so files are not run again when a candidate moves up.
+"""
+
+import copy
+import math
+import os
+import random
+from functools import partial
+
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+from nab.detectors.null.null_detector import NullDetector
+from nab.optimizer import optimizeThreshold
+from nab.runner import Runner
+from nab.scorer import normalizeScores, scoreCorpus
+
+
+
+def mergeParameters(parameters, overrides):
+  """Returns a deep copy of parameters updated with the nested overrides.
+
+  @param parameters (dict)  Default parameters, left untouched.
+  @param overrides  (dict)  Values to replace, e.g. {"sp": {"boostStrength": 1}}
+  """
+  merged = copy.deepcopy(parameters)
+  for key, value in overrides.items():
+    if isinstance(value, dict) and isinstance(merged.get(key), dict):
+      merged[key] = mergeParameters(merged[key], value)
+    else:
+      merged[key] = copy.deepcopy(value)
+  return merged
+
+
+
+class ResultsFile(object):
+  """Detection results of a data file held in memory."""
+
+  def __init__(self, data):
+    self.data = data
+
+
+
+class ResultsCorpus(object):
+  """
+  Detection results of a corpus held in memory. Like nab.corpus.Corpus, the
+  keys of dataFiles are relative paths in the detector's results directory.
+  """
+
+  def __init__(self, detectorName, results):
+    """
+    @param detectorName (string)  Name of the detector.
+    @param results      (dict)    Data file relative paths mapped to the
+                                  detector's results (pandas.DataFrame).
+    """
+    self.dataFiles = {}
+    for relativePath, data in results.items():
+      relativeDir, fileName = os.path.split(relativePath)
+      resultsPath = os.path.join(relativeDir, detectorName + "_" + fileName)
+      self.dataFiles[resultsPath] = ResultsFile(data)
+    self.numDataFiles = len(self.dataFiles)
+
+
+
+def cacheKey(parameters):
+  """Key of the detection results of a candidate in ParameterSearch.cache."""
+  return json.dumps(parameters, sort_keys=True)
+
+
+def detectCandidate(args):
+  """
+  Function called in each pool process to run one candidate on one file.
+
+  @param args   (tuple)   Candidate index, detector constructor, detector
+                          name, data file, probationary percent and relative
+                          path.
+
+  @return       (tuple)   Candidate index, relative path and the detector
+                          results (pandas.DataFrame).
+  """
+  (i, detectorConstructor, detectorName, dataSet, probationaryPercent,
+   relativePath) = args
+
+  detector = detectorConstructor(dataSet=dataSet,
+                                 probationaryPercent=probationaryPercent)
+  detector.setTask(detectorName, relativePath)
+  detector.initialize()
+  results = detector.run()
+
+  return i, relativePath, results[["timestamp", "anomaly_score"]]
+
+
+
+class ParameterSearch(object):
+  """
+  Evaluates parameter candidates of a detector on a NAB corpus without writing
+  results files.
+  """
+
+  def __init__(self,
+               dataDir,
+               labelPath,
+               profilesPath,
+               detectorClass,
+               detectorName,
+               numCPUs=None,
+               logPath=None):
+    """
+    @param dataDir        (string)  Directory where all the raw datasets exist.
+
+    @param labelPath      (string)  Path where the labels of the datasets
+                                    exist.
+
+    @param profilesPath   (string)  Path to JSON file containing application
+                                    profiles and associated cost matrices.
+
+    @param detectorClass  (type)    AnomalyDetector subclass accepting a
+                                    `parameters` keyword argument.
+
+    @param detectorName   (string)  Name used for the detector's results.
+
+    @param numCPUs        (int)     Number of processes evaluating candidates.
+
+    @param logPath        (string)  Optional file to which every evaluated
+                                    candidate and its scores are appended, one
+                                    JSON object per line.
+    """
+    self.runner = Runner(dataDir=dataDir,
+                         resultsDir=None,
+                         labelPath=labelPath,
+                         profilesPath=profilesPath,
+                         thresholdPath=None,
+                         numCPUs=numCPUs)
+    self.runner.initialize()
+
+    self.detectorClass = detectorClass
+    self.detectorName = detectorName
+    self.logPath = logPath
+
+    # Detection results by candidate (JSON of its parameters) and data file,
+    # only kept for the candidates evaluated again on more files
+    self.cache = {}
+    # Scores of the null detector for each profile, by set of data files
+    self.baselines = {}
+
+
+  def getRelativePaths(self):
+    """Returns the relative paths of the labelled data files, sorted."""
+    return sorted(relativePath for relativePath in self.runner.corpus.dataFiles
+                  if relativePath in self.runner.corpusLabel.intervals)
+
+
+  def detect(self, detectorConstructors, relativePaths=None):
+    """Runs detectors on labelled files of the corpus.
+
+    @param detectorConstructors (list)  Detector class constructors.
+    @param relativePaths        (list)  Data files to run on, defaults to all
+                                        the labelled files.
+
+    @return (list) For each constructor, a dict mapping relative paths to the
+                   detector's results.
+    """
+    if relativePaths is None:
+      relativePaths = self.getRelativePaths()
+    return self._detect([(detectorConstructor, relativePaths)
+                         for detectorConstructor in detectorConstructors])
+
+
+  def _detect(self, tasks):
+    """Runs (detector constructor, relative paths) tasks on the pool."""
+    runner = self.runner
+    args = []
+    for i, (detectorConstructor, relativePaths) in enumerate(tasks):
+      for relativePath in relativePaths:
+        args.append((i,
+                     detectorConstructor,
+                     self.detectorName,
+                     runner.corpus.dataFiles[relativePath],
+                     runner.probationaryPercent,
+                     relativePath))
+
+    # Using `map_async` instead of `map` so interrupts are properly handled.
+    # See: http://stackoverflow.com/a/1408476
+    results = runner.pool.map_async(detectCandidate, args).get(99999999)
+
+    candidateResults = [{} for _ in tasks]
+    for i, relativePath, data in results:
+      candidateResults[i][relativePath] = data
+    return candidateResults
+
+
+  def detectCached(self, keys, detectorConstructors, relativePaths):
+    """Like detect() but only runs files missing from the results cache.
+
+    @param keys                 (list)  Cache key of each constructor.
+    @param detectorConstructors (list)  Detector class constructors.
+    @param relativePaths        (list)  Data files to run on.
+
+    @return (list) For each constructor, a dict mapping relative paths to the
+                   detector's results.
+    """
+    tasks = []
+    pending = []
+    for key, detectorConstructor in zip(keys, detectorConstructors):
+      cached = self.cache.setdefault(key, {})
+      missing = [p for p in relativePaths if p not in cached]
+      if missing and key not in pending:
+        tasks.append((detectorConstructor, missing))
+        pending.append(key)
+
+    for key, results in zip(pending, self._detect(tasks)):
+      self.cache[key].update(results)
+
+    return [{p: self.cache[key][p] for p in relativePaths} for key in keys]
+
+
+  def score(self, detectorName, results):
+    """Optimizes the threshold of each profile and scores the results.
+
+    @param detectorName (string)  Name of the detector.
+    @param results      (dict)    Results of the detector, see detect().
+
+    @return (dict) Profile names mapped to the raw score of the detector.
+    """
+    runner = self.runner
+    resultsCorpus = ResultsCorpus(detectorName, results)
+
+    scores = {}
+    for profileName, profile in runner.profiles.items():
+      costMatrix = profile["CostMatrix"]
+      threshold = optimizeThreshold((detectorName,
+                                     costMatrix,
+                                     resultsCorpus,
+                                     runner.corpusLabel,
+                                     runner.probationaryPercent))["threshold"]
+      resultsDF = scoreCorpus(threshold,
+                              (runner.pool,
+                               detectorName,
+                               profileName,
+                               costMatrix,
+                               "",  # no results directory, nothing written
+                               resultsCorpus,
+                               runner.corpusLabel,
+                               runner.probationaryPercent,
+                               False))
+      scores[profileName] = resultsDF["Score"].iloc[-1]
+    return scores
+
+
+  def normalize(self, scores, relativePaths=None):
+    """Normalizes raw scores the same way as Runner.normalize().
+
+    @param scores         (dict)  Profile names mapped to raw scores.
+    @param relativePaths  (list)  Data files the scores were computed on,
+                                  defaults to all the labelled files.
+
+    @return (dict) Profile names mapped to normalized scores.
+    """
+    if relativePaths is None:
+      relativePaths = self.getRelativePaths()
+
+    baselineKey = tuple(sorted(relativePaths))
+    if baselineKey not in self.baselines:
+      nullResults, = self.detectCached(["null"], [NullDetector], relativePaths)
+      self.baselines[baselineKey] = self.score("null", nullResults)
+    baselines = self.baselines[baselineKey]
+
+    runner = self.runner
+    tpCount = sum(len(runner.corpusLabel.windows[relativePath])
+                  for relativePath in relativePaths)
+
+    return normalizeScores({self.detectorName: scores}, baselines, tpCount,
+                           runner.profiles)[self.detectorName]
+
+
+  def evaluate(self, candidates, relativePaths=None, keepResults=False):
+    """Runs, scores and normalizes parameter candidates concurrently.
+
+    The detection results of the candidates are dropped once scored, unless
+    keepResults is set: evaluating a candidate again on more files then only
+    runs the new files, see successiveHalving().
+
+    @param candidates     (list)  Parameter dicts, passed to the detector as its
+                                  `parameters` keyword argument.
+    @param relativePaths  (list)  Data files to evaluate on, defaults to all
+                                  the labelled files.
+    @param keepResults    (bool)  Keep the detection results of the candidates
+                                  in the cache, see forget().
+
+    @return (list) For each candidate, a dict of normalized scores by profile.
+    """
+    if relativePaths is None:
+      relativePaths = self.getRelativePaths()
+
+    keys = [cacheKey(parameters) for parameters in candidates]
+    constructors = [partial(self.detectorClass, parameters=parameters)
+                    for parameters in candidates]
+    candidateResults = self.detectCached(keys, constructors, relativePaths)
+
+    finalScores = []
+    for parameters, results in zip(candidates, candidateResults):
+      scores = self.normalize(self.score(self.detectorName, results),
+                              relativePaths)
+      finalScores.append(scores)
+      self.log(parameters, scores, len(relativePaths))
+
+    if not keepResults:
+      self.forget(candidates)
+    return finalScores
+
+
+  def forget(self, candidates):
+    """Drops the cached detection results of candidates.
+
+    @param candidates (list)  Parameter dicts.
+    """
+    for parameters in candidates:
+      self.cache.pop(cacheKey(parameters), None)
+
+
+  def stratifiedSubsets(self, numRungs, eta, seed=0):
+    """Returns nested subsets of the labelled data files, smallest first.
+
+    Each subset holds about a fraction eta^-(numRungs - 1 - rung) of the files
+    of every data category (top level directory), at least one, and the last
+    one is the whole corpus.
+
+    @param numRungs (int)   Number of subsets.
+    @param eta      (int)   Growth factor between consecutive subsets.
+    @param seed     (int)   Seed of the order in which files are picked.
+    """
+    categories = {}
+    for relativePath in self.getRelativePaths():
+      # Corpus keys are joined with os.sep
+      category = relativePath.replace(os.sep, "/").split("/")[0]
+      categories.setdefault(category, []).append(relativePath)
+
+    rng = random.Random(seed)
+    for relativePaths in categories.values():
+      rng.shuffle(relativePaths)
+
+    subsets = []
+    for rung in range(numRungs):
+      fraction = float(eta) ** (rung - numRungs + 1)
+      subset = []
+      for relativePaths in categories.values():
+        count = max(1, int(math.ceil(fraction * len(relativePaths))))
+        subset.extend(relativePaths[:count])
+      subsets.append(sorted(subset))
+    return subsets
+
+
+  def successiveHalving(self, candidates, eta=3, numRungs=3,
+                        profileName="standard", seed=0):
+    """Evaluates candidates on growing subsets of the corpus, promoting the
+    best 1/eta of them to the next subset. The last subset is the whole
+    corpus. Detection results of earlier rungs are reused.
+
+    @param candidates   (list)    Parameter dicts.
+    @param eta          (int)     Reduction factor of candidates and growth
+                                  factor of the subsets between rungs.
+    @param numRungs     (int)     Number of rungs.
+    @param profileName  (string)  Profile whose score ranks the candidates.
+    @param seed         (int)     Seed of the subset selection.
+
+    @return (list) (parameters, scores) of the candidates evaluated on the
+                   whole corpus, best first.
+    """
+    survivors = list(candidates)
+    for rung, relativePaths in enumerate(
+        self.stratifiedSubsets(numRungs, eta, seed)):
+      print("Rung %d: %d candidates on %d files"
+            % (rung, len(survivors), len(relativePaths)))
+      lastRung = rung == numRungs - 1
+      scores = self.evaluate(survivors, relativePaths,
+                             keepResults=not lastRung)
+      ranked = sorted(zip(survivors, scores),
+                      key=lambda candidate: candidate[1][profileName],
+                      reverse=True)
+      if lastRung:
+        return ranked
+      numSurvivors = max(1, len(ranked) // eta)
+      survivors = [parameters for parameters, _ in ranked[:numSurvivors]]
+      self.forget([parameters for parameters, _ in ranked[numSurvivors:]])
+
+
+  def log(self, parameters, scores, numFiles):
+    print("Candidate %s scored %s on %d files"
+          % (json.dumps(parameters), json.dumps(scores, sort_keys=True),
+             numFiles))
+    if self.logPath is not None:
+      with open(self.logPath, "a") as f:
+        f.write(json.dumps({"parameters": parameters,
+                            "scores": scores,
+                            "numFiles": numFiles}))
+        f.write("\n")
+
+
+  def close(self):
+    self.runner.pool.close()
+    self.runner.pool.join()
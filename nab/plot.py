@@ -23,12 +23,15 @@
 
 import argparse
 import itertools
+import multiprocessing
 import os
 import sys
 import tempfile
 
+import numpy
 import pandas as pd
 
+import plotly.io
 import plotly.offline
 import plotly.plotly
 
@@ -40,6 +43,12 @@ try:
 except ImportError:
   import json
 
+from nab.labeler import windowIntervals
+from nab.util import (createPath,
+                      getProbationPeriod,
+                      minMaxDownsample,
+                      windowDetections)
+
 MARKERS = ("circle", "diamond", "square", "cross", "triangle-up", "hexagon",
            "triangle-down")
 WIDTH = 800
@@ -64,6 +73,30 @@ def getCSVData(dataPath):
 
 
 
+def parseDetections(resultsData, threshold, windows):
+  """
+  Return the false positive and true positive detections of a results file:
+  the detections outside of the anomaly windows, and the first detection in
+  each window.
+
+  @param resultsData  (pandas.DataFrame)  Results of a detector on a data file.
+  @param threshold    (float)             Threshold of the anomaly scores.
+  @param windows      (list)              (start, end) timestamps of the
+                                          windows of the data file.
+
+  @return             (tuple)             False positive and true positive rows
+                                          of resultsData.
+  """
+  intervals = windowIntervals(pd.to_datetime(resultsData["timestamp"]),
+                              windows)
+  detections = numpy.flatnonzero(
+    resultsData["anomaly_score"].values >= threshold)
+  truePositives, falsePositives = windowDetections(detections, intervals)
+
+  return resultsData.iloc[falsePositives], resultsData.iloc[truePositives]
+
+
+
 class PlotNAB(object):
   """Plot NAB data and results files with the plotly API."""
 
@@ -82,6 +115,7 @@ class PlotNAB(object):
 
     self._setupDirectories()
     self._getThresholds()
+    self._labelData = {}
 
     # Setup data
     self.dataFile = dataFile
@@ -125,6 +159,15 @@ class PlotNAB(object):
       self.thresholds = json.load(f)
 
 
+  def _getLabelData(self, fileName):
+    """Return the labels of the data file from a labels JSON file, which is
+    only read once."""
+    if fileName not in self._labelData:
+      self._labelData[fileName] = getJSONData(
+        os.path.join(self.labelsDir, fileName))
+    return self._labelData[fileName][self.dataFile]
+
+
   @staticmethod
   def _addValues(data, start=None, end=None):
     """Return data values trace."""
@@ -200,8 +243,7 @@ class PlotNAB(object):
     mask = ((self.rawData["timestamp"] >= start) &
             (self.rawData["timestamp"] <= end))
 
-    windows = getJSONData(
-      os.path.join(self.labelsDir, "combined_windows.json"))[self.dataFile]
+    windows = self._getLabelData("combined_windows.json")
 
     x = []
     delta = (pd.to_datetime(self.rawData["timestamp"].iloc[1]) -
@@ -334,8 +376,7 @@ class PlotNAB(object):
       traces.append(tpTrace)
 
     if withLabels:
-      labels = getJSONData(os.path.join(
-          self.labelsDir, "combined_labels.json"))[self.dataFile]
+      labels = self._getLabelData("combined_labels.json")
       traces.append(self._addLabels(self.rawData, labels, target="value"))
 
     if withWindows:
@@ -397,8 +438,7 @@ class PlotNAB(object):
         resultsData, value, yLabel, start, end))
 
     if withLabels:
-      labels = getJSONData(os.path.join(
-          self.labelsDir, "combined_labels.json"))[self.dataFile]
+      labels = self._getLabelData("combined_labels.json")
       traces.append(self._addLabels(resultsData, labels, target=value, start=start, end=end))
 
     if withWindows:
@@ -433,68 +473,223 @@ class PlotNAB(object):
 
   def _parseDetections(self, resultsData, threshold):
     """Return false positives and true positives."""
-    windows = getJSONData(
-      os.path.join(self.labelsDir, "combined_windows.json"))[self.dataFile]
+    windows = self._getLabelData("combined_windows.json")
+    return parseDetections(resultsData, threshold, windows)
 
-    detections = resultsData[resultsData["anomaly_score"] >= threshold]
 
-    FP = detections[detections["label"] == 0]
-    TP = []
-    for window in windows:
-      start = pd.to_datetime(window[0])
-      end = pd.to_datetime(window[1])
-      detection = self.getTPDetection(detections, (start, end))
-      if detection:
-        TP.append(detection)
+  def _addDetections(self, name, symbol, FP, TP):
+    """Plot markers at anomaly detections; standard is for open shapes."""
+    return detectionTraces(name, symbol, FP, TP)
+
+
+
+def detectionTraces(name, symbol, FP, TP):
+  """Return the plotly traces of the false and true positive detections, open
+  shapes at their values."""
+  symbol = symbol + "-open"
+  # FPs:
+  fpTrace = Scatter(x=FP["timestamp"],
+                    y=FP["value"],
+                    mode="markers",
+                    name=name,
+                    text=["anomalous data"],
+                    marker=Marker(
+                      color="rgb(200, 20, 20)",
+                      size=15.0,
+                      symbol=symbol,
+                      line=Line(
+                        color="rgb(200, 20, 20)",
+                        width=2
+                      )
+                    ))
+  # TPs:
+  tpTrace = Scatter(x=TP["timestamp"],
+                    y=TP["value"],
+                    mode="markers",
+                    name=name,
+                    text=["anomalous data"],
+                    marker=Marker(
+                      color="rgb(20, 200, 20)",
+                      size=15.0,
+                      symbol=symbol,
+                      line=Line(
+                        color="rgb(20, 200, 20)",
+                        width=2
+                      )
+                    ))
 
-    return FP, TP
+  return fpTrace, tpTrace
 
 
-  @staticmethod
-  def getTPDetection(detections, windowTimes):
-    """Returns the first occurence of a detection w/in the window times."""
-    for detection in detections.iterrows():
-      detectionTime = pd.to_datetime(detection[1]["timestamp"])
-      if detectionTime > windowTimes[0] and detectionTime < windowTimes[1]:
-          return detection
-    return None
 
+def detectionsFigure(resultsData, windows, threshold, title=None, width=WIDTH,
+                     height=HEIGHT, probationPercent=0.15):
+  """
+  Return the plotly Figure of the detections of a detector on a data file.
+  The values are downsampled to the rows of the minimum and maximum of each
+  pixel column, and the anomaly windows and probationary period are drawn as
+  shapes, so the size of the plot does not grow with the data file.
+
+  @param resultsData      (pandas.DataFrame)  Results of the detector.
+  @param windows          (list)              (start, end) timestamps of the
+                                              anomaly windows.
+  @param threshold        (float)             Threshold of the anomaly scores.
+  @param title            (str)               Title of the plot.
+  @param width            (int)               Width of the plot in pixels.
+  @param height           (int)               Height of the plot in pixels.
+  @param probationPercent (float)             Probationary period of the data
+                                              file, as a fraction.
+
+  @return                 (Figure)            Plot of the detections.
+  """
+  FP, TP = parseDetections(resultsData, threshold, windows)
+  values = resultsData.iloc[minMaxDownsample(resultsData["value"].values,
+                                             width)]
+
+  traces = [Scatter(x=values["timestamp"],
+                    y=values["value"],
+                    name="value",
+                    line=Line(
+                      width=1.5
+                    ),
+                    showlegend=False)]
+  traces.extend(detectionTraces("Detections", MARKERS[1], FP, TP))
+
+  shapes = [{"type": "rect",
+             "xref": "x",
+             "yref": "paper",
+             "x0": start,
+             "x1": end,
+             "y0": 0,
+             "y1": 1,
+             "fillcolor": "rgb(220, 100, 100)",
+             "opacity": 0.3,
+             "line": {"width": 0}} for start, end in windows]
+  probation = int(getProbationPeriod(probationPercent, len(resultsData)))
+  if probation > 0:
+    shapes.append({"type": "rect",
+                   "xref": "x",
+                   "yref": "paper",
+                   "x0": resultsData["timestamp"].iloc[0],
+                   "x1": resultsData["timestamp"].iloc[probation - 1],
+                   "y0": 0,
+                   "y1": 1,
+                   "fillcolor": "rgb(0, 0, 200)",
+                   "opacity": 0.2,
+                   "line": {"width": 0}})
+
+  layout = PlotNAB._createLayout(title, width=width, height=height)
+  layout["shapes"] = shapes
+
+  return Figure(data=Data(traces), layout=layout)
+
+
+
+def renderDetectionsPlot(args):
+  """
+  Function called in each plot report process to render the plot of the
+  detections of a detector on a data file, see detectionsFigure().
 
-  def _addDetections(self, name, symbol, FP, TP):
-    """Plot markers at anomaly detections; standard is for open shapes."""
-    symbol = symbol + "-open"
-    # FPs:
-    fpTrace = Scatter(x=FP["timestamp"],
-                      y=FP["value"],
-                      mode="markers",
-                      name=name,
-                      text=["anomalous data"],
-                      marker=Marker(
-                        color="rgb(200, 20, 20)",
-                        size=15.0,
-                        symbol=symbol,
-                        line=Line(
-                          color="rgb(200, 20, 20)",
-                          width=2
-                        )
-                      ))
-    # TPs:
-    tpTrace = Scatter(x=[tp[1]["timestamp"] for tp in TP],
-                      y=[tp[1]["value"] for tp in TP],
-                      mode="markers",
-                      name=name,
-                      text=["anomalous data"],
-                      marker=Marker(
-                        color="rgb(20, 200, 20)",
-                        size=15.0,
-                        symbol=symbol,
-                        line=Line(
-                          color="rgb(20, 200, 20)",
-                          width=2
-                        )
-                      ))
-
-    return fpTrace, tpTrace
+  @param args   (tuple)   Relative path of the data file, detector name,
+                          threshold, anomaly windows, results directory,
+                          output directory, image format ("html", or an image
+                          format such as "png"), width and height.
+
+  @return       (str)     Path of the rendered plot.
+  """
+  (relativePath, detector, threshold, windows, resultsDir, outputDir,
+   imageFormat, width, height) = args
+
+  dataDir, dataFile = os.path.split(relativePath)
+  resultsFile = detector + "_" + dataFile
+  resultsData = getCSVData(
+    os.path.join(resultsDir, detector, dataDir, resultsFile))
+
+  outputPath = os.path.join(outputDir, detector, dataDir,
+                            os.path.splitext(resultsFile)[0] + "." +
+                            imageFormat)
+  createPath(outputPath)
+
+  figure = detectionsFigure(resultsData, windows, threshold,
+                            title="%s detections for %s" % (detector,
+                                                           relativePath),
+                            width=width, height=height)
+
+  if imageFormat == "html":
+    # The plots share the plotly.js bundle of the report
+    plotlyPath = os.path.relpath(os.path.join(outputDir, "plotly.min.js"),
+                                 os.path.dirname(outputPath))
+    plotly.io.write_html(figure, outputPath,
+                         include_plotlyjs=plotlyPath.replace(os.path.sep, "/"),
+                         auto_open=False)
+  else:
+    plotly.io.write_image(figure, outputPath, width=width, height=height,
+                          scale=SCALE)
+
+  return outputPath
+
+
+
+def plotReport(resultsDir, windows, thresholds, detectors, outputDir,
+               profile="standard", relativePaths=None, imageFormat="html",
+               width=WIDTH, height=HEIGHT, numCPUs=None):
+  """
+  Render the plots of the detections of detectors on data files in parallel,
+  offline, with an index page linking them.
+
+  @param resultsDir     (str)   Results directory of the detectors.
+  @param windows        (dict)  Relative paths of the data files mapped to
+                                their anomaly windows, as in
+                                combined_windows.json.
+  @param thresholds     (dict)  Thresholds of the detectors, as in
+                                thresholds.json.
+  @param detectors      (list)  Names of the detectors.
+  @param outputDir      (str)   Directory of the plots.
+  @param profile        (str)   Scoring profile of the thresholds.
+  @param relativePaths  (list)  Data files to plot, all files of windows by
+                                default.
+  @param imageFormat    (str)   "html", or an image format such as "png".
+  @param width          (int)   Width of the plots in pixels.
+  @param height         (int)   Height of the plots in pixels.
+  @param numCPUs        (int)   Number of processes, all CPUs by default.
+
+  @return               (list)  Paths of the rendered plots.
+  """
+  if relativePaths is None:
+    relativePaths = sorted(windows)
+
+  if imageFormat == "html":
+    plotlyPath = os.path.join(outputDir, "plotly.min.js")
+    createPath(plotlyPath)
+    with open(plotlyPath, "w") as plotlyFile:
+      plotlyFile.write(plotly.offline.get_plotlyjs())
+
+  args = [(relativePath, detector,
+           thresholds[detector][profile]["threshold"],
+           windows[relativePath], resultsDir, outputDir, imageFormat, width,
+           height)
+          for relativePath, detector in itertools.product(relativePaths,
+                                                          detectors)]
+
+  pool = multiprocessing.Pool(numCPUs)
+  try:
+    # Using `map_async` instead of `map` so interrupts are properly handled.
+    # See: http://stackoverflow.com/a/1408476
+    plotPaths = pool.map_async(renderDetectionsPlot, args).get(99999999)
+  finally:
+    pool.close()
+    pool.join()
+
+  with open(os.path.join(outputDir, "index.html"), "w") as indexFile:
+    indexFile.write("<html><body>\n")
+    for (relativePath, detector), plotPath in zip(
+        itertools.product(relativePaths, detectors), plotPaths):
+      link = os.path.relpath(plotPath, outputDir).replace(os.path.sep, "/")
+      indexFile.write('<p><a href="%s">%s: %s</a></p>\n'
+                      % (link, detector, relativePath))
+    indexFile.write("</body></html>\n")
+
+  return plotPaths
 
 
 
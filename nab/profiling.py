@@ -0,0 +1,247 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+CPU profiles of the stages of the NAB pipeline, in the main process and in the
+processes of its pool.
+
+The tasks a stage maps over the pool are wrapped by ProfiledTask, which
+profiles them with cProfile in the worker and keeps a profile per worker
+process. At the end of the stage, the profiles of the main process and of the
+workers are written to <profileDir>/<stage>/, and reported in:
+
+  <stage>-main.prof     pstats file of the main process, e.g. for snakeviz.
+  <stage>-main.txt      Its most expensive functions by cumulative time.
+  <stage>-workers.prof  pstats file of the pool workers, merged.
+  <stage>-workers.txt   Their most expensive functions by cumulative time.
+  <stage>.collapsed     Collapsed stacks, one "frame;frame;... microseconds"
+                        line per call path, rooted at the process, for
+                        flamegraph.pl or speedscope.
+
+The main process and the workers are reported separately because the main
+process waits for the pool tasks while the workers run them: merged, the time
+of the tasks would be counted twice. For the same reason the collapsed stacks
+of the main process leave out its waits for the results of the pool.
+"""
+
+import cProfile
+import glob
+import io
+import multiprocessing.pool
+import os
+import pstats
+
+from nab.util import makeDirsExist
+
+# Number of functions of the text reports
+NUM_REPORTED_FUNCTIONS = 50
+
+# Call paths taking less time, in seconds, are left out of collapsed stacks
+MIN_PATH_SECONDS = 1e-6
+
+# Profiles of this process, by directory, when it is a pool worker
+_workerProfiles = {}
+
+
+
+class ProfiledTask(object):
+  """Function mapped over a pool, profiled in the worker processes. The
+  profile of each worker accumulates its tasks and is written to
+  directory/worker-<pid>.prof after each of them."""
+
+  def __init__(self, function, directory):
+    self.function = function
+    self.directory = directory
+
+
+  def __call__(self, *args, **kwargs):
+    profile = _workerProfiles.get(self.directory)
+    if profile is None:
+      profile = _workerProfiles[self.directory] = cProfile.Profile()
+
+    profile.enable()
+    try:
+      return self.function(*args, **kwargs)
+    finally:
+      profile.disable()
+      profile.dump_stats(os.path.join(self.directory,
+                                      "worker-%d.prof" % os.getpid()))
+
+
+
+class ProfiledPool(object):
+  """multiprocessing.Pool whose map functions profile their tasks."""
+
+  def __init__(self, pool, directory):
+    self.pool = pool
+    self.directory = directory
+
+
+  def map(self, function, *args, **kwargs):
+    return self.pool.map(ProfiledTask(function, self.directory),
+                         *args, **kwargs)
+
+
+  def map_async(self, function, *args, **kwargs):
+    return self.pool.map_async(ProfiledTask(function, self.directory),
+                               *args, **kwargs)
+
+
+  def __getattr__(self, name):
+    return getattr(self.pool, name)
+
+
+
+class StageProfiler(object):
+  """Context manager profiling a stage of the pipeline. It returns a
+  ProfiledPool of pool to run the tasks of the stage with."""
+
+  def __init__(self, profileDir, stage, pool, clear=True):
+    """
+    @param profileDir (string)  Directory of the profiles.
+    @param stage      (string)  Name of the stage, e.g. "detect".
+    @param pool       (multiprocessing.Pool)  Pool of the stage.
+    @param clear      (bool)    Remove the profiles of a previous run of the
+                                stage, rather than adding to them.
+    """
+    self.profileDir = profileDir
+    self.stage = stage
+    self.directory = os.path.join(profileDir, stage)
+    self.pool = pool
+    self.clear = clear
+    self.profile = None
+
+
+  def __enter__(self):
+    makeDirsExist(self.directory)
+    if self.clear:
+      for path in glob.glob(os.path.join(self.directory, "*.prof")):
+        os.remove(path)
+
+    self.profile = cProfile.Profile()
+    self.profile.enable()
+    return ProfiledPool(self.pool, self.directory)
+
+
+  def __exit__(self, *exc):
+    self.profile.disable()
+
+    mainPath = os.path.join(self.directory, "main.prof")
+    stats = pstats.Stats(self.profile)
+    if os.path.exists(mainPath):
+      stats.add(mainPath)
+    stats.dump_stats(mainPath)
+
+    writeReports(self.directory, os.path.join(self.profileDir, self.stage))
+    print("Profiles of the %s stage have been written to %s*"
+          % (self.stage, os.path.join(self.profileDir, self.stage)))
+    return False
+
+
+
+def writeReports(directory, prefix):
+  """Writes the prefix-main.prof, prefix-main.txt, prefix-workers.prof,
+  prefix-workers.txt and prefix.collapsed reports of the profiles of the
+  processes in directory."""
+  mainPaths = glob.glob(os.path.join(directory, "main.prof"))
+  workerPaths = sorted(glob.glob(os.path.join(directory, "worker-*.prof")))
+
+  for name, paths in (("main", mainPaths), ("workers", workerPaths)):
+    if not paths:
+      continue
+    pstats.Stats(*paths).dump_stats("%s-%s.prof" % (prefix, name))
+
+    text = io.StringIO()
+    report = pstats.Stats(*paths, stream=text)
+    report.sort_stats("cumulative").print_stats(NUM_REPORTED_FUNCTIONS)
+    with open("%s-%s.txt" % (prefix, name), "w") as outFile:
+      outFile.write(text.getvalue())
+
+  with open(prefix + ".collapsed", "w") as outFile:
+    for path in mainPaths + workerPaths:
+      process = os.path.splitext(os.path.basename(path))[0]
+      exclude = isPoolWait if path in mainPaths else None
+      for stack, seconds in collapsedStacks(pstats.Stats(path), process,
+                                            exclude):
+        outFile.write("%s %d\n" % (stack, round(seconds * 1e6)))
+
+
+def isPoolWait(function):
+  """Whether a (file, line, name) pstats function is the wait for the results
+  of pool tasks, whose time is in the profiles of the workers."""
+  fileName, _, name = function
+  return (os.path.normpath(fileName) ==
+          os.path.normpath(multiprocessing.pool.__file__) and
+          name in ("get", "wait"))
+
+
+def collapsedStacks(stats, root, exclude=None):
+  """Returns the (stack, seconds) call paths of a profile.
+
+  cProfile only records the time of each caller/callee pair, so the time of a
+  function called from several paths is split between them in proportion to
+  the time it took for each of its callers, recursively.
+
+  @param stats    (pstats.Stats)  Profile.
+  @param root     (string)        First frame of the stacks, e.g. the process.
+  @param exclude  (function)      Optional predicate of the pstats functions
+                                  left out of the stacks, with their callees.
+
+  @return (list) ("root;frame;...;frame", seconds of the last frame itself)
+                 pairs.
+  """
+  functions = stats.stats
+  callees = {}
+  for function, (_, _, _, _, callers) in functions.items():
+    for caller, edge in callers.items():
+      callees.setdefault(caller, []).append((function, edge[3]))
+
+  stacks = []
+
+  def visit(function, frames, scale):
+    _, _, ownTime, cumulativeTime, _ = functions[function]
+    frames = frames + [frameName(function)]
+    if scale * ownTime >= MIN_PATH_SECONDS:
+      stacks.append((";".join(frames), scale * ownTime))
+
+    for callee, edgeTime in callees.get(function, []):
+      calleeTime = functions[callee][3]
+      if (calleeTime <= 0 or scale * edgeTime < MIN_PATH_SECONDS or
+          frameName(callee) in frames or (exclude and exclude(callee))):
+        continue
+      visit(callee, frames, scale * edgeTime / calleeTime)
+
+  for function, (_, _, _, _, callers) in functions.items():
+    if (not any(caller in functions for caller in callers) and
+        not (exclude and exclude(function))):
+      visit(function, [root], 1.0)
+
+  return stacks
+
+
+def frameName(function):
+  """Name of a (file, line, name) pstats function in collapsed stacks."""
+  fileName, line, name = function
+  if fileName == "~":
+    # Built-in function
+    frame = name
+  else:
+    frame = "%s:%d(%s)" % (os.path.basename(fileName), line, name)
+  return frame.replace(";", ":").replace(" ", "_")
@@ -18,6 +18,8 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
+import contextlib
+import functools
 import multiprocessing
 import os
 import pandas
@@ -30,11 +32,24 @@ from nab.corpus import Corpus
 from nab.detectors.base import detectDataSet
 from nab.labeler import CorpusLabel
 from nab.optimizer import optimizeThreshold
-from nab.scorer import scoreCorpus
+from nab.profiling import StageProfiler
+from nab.scorer import normalizeScores, scoreCorpus
 from nab.util import updateThresholds, updateFinalResults
 
 
 
+def profiledStage(stage):
+  """Decorator of the Runner steps, run within Runner.profileStage(stage)."""
+  def decorator(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+      with self.profileStage(stage):
+        return method(self, *args, **kwargs)
+    return wrapper
+  return decorator
+
+
+
 class Runner(object):
   """
   Class to run an endpoint (detect, optimize, or score) on the NAB
@@ -47,7 +62,8 @@ class Runner(object):
                labelPath,
                profilesPath,
                thresholdPath,
-               numCPUs=None):
+               numCPUs=None,
+               profileDir=None):
     """
     @param dataDir        (string)  Directory where all the raw datasets exist.
 
@@ -70,6 +86,10 @@ class Runner(object):
 
     @param numCPUs        (int)     Number of CPUs to be used for calls to
                                     multiprocessing.pool.map
+
+    @param profileDir     (string)  Directory where the CPU profiles of each
+                                    step are written, or None not to profile
+                                    the steps.
     """
     self.dataDir = dataDir
     self.resultsDir = resultsDir
@@ -78,6 +98,8 @@ class Runner(object):
     self.profilesPath = profilesPath
     self.thresholdPath = thresholdPath
     self.pool = multiprocessing.Pool(numCPUs)
+    self.profileDir = profileDir
+    self.profiledStages = set()
 
     self.probationaryPercent = 0.15
     self.windowSize = 0.10
@@ -86,6 +108,10 @@ class Runner(object):
     self.corpusLabel = None
     self.profiles = None
 
+    # Score files and raw scores of the last scoring step
+    self.resultsFiles = []
+    self.scores = {}
+
 
   def initialize(self):
     """Initialize all the relevant objects for the run."""
@@ -96,6 +122,30 @@ class Runner(object):
       self.profiles = json.load(p)
 
 
+  @contextlib.contextmanager
+  def profileStage(self, stage):
+    """Context of a step of the run, profiled in the main and pool processes
+    if profileDir is set: within it, self.pool profiles the tasks mapped over
+    it. A step run several times, e.g. detect for the ensemble detectors,
+    accumulates its profiles.
+
+    @param stage  (string)  Name of the step.
+    """
+    if self.profileDir is None:
+      yield
+      return
+
+    clear = stage not in self.profiledStages
+    self.profiledStages.add(stage)
+    pool = self.pool
+    try:
+      with StageProfiler(self.profileDir, stage, pool, clear) as self.pool:
+        yield
+    finally:
+      self.pool = pool
+
+
+  @profiledStage("detect")
   def detect(self, detectors):
     """Generate results file given a dictionary of detector classes
 
@@ -113,7 +163,7 @@ class Runner(object):
     for detectorName, detectorConstructor in detectors.items():
       for relativePath, dataSet in self.corpus.dataFiles.items():
 
-        if relativePath in self.corpusLabel.labels:
+        if relativePath in self.corpusLabel.intervals:
           args.append(
             (
               count,
@@ -121,7 +171,7 @@ class Runner(object):
                 dataSet=dataSet,
                 probationaryPercent=self.probationaryPercent),
               detectorName,
-              self.corpusLabel.labels[relativePath]["label"],
+              self.corpusLabel.intervals[relativePath],
               self.resultsDir,
               relativePath
             )
@@ -134,6 +184,7 @@ class Runner(object):
     self.pool.map_async(detectDataSet, args).get(99999999)
 
 
+  @profiledStage("optimize")
   def optimize(self, detectorNames):
     """Optimize the threshold for each combination of detector and profile.
 
@@ -168,6 +219,7 @@ class Runner(object):
     return thresholds
 
 
+  @profiledStage("score")
   def score(self, detectorNames, thresholds):
     """Score the performance of the detectors.
 
@@ -189,6 +241,7 @@ class Runner(object):
     baselines = {}
 
     self.resultsFiles = []
+    self.scores = {}
     for detectorName in detectorNames:
       resultsDetectorDir = os.path.join(self.resultsDir, detectorName)
       resultsCorpus = Corpus(resultsDetectorDir)
@@ -214,71 +267,107 @@ class Runner(object):
         print("%s detector benchmark scores written to %s" %\
           (detectorName, scorePath))
         self.resultsFiles.append(scorePath)
+        self.scores.setdefault(detectorName, {})[profileName] = (
+          float(resultsDF["Score"].iloc[-1]))
 
 
-  def normalize(self):
+  @profiledStage("normalize")
+  def normalize(self, scores=None):
     """
     Normalize the detectors' scores according to the baseline defined by the
     null detector, and print to the console.
 
-    Function can only be called with the scoring step (i.e. runner.score())
-    preceding it.
+    By default the raw scores are the totals kept in memory by the scoring step
+    (i.e. runner.score()) or, if it did not run, those of the score files in
+    resultsFiles. The scores can also be given, e.g. to normalize many
+    variants of a detector in one call, or read from the score files of a
+    previous run with readScores().
 
-    This reads the total score values from the results CSVs, and
-    subtracts the relevant baseline value. The scores are then normalized by
-    multiplying by 100 and dividing by perfect less the baseline, where the
-    perfect score is the number of TPs possible.
+    The baseline of each profile is the score of the null detector, read from
+    its score files if it was not scored. The scores are normalized by
+    subtracting the baseline, multiplying by 100 and dividing by perfect less
+    the baseline, where the perfect score is the number of TPs possible.
 
     Note the results CSVs still contain the original scores, not normalized.
+
+    @param scores   (dict)  Detector names mapped to dicts of profile names and
+                            raw scores.
+
+    @return         (dict)  Detector names mapped to dicts of profile names and
+                            normalized scores.
     """
     print("\nRunning score normalization step")
 
-    # Get baseline scores for each application profile.
-    nullDir = os.path.join(self.resultsDir, "null")
-    if not os.path.isdir(nullDir):
-      raise IOError("No results directory for null detector. You must "
-                    "run the null detector before normalizing scores.")
+    if scores is None:
+      scores = self.scores or self.readScoreFiles(self.resultsFiles)
 
-    baselines = {}
-    for profileName, _ in self.profiles.items():
-      fileName = os.path.join(nullDir,
-                              "null_" + profileName + "_scores.csv")
-      with open(fileName) as f:
-        results = pandas.read_csv(f)
-        baselines[profileName] = results["Score"].iloc[-1]
+    # Get baseline scores for each application profile.
+    if "null" in scores:
+      baselines = scores["null"]
+    else:
+      nullDir = os.path.join(self.resultsDir, "null")
+      if not os.path.isdir(nullDir):
+        raise IOError("No results directory for null detector. You must "
+                      "run the null detector before normalizing scores.")
+      baselines = self.readScores(["null"])["null"]
 
     # Get total number of TPs
-    with open(self.labelPath, "rb") as f:
-      labelsDict = json.load(f)
-    tpCount = 0
-    for labels in list(labelsDict.values()):
-      tpCount += len(labels)
-
-    # Normalize the score from each results file.
-    finalResults = {}
-    for resultsFile in self.resultsFiles:
-      profileName = [k for k in list(baselines.keys()) if k in resultsFile][0]
-      base = baselines[profileName]
-
-      with open(resultsFile) as f:
-        results = pandas.read_csv(f)
-
-        # Calculate score:
-        perfect = tpCount * self.profiles[profileName]["CostMatrix"]["tpWeight"]
-        score = 100 * (results["Score"].iloc[-1] - base) / (perfect - base)
-
-        # Add to results dict:
-        resultsInfo = resultsFile.split(os.path.sep)[-1].split('.')[0]
-        detector = resultsInfo.split('_')[0]
-        profile = resultsInfo.replace(detector + "_", "").replace("_scores", "")
-        if detector not in finalResults:
-          finalResults[detector] = {}
-        finalResults[detector][profile] = score
-
-      print(("Final score for \'%s\' detector on \'%s\' profile = %.2f"
-             % (detector, profile, score)))
+    if self.corpusLabel is not None:
+      windows = self.corpusLabel.windows
+    else:
+      with open(self.labelPath) as f:
+        windows = json.load(f)
+    tpCount = sum(len(fileWindows) for fileWindows in windows.values())
+
+    finalResults = normalizeScores(scores, baselines, tpCount, self.profiles)
+    for detector, profileScores in finalResults.items():
+      for profile, score in profileScores.items():
+        print(("Final score for \'%s\' detector on \'%s\' profile = %.2f"
+               % (detector, profile, score)))
 
     resultsPath = os.path.join(self.resultsDir, "final_results.json")
     updateFinalResults(finalResults, resultsPath)
     print("Final scores have been written to %s." % resultsPath)
 
+    return finalResults
+
+
+  def readScores(self, detectorNames):
+    """Read the raw scores of detectors from the score files written by a
+    previous scoring step.
+
+    @param detectorNames  (list)  List of detector names.
+
+    @return               (dict)  Detector names mapped to dicts of profile
+                                  names and raw scores.
+    """
+    scores = {}
+    for detectorName in detectorNames:
+      scores[detectorName] = {}
+      for profileName in self.profiles:
+        scorePath = os.path.join(self.resultsDir, detectorName,
+                                 "%s_%s_scores.csv" % (detectorName,
+                                                       profileName))
+        with open(scorePath) as f:
+          results = pandas.read_csv(f)
+        scores[detectorName][profileName] = float(results["Score"].iloc[-1])
+    return scores
+
+
+  def readScoreFiles(self, paths):
+    """Read the raw scores of score files, from their last row.
+
+    @param paths  (list)  Paths of <detector>_<profile>_scores.csv files.
+
+    @return       (dict)  Detector names mapped to dicts of profile names and
+                          raw scores.
+    """
+    scores = {}
+    for path in paths:
+      with open(path) as f:
+        results = pandas.read_csv(f)
+      detectorName = results["Detector"].iloc[0]
+      profileName = results["Profile"].iloc[0]
+      scores.setdefault(detectorName, {})[profileName] = (
+        float(results["Score"].iloc[-1]))
+    return scores
@@ -83,12 +83,11 @@ def scoreCorpus(threshold, args):
 
     try:
       windows = corpusLabel.windows[relativePath]
-      labels = corpusLabel.labels[relativePath]
+      timestamps = corpusLabel.getTimestamps(relativePath)
     except KeyError:
       print("Does not contain file: "+str(relativePath))
       continue
 
-    timestamps = labels['timestamp']
     anomalyScores = dataSet.data["anomaly_score"]
 
     args.append((
@@ -185,3 +184,30 @@ def scoreDataSet(args):
 
   return (detectorName, profileName, relativePath, threshold, bestRow.score,
           bestRow.tp, bestRow.tn, bestRow.fp, bestRow.fn, bestRow.total)
+
+
+def normalizeScores(scores, baselines, tpCount, profiles):
+  """Normalizes raw scores according to the baseline scores of the null
+  detector: 0 for the baseline and 100 for a perfect detector, whose score is
+  the number of true positives possible.
+
+  @param scores     (dict)  Detector names mapped to dicts of profile names
+                            and raw scores, e.g. of many variants of a
+                            detector normalized in one batch.
+  @param baselines  (dict)  Profile names mapped to the raw scores of the null
+                            detector.
+  @param tpCount    (int)   Number of anomaly windows of the corpus.
+  @param profiles   (dict)  Application profiles and their cost matrices.
+
+  @return (dict) Detector names mapped to dicts of profile names and
+                 normalized scores.
+  """
+  normalized = {}
+  for detectorName, profileScores in scores.items():
+    normalized[detectorName] = {}
+    for profileName, score in profileScores.items():
+      base = baselines[profileName]
+      perfect = tpCount * profiles[profileName]["CostMatrix"]["tpWeight"]
+      normalized[detectorName][profileName] = (
+        100 * (score - base) / (perfect - base))
+  return normalized
@@ -0,0 +1,307 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Synthetic NAB corpora of any size, for scale testing.
+
+Each data file is a seasonal series with noise into which anomalies are
+injected. Their windows are computed like LabelCombiner.applyWindows() and
+checkWindows() compute those of the labelled anomalies of the NAB corpus, so
+the files and label files can be used by run.py like the real ones.
+"""
+
+import multiprocessing
+import os
+
+import numpy
+import pandas
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+from nab.util import createPath, getProbationPeriod
+
+
+ANOMALY_TYPES = ["spike", "levelShift", "drift", "seasonalityBreak"]
+
+# Timestamps of the data files and of the label files
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+WINDOW_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+
+def generateValues(numRows, interval, rng):
+  """Returns the values of a series without anomalies: daily and weekly
+  seasonality, a slow random walk and noise.
+
+  @param numRows  (int)                     Number of records.
+  @param interval (pandas.Timedelta)        Time between records.
+  @param rng      (numpy.random.Generator)  Random numbers.
+
+  @return (numpy.ndarray) Values.
+  """
+  t = numpy.arange(numRows) * (interval / pandas.Timedelta("1D"))
+  level = rng.uniform(10.0, 1000.0)
+  daily = rng.uniform(0.0, 0.3) * level
+  weekly = rng.uniform(0.0, 0.1) * level
+  phase = rng.uniform(0.0, 2 * numpy.pi)
+
+  values = (level +
+            daily * numpy.sin(2 * numpy.pi * t + phase) +
+            weekly * numpy.sin(2 * numpy.pi * t / 7.0) +
+            0.002 * level * rng.normal(size=numRows).cumsum() +
+            0.02 * level * rng.normal(size=numRows))
+  return values
+
+
+def injectAnomaly(values, index, anomalyType, duration, rng):
+  """Injects an anomaly starting at index into values, in place.
+
+  @param values       (numpy.ndarray)  Values of the series.
+  @param index        (int)            First record of the anomaly.
+  @param anomalyType  (string)         One of ANOMALY_TYPES:
+      spike             A single value far from the others.
+      levelShift        The values are shifted from index on.
+      drift             The values drift away linearly from index on.
+      seasonalityBreak  The values lose their daily pattern for duration
+                        records, staying at their mean.
+  @param duration     (int)            Number of records of the anomaly
+                                       until it is clear.
+  @param rng          (numpy.random.Generator)  Random numbers.
+  """
+  scale = values.std() or 1.0
+  sign = rng.choice([-1.0, 1.0])
+  magnitude = rng.uniform(2.0, 5.0) * scale
+
+  if anomalyType == "spike":
+    values[index] += sign * magnitude
+  elif anomalyType == "levelShift":
+    values[index:] += sign * magnitude
+  elif anomalyType == "drift":
+    steps = numpy.arange(1, len(values) - index + 1)
+    values[index:] += sign * magnitude * steps / max(duration, 1)
+  elif anomalyType == "seasonalityBreak":
+    end = min(index + duration, len(values))
+    values[index:end] = values[index:end].mean()
+  else:
+    raise ValueError("Unknown anomaly type: %s" % anomalyType)
+
+
+def anomalyWindows(numRows, anomalies, windowSize=0.10,
+                   probationaryPercent=0.15):
+  """Returns the windows of the anomalies of a data file, as (first, last)
+  record indices, like LabelCombiner: windows of windowSize of the records
+  shared by the anomalies, centered on them. A first window overlapping the
+  probationary period is dropped, overlapping windows are merged.
+
+  @param numRows    (int)   Number of records.
+  @param anomalies  (list)  Sorted records of the anomalies.
+  """
+  if not anomalies:
+    return []
+
+  windowLength = int(windowSize * numRows / len(anomalies))
+  windows = [[max(a - windowLength // 2, 0),
+              min(a + windowLength // 2, numRows - 1)] for a in anomalies]
+
+  if windows[0][0] < getProbationPeriod(probationaryPercent, numRows):
+    del windows[0]
+
+  merged = []
+  for window in windows:
+    if merged and window[0] <= merged[-1][1]:
+      merged[-1][1] = window[1]
+    else:
+      merged.append(window)
+  return merged
+
+
+def placeAnomalies(numRows, numAnomalies, windowSize, probationaryPercent,
+                   rng):
+  """Returns sorted records of numAnomalies anomalies, one in each of
+  numAnomalies equal slots after the probationary period, with their windows
+  inside the slots so that they do not overlap."""
+  if numAnomalies == 0:
+    return []
+  if not anomaliesFit(numRows, numAnomalies, windowSize, probationaryPercent):
+    raise ValueError("%d anomalies do not fit in %d records"
+                     % (numAnomalies, numRows))
+
+  first = int(getProbationPeriod(probationaryPercent, numRows))
+  slot = (numRows - first) // numAnomalies
+  margin = int(windowSize * numRows / numAnomalies) // 2 + 1
+  offsets = rng.integers(margin, slot - margin, size=numAnomalies)
+  return list(first + slot * numpy.arange(numAnomalies) + offsets)
+
+
+def anomaliesFit(numRows, numAnomalies, windowSize=0.10,
+                 probationaryPercent=0.15):
+  """Whether placeAnomalies() can place numAnomalies anomalies in numRows
+  records."""
+  first = int(getProbationPeriod(probationaryPercent, numRows))
+  slot = (numRows - first) // numAnomalies
+  margin = int(windowSize * numRows / numAnomalies) // 2 + 1
+  return slot > 2 * margin
+
+
+def generateDataFile(numRows, numAnomalies, interval="5min",
+                     anomalyTypes=ANOMALY_TYPES, windowSize=0.10,
+                     probationaryPercent=0.15, start="2015-01-01", seed=0):
+  """Generates a data file with anomalies and their windows.
+
+  @param numRows              (int)     Number of records.
+  @param numAnomalies         (int)     Number of anomalies.
+  @param interval             (string)  Time between records, e.g. "5min".
+  @param anomalyTypes         (list)    Types the anomalies are drawn from.
+  @param windowSize           (float)   Fraction of the records in windows.
+  @param probationaryPercent  (float)   Probationary percent of scoring, no
+                                        anomaly is injected before it.
+  @param start                (string)  First timestamp.
+  @param seed                 (int or numpy.random.SeedSequence)  Seed.
+
+  @return (tuple) Contains:
+    data      (pandas.DataFrame)  "timestamp" and "value" columns.
+    anomalies (list)              Records of the anomalies.
+    windows   (list)              (first, last) records of the windows.
+  """
+  rng = numpy.random.default_rng(seed)
+  interval = pandas.Timedelta(interval)
+  values = generateValues(numRows, interval, rng)
+
+  anomalies = placeAnomalies(numRows, numAnomalies, windowSize,
+                             probationaryPercent, rng)
+  duration = int(windowSize * numRows / max(numAnomalies, 1)) // 2
+  for index in anomalies:
+    injectAnomaly(values, index, rng.choice(anomalyTypes), duration, rng)
+
+  timestamps = pandas.date_range(start, periods=numRows, freq=interval)
+  data = pandas.DataFrame({"timestamp": timestamps, "value": values})
+  windows = anomalyWindows(numRows, anomalies, windowSize,
+                           probationaryPercent)
+  return data, anomalies, windows
+
+
+def writeCsv(path, data):
+  """Writes a data file like data.to_csv(path, index=False) with TIMESTAMP_FORMAT
+  timestamps and 6 decimals values, a few times faster."""
+  timestamps = numpy.datetime_as_string(
+    data["timestamp"].values.astype("datetime64[s]")).tolist()
+  lines = map("{},{:.6f}\n".format, timestamps, data["value"].tolist())
+  with open(path, "w") as outFile:
+    # datetime_as_string() separates the date and time with a T
+    outFile.write(("timestamp,value\n" + "".join(lines)).replace("T", " "))
+
+
+def writeDataFile(args):
+  """Generates a data file and writes it, function called in each corpus
+  generation process.
+
+  @param args   (tuple)   Data directory, relative path, seed and keyword
+                          arguments of generateDataFile().
+
+  @return       (tuple)   Relative path, timestamps of the anomalies and
+                          windows of the data file, as in the label files.
+  """
+  (dataDir, relativePath, seed, kwargs) = args
+
+  data, anomalies, windows = generateDataFile(seed=seed, **kwargs)
+  path = os.path.join(dataDir, relativePath)
+  createPath(path)
+  writeCsv(path, data)
+
+  timestamps = data["timestamp"]
+  labels = [timestamps[i].strftime(TIMESTAMP_FORMAT) for i in anomalies]
+  windows = [[timestamps[first].strftime(WINDOW_FORMAT),
+              timestamps[last].strftime(WINDOW_FORMAT)]
+             for first, last in windows]
+  return relativePath, labels, windows
+
+
+def generateCorpus(outputDir, numFiles, lengths=(4000, 4000),
+                   anomalies=(0, 3), intervals=("5min",),
+                   anomalyTypes=ANOMALY_TYPES, windowSize=0.10,
+                   probationaryPercent=0.15, category="synthetic", seed=0,
+                   numCPUs=None):
+  """Generates a corpus of numFiles data files in outputDir/data, with its
+  label files outputDir/labels/combined_labels.json and
+  combined_windows.json. Each file is generated by a pool process from its
+  own random stream, so the corpus does not depend on numCPUs.
+
+  @param outputDir    (string)  Directory of the corpus.
+  @param numFiles     (int)     Number of data files.
+  @param lengths      (tuple)   Minimum and maximum numbers of records of a
+                                file.
+  @param anomalies    (tuple)   Minimum and maximum numbers of anomalies of a
+                                file, fewer are injected in files too short
+                                for them.
+  @param intervals    (tuple)   Times between records, one is drawn per file.
+  @param category     (string)  Directory of the data files in the corpus.
+  @param numCPUs      (int)     Number of processes, all CPUs by default.
+
+  See generateDataFile() for the other parameters.
+
+  @return (tuple) Paths of the data directory and of the windows file.
+  """
+  dataDir = os.path.join(outputDir, "data")
+  labelsPath = os.path.join(outputDir, "labels", "combined_labels.json")
+  windowsPath = os.path.join(outputDir, "labels", "combined_windows.json")
+
+  seeds = numpy.random.SeedSequence(seed).spawn(numFiles)
+  args = []
+  for i, fileSeed in enumerate(seeds):
+    rng = numpy.random.default_rng(fileSeed.spawn(1)[0])
+    numRows = int(rng.integers(lengths[0], lengths[1] + 1))
+    numAnomalies = int(rng.integers(anomalies[0], anomalies[1] + 1))
+    while numAnomalies and not anomaliesFit(numRows, numAnomalies, windowSize,
+                                            probationaryPercent):
+      numAnomalies -= 1
+    kwargs = {"numRows": numRows,
+              "numAnomalies": numAnomalies,
+              "interval": intervals[rng.integers(len(intervals))],
+              "anomalyTypes": list(anomalyTypes),
+              "windowSize": windowSize,
+              "probationaryPercent": probationaryPercent}
+    relativePath = "%s/synthetic_%06d.csv" % (category, i)
+    args.append((dataDir, relativePath, fileSeed, kwargs))
+
+  pool = multiprocessing.Pool(numCPUs)
+  try:
+    # Using `map_async` instead of `map` so interrupts are properly handled.
+    # See: http://stackoverflow.com/a/1408476
+    results = pool.map_async(writeDataFile, args).get(99999999)
+  finally:
+    pool.close()
+    pool.join()
+
+  allLabels = {}
+  allWindows = {}
+  for relativePath, labels, windows in results:
+    allLabels[relativePath] = labels
+    allWindows[relativePath] = windows
+
+  for path, labels in ((labelsPath, allLabels), (windowsPath, allWindows)):
+    createPath(path)
+    with open(path, "w") as outFile:
+      json.dump(labels, outFile, sort_keys=True, indent=4,
+                separators=(',', ': '))
+
+  return dataDir, windowsPath
+
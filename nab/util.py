@@ -21,6 +21,7 @@
 import datetime
 import dateutil
 import math
+import numpy
 import os
 import pandas
 import pprint
@@ -149,6 +150,83 @@ def convertAnomalyScoresToDetections(anomalyScores, threshold):
   return detections
 
 
+def labelVector(intervals, numRows):
+  """
+  Convert the row intervals of anomaly windows to dense labels: 1 for the rows
+  in a window, 0 otherwise.
+
+  @param intervals  (numpy.ndarray)  (first, last) row indices of the windows,
+                                     inclusive.
+  @param numRows    (int)            Number of rows of the data file.
+
+  @return           (numpy.ndarray)  Labels of the rows.
+  """
+  labels = numpy.zeros(numRows, dtype=numpy.int64)
+  for first, last in intervals:
+    labels[first:last + 1] = 1
+  return labels
+
+
+def windowDetections(detections, intervals):
+  """
+  Join the detections of a data file with the row intervals of its anomaly
+  windows.
+
+  @param detections (numpy.ndarray)  Sorted row indices of the detections.
+  @param intervals  (numpy.ndarray)  (first, last) row indices of the windows,
+                                     inclusive.
+
+  @return           (tuple)          Row indices of the first detection of
+                                     each window that has one (true
+                                     positives), and of the detections outside
+                                     of all windows (false positives).
+  """
+  detections = numpy.asarray(detections, dtype=numpy.int64)
+  intervals = numpy.asarray(intervals, dtype=numpy.int64).reshape(-1, 2)
+
+  first = numpy.searchsorted(detections, intervals[:, 0])
+  last = numpy.searchsorted(detections, intervals[:, 1], side="right")
+  truePositives = detections[first[first < last]]
+
+  # Count the windows around each detection with a difference array
+  inWindows = numpy.zeros(len(detections) + 1, dtype=numpy.int64)
+  numpy.add.at(inWindows, first, 1)
+  numpy.add.at(inWindows, last, -1)
+  falsePositives = detections[numpy.cumsum(inWindows)[:-1] == 0]
+
+  return numpy.unique(truePositives), falsePositives
+
+
+def minMaxDownsample(values, numBuckets):
+  """
+  Downsample a series for plotting: keep the rows of the minimum and maximum
+  value of each of numBuckets buckets of consecutive rows, e.g. one per pixel,
+  so the plotted line keeps its peaks.
+
+  @param values     (numpy.ndarray)  Values of the series.
+  @param numBuckets (int)            Number of buckets.
+
+  @return           (numpy.ndarray)  Sorted row indices to keep.
+  """
+  values = numpy.asarray(values, dtype=numpy.float64)
+  if len(values) <= 2 * numBuckets:
+    return numpy.arange(len(values))
+
+  starts = numpy.linspace(0, len(values), numBuckets + 1).astype(numpy.int64)
+  buckets = numpy.repeat(numpy.arange(numBuckets), numpy.diff(starts))
+  starts = starts[:-1]
+
+  indices = []
+  for reduce in (numpy.fmin, numpy.fmax):
+    extrema = reduce.reduceat(values, starts)
+    rows = numpy.flatnonzero(values == extrema[buckets])
+    # First row of each bucket reaching its extremum
+    _, firstRows = numpy.unique(buckets[rows], return_index=True)
+    indices.append(rows[firstRows])
+
+  return numpy.union1d(indices[0], indices[1])
+
+
 def relativeFilePaths(directory):
   """Given directory, get path of all files within relative to the directory.
 
@@ -0,0 +1,315 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Backend of the data and results viewer, scripts/nab_visualizer.html. It serves
+min/max/mean aggregates of the columns of the data and results files at many
+resolutions, so the browser only loads the buckets of the zoom level in view,
+however long the series.
+"""
+
+import numpy
+import os
+import pandas
+import threading
+
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+from nab.corpus import dataFilePaths
+from nab.util import convertResultsPathToDataPath, getProbationPeriod
+
+# Columns of the data and results files served by the viewer
+COLUMNS = ("value", "anomaly_score", "label")
+
+
+
+def toMilliseconds(timestamps):
+  """Return timestamps as milliseconds since the epoch, as served to the
+  browser."""
+  return pandas.to_datetime(timestamps).values.astype(
+    "datetime64[ms]").astype(numpy.int64)
+
+
+def jsonList(values):
+  """Return an array as a list for JSON, with None for NaN."""
+  return [None if v != v else v for v in values.tolist()]
+
+
+
+class Pyramid(object):
+  """
+  Aggregates of the columns of a series over buckets of consecutive rows. At
+  level k the buckets hold factor**k rows, level 0 being the rows, up to the
+  level with at most minBuckets buckets.
+  """
+
+  def __init__(self, timestamps, columns, factor=4, minBuckets=256):
+    """
+    @param timestamps (numpy.ndarray)  Timestamps of the rows in milliseconds,
+                                       sorted.
+    @param columns    (dict)           Column names mapped to their values.
+    @param factor     (int)            Rows of a bucket over the rows of a
+                                       bucket of the level below.
+    @param minBuckets (int)            Buckets of the coarsest level.
+    """
+    self.factor = factor
+    self.numRows = len(timestamps)
+
+    # First timestamp of each bucket, for each level
+    self.timestamps = [numpy.asarray(timestamps, dtype=numpy.int64)]
+    # Column names mapped to (min, max, sum, count) of each bucket
+    level = {}
+    for name, values in columns.items():
+      values = numpy.asarray(values, dtype=numpy.float64)
+      valid = ~numpy.isnan(values)
+      level[name] = (values, values, numpy.where(valid, values, 0.0),
+                     valid.astype(numpy.int64))
+    self.levels = [level]
+
+    while len(self.timestamps[-1]) > minBuckets:
+      starts = numpy.arange(0, len(self.timestamps[-1]), factor)
+      self.timestamps.append(self.timestamps[-1][starts])
+      self.levels.append(
+        {name: (numpy.fmin.reduceat(low, starts),
+                numpy.fmax.reduceat(high, starts),
+                numpy.add.reduceat(total, starts),
+                numpy.add.reduceat(count, starts))
+         for name, (low, high, total, count) in self.levels[-1].items()})
+
+
+  @classmethod
+  def fromCSV(cls, path, **kwargs):
+    """Return the pyramid of the COLUMNS of a data or results file, with its
+    rows sorted by timestamp."""
+    data = pandas.read_csv(path)
+    timestamps = toMilliseconds(data["timestamp"])
+    columns = {name: data[name].values for name in COLUMNS if name in data}
+
+    if (numpy.diff(timestamps) < 0).any():
+      order = numpy.argsort(timestamps, kind="mergesort")
+      timestamps = timestamps[order]
+      columns = {name: values[order] for name, values in columns.items()}
+
+    return cls(timestamps, columns, **kwargs)
+
+
+  def getLevel(self, start, end, width):
+    """Return the finest level with at most width buckets from start to end,
+    in milliseconds."""
+    first, last = numpy.searchsorted(self.timestamps[0], [start, end],
+                                     side="right")
+    numRows = max(last - first, 1)
+    for level in range(len(self.levels)):
+      if numRows <= width * self.factor ** level:
+        return level
+    return len(self.levels) - 1
+
+
+  def query(self, start, end, width):
+    """
+    Return the buckets of the level in view for JSON.
+
+    @param start  (int)   Start of the view in milliseconds.
+    @param end    (int)   End of the view in milliseconds.
+    @param width  (int)   Width of the view in pixels.
+
+    @return       (dict)  Level, rows per bucket, and first timestamp and
+                          min, max and mean of the columns of the buckets in
+                          view, with a bucket on each side.
+    """
+    level = self.getLevel(start, end, width)
+    timestamps = self.timestamps[level]
+    first = max(numpy.searchsorted(timestamps, start, side="left") - 1, 0)
+    last = numpy.searchsorted(timestamps, end, side="right") + 1
+
+    series = {"level": level,
+              "bucketRows": self.factor ** level,
+              "timestamp": timestamps[first:last].tolist(),
+              "columns": {}}
+    for name, (low, high, total, count) in self.levels[level].items():
+      with numpy.errstate(invalid="ignore", divide="ignore"):
+        mean = total[first:last] / count[first:last]
+      series["columns"][name] = {"min": jsonList(low[first:last]),
+                                 "max": jsonList(high[first:last]),
+                                 "mean": jsonList(mean)}
+    return series
+
+
+
+class Viewer(object):
+  """Pyramids of the data and results files of NAB, built when a file is first
+  viewed and rebuilt when it changes."""
+
+  def __init__(self, root, dataDir="data", resultsDir="results",
+               windowsPath=None):
+    """
+    @param root         (string)  NAB root, paths are relative to it.
+    @param dataDir      (string)  Data directory, relative to root.
+    @param resultsDir   (string)  Results directory, relative to root.
+    @param windowsPath  (string)  Label windows JSON file of the data files.
+    """
+    self.root = os.path.realpath(root)
+    self.dataDir = dataDir
+    self.resultsDir = resultsDir
+
+    self.windows = {}
+    if windowsPath is not None and os.path.exists(windowsPath):
+      with open(windowsPath) as windowsFile:
+        self.windows = json.load(windowsFile)
+
+    self.pyramids = {}
+    self.lock = threading.Lock()
+
+
+  def getFiles(self):
+    """Return the paths of the data files and of the results files."""
+    files = {}
+    for name, directory, depth in (("data", self.dataDir, 2),
+                                   ("results", self.resultsDir, 3)):
+      srcRoot = os.path.join(self.root, directory)
+      files[name] = [
+        "/".join((directory, relativePath))
+        for relativePath in (dataFilePaths(srcRoot)
+                             if os.path.isdir(srcRoot) else [])
+        if relativePath.count("/") == depth - 1]
+    return files
+
+
+  def getPath(self, path):
+    """Return the absolute path of a data or results file, raising a
+    ValueError for paths out of the data and results directories."""
+    absolutePath = os.path.realpath(os.path.join(self.root, path))
+    for directory in (self.dataDir, self.resultsDir):
+      directory = os.path.realpath(os.path.join(self.root, directory))
+      if (absolutePath.startswith(directory + os.path.sep) and
+          absolutePath.endswith(".csv") and os.path.isfile(absolutePath)):
+        return absolutePath
+    raise ValueError("Not a data or results file: %s" % path)
+
+
+  def getPyramid(self, path):
+    """Return the pyramid of a data or results file, see getPath()."""
+    absolutePath = self.getPath(path)
+    stat = os.stat(absolutePath)
+    key = (stat.st_mtime, stat.st_size)
+    with self.lock:
+      if absolutePath not in self.pyramids or (
+          self.pyramids[absolutePath][0] != key):
+        self.pyramids[absolutePath] = (key, Pyramid.fromCSV(absolutePath))
+      return self.pyramids[absolutePath][1]
+
+
+  def getWindows(self, path):
+    """Return the label windows of a data or results file."""
+    parts = path.split("/")
+    if parts[0] == self.resultsDir and len(parts) == 4:
+      relativePath = convertResultsPathToDataPath(
+        os.path.sep.join(parts[1:]))
+    else:
+      relativePath = "/".join(parts[1:])
+    return self.windows.get(relativePath, [])
+
+
+  def info(self, path):
+    """Return the columns, time range, probationary period and label windows of
+    a file, in milliseconds."""
+    pyramid = self.getPyramid(path)
+    timestamps = pyramid.timestamps[0]
+    probation = int(getProbationPeriod(0.15, pyramid.numRows))
+    windows = self.getWindows(path)
+    return {
+      "path": path,
+      "columns": sorted(pyramid.levels[0]),
+      "numRows": pyramid.numRows,
+      "start": int(timestamps[0]) if len(timestamps) else None,
+      "end": int(timestamps[-1]) if len(timestamps) else None,
+      "probationEnd": int(timestamps[probation - 1]) if probation else None,
+      "windows": (toMilliseconds([t for window in windows for t in window])
+                  .reshape(-1, 2).tolist() if windows else [])
+    }
+
+
+  def series(self, path, start, end, width):
+    """Return the buckets of a file in view, see Pyramid.query()."""
+    return self.getPyramid(path).query(start, end, width)
+
+
+
+class ViewerRequestHandler(SimpleHTTPRequestHandler):
+  """Serves the viewer page, and the JSON of the viewer of the server:
+
+    /files                                  data and results files
+    /info?path=<path>                       see Viewer.info()
+    /series?path=<path>&start=<ms>&end=<ms>&width=<pixels>
+                                            see Viewer.series()
+  """
+
+  def do_GET(self):
+    url = urlparse(self.path)
+    if url.path not in ("/files", "/info", "/series"):
+      return SimpleHTTPRequestHandler.do_GET(self)
+
+    viewer = self.server.viewer
+    query = {name: values[0] for name, values in parse_qs(url.query).items()}
+    try:
+      if url.path == "/files":
+        result = viewer.getFiles()
+      elif url.path == "/info":
+        result = viewer.info(query["path"])
+      else:
+        result = viewer.series(query["path"], int(float(query["start"])),
+                               int(float(query["end"])),
+                               min(int(query["width"]), 10000))
+    except (KeyError, ValueError) as e:
+      self.send_error(404, str(e))
+      return
+
+    content = json.dumps(result).encode("utf-8")
+    self.send_response(200)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(content)))
+    self.end_headers()
+    self.wfile.write(content)
+
+
+
+def createServer(viewer, staticDir, host="127.0.0.1", port=12345):
+  """
+  Return the HTTP server of a viewer, which also serves the files of
+  staticDir, e.g. the viewer page. It works offline and only listens to the
+  local host by default.
+
+  @param viewer     (Viewer)  Viewer of the data and results files.
+  @param staticDir  (string)  Directory of the viewer page.
+  @param host       (string)  Host of the server.
+  @param port       (int)     Port of the server, 0 for any free port.
+
+  @return           (ThreadingHTTPServer)  Server, see serve_forever().
+  """
+  def createHandler(*args, **kwargs):
+    return ViewerRequestHandler(*args, directory=staticDir, **kwargs)
+
+  server = ThreadingHTTPServer((host, port), createHandler)
+  server.viewer = viewer
+  return server
@@ -21,12 +21,14 @@
 
 import argparse
 import os
-import subprocess
+from functools import partial
 try:
   import simplejson as json
 except ImportError:
   import json
 
+from nab.detectors.ensemble.ensemble_detector import EnsembleDetector
+from nab.detectors.python2 import Python2Detector, PYTHON2_DETECTORS
 from nab.runner import Runner
 from nab.util import (detectorNameToClass, checkInputs)
 
@@ -38,35 +40,14 @@ def getDetectorClassConstructors(detectors):
   detectors and returns them in a dict. The dict maps detector name to class
   names. Assumes the detectors have been imported.
   """
-  #handle py2 detectors separately:
-  py2detectors = ",".join([d for d in detectors if (d == "numenta" or d == "numentaTM" or d == "htmjava") ])
-  if py2detectors:
-      ENV_PY2="./pyenv2/bin/python"
-      argss=[]
-      #re-parsing the arguments, as we'll provide it to a new process (python2)
-      if args.numCPUs is not None:
-          argss.append(" --numCPUs="+str(args.numCPUs))
-      argss.append("--skipConfirmation") #always skip confirmation here
- #     if args.detectors is not None:
- #       argss.append("--detectors="+py2detectors)
-      if args.dataDir:
-        argss.append("--dataDir="+str(args.dataDir))
-      if args.profilesFile:
-        argss.append("--profilesFile="+str(args.profilesFile))
-      if args.resultsDir:
-        argss.append("--resultsDir="+str(args.resultsDir))
-      if args.windowsFile:
-        argss.append("--windowsFile="+str(args.windowsFile))
-
-  if "htmjava" in py2detectors: # htm.java
-    subprocess.call([ENV_PY2, "./nab/detectors/htmjava/run.py"]+ argss)
-  elif "numenta" in py2detectors or "numentaTM" in py2detectors: # Numenta*
-    argss.append("--detectors="+py2detectors)
-    subprocess.call([ENV_PY2, "./nab/detectors/numenta/run.py"]+ argss)
-    
-  detectors = [d for d in detectors if d not in py2detectors] # rm numenta*, htmjava
+  # Python 2 detectors run in Python 2 worker processes, fed by the same pool
+  # as the other detectors. See nab/detectors/python2.py
+  py2Detectors = [d for d in detectors if d in PYTHON2_DETECTORS]
+  detectors = [d for d in detectors if d not in py2Detectors]
 
   detectorConstructors = {d : globals()[detectorNameToClass(d)] for d in detectors}
+  detectorConstructors.update(
+    {d : partial(Python2Detector, d) for d in py2Detectors})
   return detectorConstructors
 
 
@@ -81,20 +62,38 @@ def main(args):
   resultsDir = os.path.join(root, args.resultsDir)
   profilesFile = os.path.join(root, args.profilesFile)
   thresholdsFile = os.path.join(root, args.thresholdsFile)
+  ensemblesFile = os.path.join(root, args.ensemblesFile)
+  profileDir = os.path.join(root, args.profileDir) if args.profile else None
 
   runner = Runner(dataDir=dataDir,
                   labelPath=windowsFile,
                   resultsDir=resultsDir,
                   profilesPath=profilesFile,
                   thresholdPath=thresholdsFile,
-                  numCPUs=numCPUs)
+                  numCPUs=numCPUs,
+                  profileDir=profileDir)
 
   runner.initialize()
 
   if args.detect:
-    detectorConstructors = getDetectorClassConstructors(args.detectors)
+    ensembles = {}
+    if os.path.isfile(ensemblesFile):
+      with open(ensemblesFile) as f:
+        ensembles = json.load(f)
+    ensembleNames = [d for d in args.detectors if d in ensembles]
+
+    detectorConstructors = getDetectorClassConstructors(
+      [d for d in args.detectors if d not in ensembleNames])
     runner.detect(detectorConstructors)
 
+    # Ensembles combine the results of other detectors, so they run after them
+    if ensembleNames:
+      runner.detect({d : partial(EnsembleDetector,
+                                 dataDir=dataDir,
+                                 resultsDir=resultsDir,
+                                 **ensembles[d])
+                     for d in ensembleNames})
+
   if args.optimize:
     runner.optimize(args.detectors)
 
@@ -104,11 +103,11 @@ def main(args):
     runner.score(args.detectors, detectorThresholds)
 
   if args.normalize:
-    try:
+    if args.score:
       runner.normalize()
-    except AttributeError("Error: you must run the scoring step with the "
-                          "normalization step."):
-      return
+    else:
+      # Normalize the scores written by a previous scoring step
+      runner.normalize(runner.readScores(args.detectors))
 
 
 if __name__ == "__main__":
@@ -175,11 +174,29 @@ if __name__ == "__main__":
                     help="The configuration file that stores thresholds for "
                     "each combination of detector and username")
 
+  parser.add_argument("-e", "--ensemblesFile",
+                    default=os.path.join("config", "ensembles.json"),
+                    help="The configuration file of the ensembles, detectors "
+                    "combining the results of other detectors")
+
   parser.add_argument("-n", "--numCPUs",
                     default=None,
                     help="The number of CPUs to use to run the "
                     "benchmark. If not specified all CPUs will be used.")
 
+  parser.add_argument("--profile",
+                    help="Profile the CPU time of each step, in the main "
+                    "process and in the worker processes, and write the "
+                    "profiles to the profile directory",
+                    default=False,
+                    action="store_true")
+
+  parser.add_argument("--profileDir",
+                    default="profiles",
+                    help="This will hold the profiles and reports of the main "
+                    "and worker processes and the collapsed stacks, for flame "
+                    "graphs, of each step when profiling")
+
   args = parser.parse_args()
 
   if (not args.detect
@@ -231,19 +248,9 @@ if __name__ == "__main__":
     from nab.detectors.htmcore.htmcore_detector import HtmcoreDetector
   if "threshold" in args.detectors:
     from nab.detectors.threshold.threshold_detector import ThresholdDetector
-
-  # Special hacks for detectors requiring Python 2:
-  # TODO the imports are failing, remove? Py2 detectors have special treatment in `getDetectorClassConstructors()` above
-  #
-  #if "numenta" in args.detectors:
-  #  ENV_PY2="./pyenv2/bin/python"
-  #  subprocess.call([ENV_PY2, "from nab.detectors.numenta.numenta_detector import NumentaDetector"])
-  #if "numentaTM" in args.detectors:
-  #  ENV_PY2="./pyenv2/bin/python"
-  #  subprocess.call([ENV_PY2, "from nab.detectors.numenta.numentaTM_detector import NumentaTMDetector"])
-  #  if "htmjava" in args.detectors:
-  #    ENV_PY2="./pyenv2/bin/python"
-  #    subprocess.call([ENV_PY2, "from nab.detectors.htmjava.htmjava_detector import HtmjavaDetector"])
+  if "randomCutForest" in args.detectors:
+    from nab.detectors.random_cut_forest.random_cut_forest_detector import (
+      RandomCutForestDetector)
 
   if args.skipConfirmation or checkInputs(args):
     main(args)
@@ -21,10 +21,13 @@
 
 import os
 import argparse
-import pandas
+from functools import partial
+try:
+  import simplejson as json
+except ImportError:
+  import json
 
-from nab.corpus import Corpus
-from nab.labeler import CorpusLabel
+from nab.corpus import addLabels, transformCorpus
 from nab.util import recur, checkInputs
 
 depth = 2
@@ -36,28 +39,21 @@ root = recur(os.path.dirname, os.path.realpath(__file__), depth)
 def main(args):
 
   if not args.absolutePaths:
-    args.labelDir = os.path.join(root, args.labelDir)
+    args.windowsFile = os.path.join(root, args.windowsFile)
     args.dataDir = os.path.join(root, args.dataDir)
     args.destDir = os.path.join(root, args.destDir)
 
   if not checkInputs(args):
     return
 
-  corpus = Corpus(args.dataDir)
+  with open(args.windowsFile) as windowsFile:
+    windows = json.load(windowsFile)
 
-  corpusLabel = CorpusLabel(args.labelDir, corpus=corpus)
-  corpusLabel.getEverything()
+  written = transformCorpus(args.dataDir, partial(addLabels, windows=windows),
+                            args.destDir, numCPUs=args.numCPUs)
 
-  columnData = {}
-  for relativePath in list(corpusLabel.labels.keys()):
-    columnData[relativePath] = pandas.Series(
-      corpusLabel.labels[relativePath]["label"])
-
-  corpus.addColumn("label", columnData)
-
-  corpus.copy(newRoot=args.destDir)
-
-  print("Done adding labels!")
+  print("Done adding labels! %d files written, %d already up to date"
+        % (sum(written.values()), len(written) - sum(written.values())))
 
 
 if __name__ == "__main__":
@@ -65,11 +61,12 @@ if __name__ == "__main__":
 
   parser.add_argument("--dataDir",
                     default="data",
-                    help="This holds all the label windows for the corpus.")
+                    help="This holds all the data files of the corpus.")
 
-  parser.add_argument("--labelDir",
-                    default="labels",
-                    help="This holds all the label windows for the corpus.")
+  parser.add_argument("--windowsFile",
+                    default=os.path.join("labels", "combined_windows.json"),
+                    help="JSON file containing the label windows for the "
+                    "corpus.")
 
   parser.add_argument("--destDir",
                     help="Where you want to store the resulting corpus")
@@ -80,6 +77,11 @@ if __name__ == "__main__":
                       default=False,
                       action="store_true")
 
+  parser.add_argument("-n", "--numCPUs",
+                      type=int,
+                      default=None,
+                      help="The number of CPUs to use. If not specified all "
+                      "CPUs will be used.")
+
   args = parser.parse_args()
   main(args)
-
@@ -0,0 +1,128 @@
+#! /usr/bin/env python
+# ----------------------------------------------------------------------
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Computes the anomaly likelihood of the raw scores stored in the results of a
+detector with new likelihood parameters, without running the detector again.
+The results are written as the results of a new detector, e.g.
+
+  python scripts/apply_likelihood.py --detector htmcore \\
+    --name htmcoreReestimation50 --reestimationPeriod 50
+  python run.py -d htmcoreReestimation50 --optimize --score --normalize
+"""
+
+import argparse
+import os
+
+from nab.corpus import Corpus
+from nab.detectors.anomaly_likelihood import (nabLikelihoodParameters,
+                                              setLikelihoodScores)
+from nab.detectors.spatial_anomaly import setSpatialAnomalies
+from nab.util import createPath, getProbationPeriod, recur
+
+
+
+def main(args):
+  root = recur(os.path.dirname, os.path.realpath(__file__), 2)
+  resultsDir = os.path.join(root, args.resultsDir)
+  detectorDir = os.path.join(resultsDir, args.detector)
+  if not os.path.isdir(detectorDir):
+    raise IOError("No results directory for the %s detector." % args.detector)
+
+  corpus = Corpus(detectorDir)
+  prefix = args.detector + "_"
+  for relativePath, dataFile in sorted(corpus.dataFiles.items()):
+    relativeDir, fileName = os.path.split(relativePath)
+    if not relativeDir:
+      # Scores of the detector
+      continue
+
+    results = dataFile.data
+    if "raw_score" not in results:
+      raise ValueError("%s has no raw_score column" % dataFile.srcPath)
+
+    probationaryPeriod = getProbationPeriod(args.probationaryPercent,
+                                            len(results))
+    parameters = nabLikelihoodParameters(probationaryPeriod,
+                                         args.reestimationPeriod)
+    parameters["historicWindowSize"] = args.historicWindowSize
+    parameters["averagingWindow"] = args.averagingWindow
+    setLikelihoodScores(results, **parameters)
+    if not args.noSpatialAnomaly:
+      setSpatialAnomalies(results)
+
+    if fileName.startswith(prefix):
+      fileName = fileName[len(prefix):]
+    outputPath = os.path.join(resultsDir, args.name, relativeDir,
+                              args.name + "_" + fileName)
+    createPath(outputPath)
+    results[["timestamp", "value", "anomaly_score", "raw_score",
+             "label"]].to_csv(outputPath, index=False)
+    print("Results have been written to %s" % outputPath)
+
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+
+  parser.add_argument("--detector",
+                      required=True,
+                      help="Detector whose results have a raw_score column.")
+
+  parser.add_argument("--name",
+                      required=True,
+                      help="Name of the detector the new results are written "
+                      "for.")
+
+  parser.add_argument("--resultsDir",
+                      default="results",
+                      help="This holds the path of the results directory.")
+
+  parser.add_argument("--probationaryPercent",
+                      default=0.15,
+                      type=float,
+                      help="Probationary percent of the data files, its "
+                      "first half is the likelihood learning period.")
+
+  parser.add_argument("--reestimationPeriod",
+                      default=100,
+                      type=int,
+                      help="The likelihood distribution is estimated again "
+                      "after this many records.")
+
+  parser.add_argument("--historicWindowSize",
+                      default=8640,
+                      type=int,
+                      help="Number of records the distribution is estimated "
+                      "from.")
+
+  parser.add_argument("--averagingWindow",
+                      default=10,
+                      type=int,
+                      help="Size of the moving average of the raw scores.")
+
+  parser.add_argument("--noSpatialAnomaly",
+                      default=False,
+                      action="store_true",
+                      help="Do not set the score of spatial anomalies to 1.")
+
+  args = parser.parse_args()
+  main(args)
@@ -55,7 +55,8 @@ def main(args):
   print("Creating LabelCombiner.")
   labelCombiner = LabelCombiner(labelDir, corpus,
                                 args.threshold, windowSize,
-                                probationaryPercent, args.verbosity)
+                                probationaryPercent, args.verbosity,
+                                args.numCPUs)
 
   print("Combining labels.")
   labelCombiner.combine()
@@ -109,6 +110,13 @@ if __name__ == "__main__":
                            "metrics during the process, acceptable values are "
                            "0, 1, and 2.")
 
+  parser.add_argument("-n", "--numCPUs",
+                      default=None,
+                      type=int,
+                      help="The number of CPUs to use to combine the labels of "
+                           "the data files. If not specified all CPUs will be "
+                           "used.")
+
   parser.add_argument("--skipConfirmation",
                     default=False,
                     action="store_true",
@@ -0,0 +1,185 @@
+#! /usr/bin/env python
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Fits the weights of a "mean" ensemble of config/ensembles.json. Every weight
+vector of a grid over the simplex is scored the way NAB scores a detector:
+the threshold of each profile is optimized, the corpus is scored and the
+scores are normalized (see nab/paramsearch.py). The combined scores are
+computed from the stored results of the detectors of the ensemble, which are
+not run again.
+
+The best weights for --profile are written to the ensembles file, with a "fit"
+entry recording how they were obtained, e.g. for an ensemble "numentaOSEMean"
+of "numenta" and "contextOSE" with "combine": "mean"
+
+  python scripts/fit_ensemble_weights.py numentaOSEMean
+"""
+
+import argparse
+import os
+from functools import partial
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+from nab.detectors.ensemble.ensemble_detector import EnsembleDetector
+from nab.paramsearch import ParameterSearch
+from nab.util import recur
+
+depth = 2
+
+root = recur(os.path.dirname, os.path.realpath(__file__), depth)
+
+
+
+def weightGrid(numDetectors, step):
+  """
+  Returns the weight vectors summing to 1 whose weights are multiples of step.
+
+  @param numDetectors (int)   Number of detectors of the ensemble.
+  @param step         (float) Spacing of the grid, 1/step must be an integer.
+
+  @return             (list)  Weight vectors, as lists of floats.
+  """
+  numSteps = int(round(1.0 / step))
+
+  def compositions(total, parts):
+    if parts == 1:
+      yield [total]
+      return
+    for first in range(total, -1, -1):
+      for rest in compositions(total - first, parts - 1):
+        yield [first] + rest
+
+  return [[round(float(n) / numSteps, 10) for n in counts]
+          for counts in compositions(numSteps, numDetectors)]
+
+
+def createEnsemble(parameters, **kwargs):
+  """EnsembleDetector constructor taking its weights as search parameters."""
+  return EnsembleDetector(weights=parameters["weights"], **kwargs)
+
+
+def main(args):
+  ensemblesFile = os.path.join(root, args.ensemblesFile)
+  with open(ensemblesFile) as f:
+    ensembles = json.load(f)
+  ensemble = ensembles[args.ensemble]
+  if ensemble.get("combine", "mean") != "mean":
+    raise ValueError("Only the weights of 'mean' ensembles can be fitted")
+
+  search = ParameterSearch(
+    dataDir=os.path.join(root, args.dataDir),
+    labelPath=os.path.join(root, args.windowsFile),
+    profilesPath=os.path.join(root, args.profilesFile),
+    detectorClass=partial(createEnsemble,
+                          dataDir=os.path.join(root, args.dataDir),
+                          resultsDir=os.path.join(root, args.resultsDir),
+                          detectors=ensemble["detectors"],
+                          combine="mean"),
+    detectorName=args.ensemble,
+    numCPUs=args.numCPUs,
+    logPath=args.logPath)
+
+  candidates = [{"weights": weights}
+                for weights in weightGrid(len(ensemble["detectors"]),
+                                          args.step)]
+  try:
+    scores = search.evaluate(candidates)
+  finally:
+    search.close()
+
+  for candidate, candidateScores in zip(candidates, scores):
+    print("%s %s" % (candidate["weights"], candidateScores))
+
+  best = max(range(len(candidates)),
+             key=lambda i: scores[i][args.profile])
+  print("Best weights for %s: %s" % (args.profile,
+                                     candidates[best]["weights"]))
+
+  ensemble["weights"] = candidates[best]["weights"]
+  ensemble["fit"] = {
+    "method": "grid search over the simplex, see "
+              "scripts/fit_ensemble_weights.py",
+    "step": args.step,
+    "profile": args.profile,
+    "dataDir": args.dataDir,
+    "resultsDir": args.resultsDir,
+    "scores": scores[best]
+  }
+  with open(ensemblesFile, "w") as f:
+    json.dump(ensembles, f, indent=2, separators=(",", ": "))
+    f.write("\n")
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+
+  parser.add_argument("ensemble",
+                      help="Name of the ensemble in the ensembles file")
+
+  parser.add_argument("--step",
+                      default=0.1,
+                      type=float,
+                      help="Spacing of the grid of weights")
+
+  parser.add_argument("--profile",
+                      default="standard",
+                      help="Scoring profile whose normalized score is "
+                      "maximized")
+
+  parser.add_argument("-e", "--ensemblesFile",
+                      default=os.path.join("config", "ensembles.json"),
+                      help="The configuration file of the ensembles, relative "
+                      "to NAB root")
+
+  parser.add_argument("--dataDir",
+                      default="data",
+                      help="This holds all the data files, relative to NAB root")
+
+  parser.add_argument("--resultsDir",
+                      default="results",
+                      help="This holds the results of the detectors of the "
+                      "ensemble, relative to NAB root")
+
+  parser.add_argument("--windowsFile",
+                      default=os.path.join("labels", "combined_windows.json"),
+                      help="JSON file containing ground truth labels for the "
+                      "corpus, relative to NAB root")
+
+  parser.add_argument("-p", "--profilesFile",
+                      default=os.path.join("config", "profiles.json"),
+                      help="The configuration file to use while running the "
+                      "benchmark, relative to NAB root")
+
+  parser.add_argument("-n", "--numCPUs",
+                      default=None,
+                      type=int,
+                      help="The number of CPUs to use to run the benchmark")
+
+  parser.add_argument("--logPath",
+                      default=None,
+                      help="Optional file every evaluated weight vector and "
+                      "its scores are appended to")
+
+  args = parser.parse_args()
+  main(args)
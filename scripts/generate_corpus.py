@@ -0,0 +1,129 @@
+#! /usr/bin/env python
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Generates a synthetic corpus with its label files, to run NAB at a larger
+scale than the NAB corpus, e.g.
+
+  python scripts/generate_corpus.py --outputDir synthetic --numFiles 5800
+  python run.py -d null --dataDir synthetic/data \\
+    --windowsFile synthetic/labels/combined_windows.json \\
+    --resultsDir synthetic/results -t synthetic/thresholds.json
+"""
+
+import argparse
+import time
+
+from nab.synthetic import ANOMALY_TYPES, generateCorpus
+
+
+
+def main(args):
+  start = time.time()
+  dataDir, windowsPath = generateCorpus(
+    args.outputDir,
+    args.numFiles,
+    lengths=args.lengths,
+    anomalies=args.anomalies,
+    intervals=args.intervals,
+    anomalyTypes=args.anomalyTypes,
+    windowSize=args.windowSize,
+    probationaryPercent=args.probationaryPercent,
+    category=args.category,
+    seed=args.seed,
+    numCPUs=args.numCPUs)
+
+  print("Generated %d data files in %s and their windows in %s in %.1f s"
+        % (args.numFiles, dataDir, windowsPath, time.time() - start))
+
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+
+  parser.add_argument("--outputDir",
+                      required=True,
+                      help="Directory of the corpus. The data files are "
+                      "written to its data directory, the label files to its "
+                      "labels directory.")
+
+  parser.add_argument("--numFiles",
+                      type=int,
+                      default=58,
+                      help="Number of data files.")
+
+  parser.add_argument("--lengths",
+                      nargs=2,
+                      type=int,
+                      default=[1000, 22000],
+                      metavar=("MIN", "MAX"),
+                      help="Range of the numbers of records of the data "
+                      "files.")
+
+  parser.add_argument("--anomalies",
+                      nargs=2,
+                      type=int,
+                      default=[0, 4],
+                      metavar=("MIN", "MAX"),
+                      help="Range of the numbers of anomalies of the data "
+                      "files, i.e. of the density of windows.")
+
+  parser.add_argument("--intervals",
+                      nargs="*",
+                      default=["5min"],
+                      help="Times between records, e.g. 5min 1h. Each file "
+                      "has one of them.")
+
+  parser.add_argument("--anomalyTypes",
+                      nargs="*",
+                      default=ANOMALY_TYPES,
+                      choices=ANOMALY_TYPES,
+                      help="Types of the injected anomalies.")
+
+  parser.add_argument("--windowSize",
+                      type=float,
+                      default=0.10,
+                      help="Fraction of the records of a file in its "
+                      "windows.")
+
+  parser.add_argument("--probationaryPercent",
+                      type=float,
+                      default=0.15,
+                      help="Probationary percent of scoring, no anomaly is "
+                      "injected in it.")
+
+  parser.add_argument("--category",
+                      default="synthetic",
+                      help="Directory of the data files in the corpus.")
+
+  parser.add_argument("--seed",
+                      type=int,
+                      default=0,
+                      help="Seed of the corpus.")
+
+  parser.add_argument("-n", "--numCPUs",
+                      type=int,
+                      default=None,
+                      help="The number of CPUs to use to generate the "
+                      "corpus. If not specified all CPUs will be used.")
+
+  args = parser.parse_args()
+  main(args)
@@ -0,0 +1,72 @@
+"""
+This file implements parameter optimization of the htm.core detector on NAB using random search with successive halving.
+All candidates are first scored on a small stratified subset of the data categories, then only the best 1/eta of them
+are promoted to larger subsets, up to the whole corpus. Detection results of earlier rungs are reused.
+Run it from the root of this repo with python scripts/optimize_halving.py --candidates 27 --eta 3 --rungs 3
+"""
+
+import argparse
+import os
+from functools import partial
+import random
+
+from nab.detectors.htmcore.htmcore_detector import (HtmcoreDetector,
+                                                    parameters_numenta_comparable)
+from nab.paramsearch import ParameterSearch, mergeParameters
+
+
+# bounds of the parameters to optimize
+bounds = {
+    'sp': {
+        'localAreaDensity': (0.01, 0.15),
+    },
+    'tm': {
+        'permanenceInc': (0.01, 0.1),
+    },
+}
+
+
+def sample(rng, bounds):
+    return {key: sample(rng, value) if isinstance(value, dict) else rng.uniform(*value)
+            for key, value in bounds.items()}
+
+
+def main(args):
+    root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    search = ParameterSearch(dataDir=os.path.join(root, 'data'),
+                             labelPath=os.path.join(root, 'labels', 'combined_windows.json'),
+                             profilesPath=os.path.join(root, 'config', 'profiles.json'),
+                             # only SP/TM parameters change, so all candidates share the encodings
+                             detectorClass=partial(HtmcoreDetector,
+                                                   encodingCacheDir=os.path.join(root, 'encoding_cache')),
+                             detectorName='htmcore',
+                             numCPUs=args.numCPUs,
+                             logPath=args.logPath)
+
+    rng = random.Random(args.seed)
+    candidates = [mergeParameters(parameters_numenta_comparable, sample(rng, bounds))
+                  for _ in range(args.candidates)]
+
+    ranked = search.successiveHalving(candidates,
+                                      eta=args.eta,
+                                      numRungs=args.rungs,
+                                      seed=args.seed)
+    search.close()
+
+    parameters, scores = ranked[0]
+    print('Best candidate: %s' % parameters)
+    print('Scores: %s' % scores)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--candidates', type=int, default=27,
+                        help='Number of random candidates')
+    parser.add_argument('--eta', type=int, default=3,
+                        help='Only the best 1/eta candidates are promoted to the next rung')
+    parser.add_argument('--rungs', type=int, default=3,
+                        help='Number of rungs, the last one runs on the whole corpus')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-n', '--numCPUs', type=int, default=None)
+    parser.add_argument('--logPath', default='./halving_optimization_logs.json')
+    main(parser.parse_args())
@@ -0,0 +1,122 @@
+#! /usr/bin/env python
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Renders the plots of the detections of detectors on all the data files, in
+parallel and offline, with an index page linking them.
+"""
+
+import os
+import argparse
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+from nab.plot import HEIGHT, WIDTH, plotReport
+from nab.util import recur
+
+depth = 2
+
+root = recur(os.path.dirname, os.path.realpath(__file__), depth)
+
+
+
+def main(args):
+
+  if not args.absolutePaths:
+    args.resultsDir = os.path.join(root, args.resultsDir)
+    args.windowsFile = os.path.join(root, args.windowsFile)
+    args.thresholdsFile = os.path.join(root, args.thresholdsFile)
+    args.outputDir = os.path.join(root, args.outputDir)
+
+  with open(args.windowsFile) as windowsFile:
+    windows = json.load(windowsFile)
+  with open(args.thresholdsFile) as thresholdsFile:
+    thresholds = json.load(thresholdsFile)
+
+  plotPaths = plotReport(args.resultsDir, windows, thresholds, args.detectors,
+                         args.outputDir, profile=args.profile,
+                         imageFormat=args.format, width=args.width,
+                         height=args.height, numCPUs=args.numCPUs)
+
+  print("%d plots written to %s" % (len(plotPaths), args.outputDir))
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+
+  parser.add_argument("--detectors",
+                      nargs="*",
+                      type=str,
+                      default=["numenta", "null"],
+                      help="Detectors whose results are plotted")
+
+  parser.add_argument("--profile",
+                      default="standard",
+                      help="Scoring profile of the detection thresholds")
+
+  parser.add_argument("--resultsDir",
+                      default="results",
+                      help="This holds all the results files")
+
+  parser.add_argument("--windowsFile",
+                      default=os.path.join("labels", "combined_windows.json"),
+                      help="JSON file containing the label windows for the "
+                      "corpus.")
+
+  parser.add_argument("--thresholdsFile",
+                      default=os.path.join("config", "thresholds.json"),
+                      help="JSON file containing the detection thresholds")
+
+  parser.add_argument("--outputDir",
+                      default="plots",
+                      help="Where you want to store the plots")
+
+  parser.add_argument("--format",
+                      default="html",
+                      help="html for interactive plots, or an image format "
+                      "such as png, which requires plotly's image export")
+
+  parser.add_argument("--width",
+                      default=WIDTH,
+                      type=int,
+                      help="Width of the plots in pixels, the values are "
+                      "downsampled to the minimum and maximum of each pixel")
+
+  parser.add_argument("--height",
+                      default=HEIGHT,
+                      type=int,
+                      help="Height of the plots in pixels")
+
+  parser.add_argument("--absolutePaths",
+                      help="Whether file paths entered are not relative to \
+                      NAB root",
+                      default=False,
+                      action="store_true")
+
+  parser.add_argument("-n", "--numCPUs",
+                      type=int,
+                      default=None,
+                      help="The number of CPUs to use. If not specified all "
+                      "CPUs will be used.")
+
+  args = parser.parse_args()
+  main(args)
@@ -21,11 +21,12 @@
 
 import os
 import argparse
+from functools import partial
 
-from nab.corpus import Corpus
+from nab.corpus import removeColumns, transformCorpus
 from nab.util import recur
 
-depth = 3
+depth = 2
 
 root = recur(os.path.dirname, os.path.realpath(__file__), depth)
 
@@ -37,10 +38,14 @@ def main(args):
     if args.destDir:
       args.destDir = os.path.join(root, args.destDir)
 
-  corpus = Corpus(args.dataDir)
+  written = transformCorpus(args.dataDir,
+                            partial(removeColumns,
+                                    columnNames=args.columnNames),
+                            args.destDir,
+                            numCPUs=args.numCPUs)
 
-  for name in args.columnNames:
-    corpus.removeColumn(name, write=True, newRoot=args.destDir)
+  print("Columns removed: %d files written, %d already up to date"
+        % (sum(written.values()), len(written) - sum(written.values())))
 
 
 if __name__ == "__main__":
@@ -52,7 +57,8 @@ if __name__ == "__main__":
 
   parser.add_argument("--destDir",
                     default=None,
-                    help="Where you want to store the resulting corpus")
+                    help="Where you want to store the resulting corpus, the "
+                    "data files are modified in place by default")
 
   parser.add_argument("--absolutePaths",
                       help="Whether file paths entered are not relative to \
@@ -65,5 +71,11 @@ if __name__ == "__main__":
                       nargs="+",
                       type=str)
 
+  parser.add_argument("-n", "--numCPUs",
+                      type=int,
+                      default=None,
+                      help="The number of CPUs to use. If not specified all "
+                      "CPUs will be used.")
+
   args = parser.parse_args()
   main(args)
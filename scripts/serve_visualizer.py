@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Serves scripts/nab_visualizer.html and the downsampled series of the data and
+results files it shows, on a local HTTP server.
+"""
+
+import os
+import argparse
+
+from nab.viewer import Viewer, createServer
+from nab.util import recur
+
+depth = 2
+
+root = recur(os.path.dirname, os.path.realpath(__file__), depth)
+
+
+
+def main(args):
+
+  viewer = Viewer(root, args.dataDir, args.resultsDir,
+                  os.path.join(root, args.windowsFile))
+  server = createServer(viewer, os.path.dirname(os.path.realpath(__file__)),
+                        args.host, args.port)
+
+  print("Open http://%s:%d/nab_visualizer.html" % (args.host, args.port))
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+
+  parser.add_argument("--dataDir",
+                      default="data",
+                      help="This holds all the data files, relative to NAB "
+                      "root")
+
+  parser.add_argument("--resultsDir",
+                      default="results",
+                      help="This holds all the results files, relative to NAB "
+                      "root")
+
+  parser.add_argument("--windowsFile",
+                      default=os.path.join("labels", "combined_windows.json"),
+                      help="JSON file containing the label windows for the "
+                      "corpus, relative to NAB root")
+
+  parser.add_argument("--host",
+                      default="127.0.0.1",
+                      help="Host of the server")
+
+  parser.add_argument("--port",
+                      default=12345,
+                      type=int,
+                      help="Port of the server")
+
+  args = parser.parse_args()
+  main(args)
@@ -20,18 +20,13 @@
 # ----------------------------------------------------------------------
 import argparse
 import os
-import pandas
 
+from nab.corpus import sortRows, transformCorpus
 from nab.util import recur, checkInputs
 
 depth = 2
 root = recur(os.path.dirname, os.path.realpath(__file__), depth)
 
-def sortData(input_filename, output_filename):
-  df = pandas.read_csv(input_filename)
-  df.sort(columns='timestamp', inplace=True)
-  return df.to_csv(output_filename, index=False)
-
 
 def main(args):
 
@@ -42,17 +37,12 @@ def main(args):
   if not checkInputs(args):
     return
 
-  if not os.path.exists(args.destDir):
-    os.makedirs(args.destDir)
-
-  datafiles = [f for f in os.listdir(args.dataDir) if f.endswith(".csv")]
-
-  for datafile in datafiles:
-    input_filename = os.path.join(args.dataDir, datafile)
-    output_filename = os.path.join(args.destDir, datafile)
-    sortData(input_filename, output_filename)
+  written = transformCorpus(args.dataDir, sortRows, args.destDir,
+                            numCPUs=args.numCPUs)
 
-  print("Sorted files written to ", args.destDir)
+  print("Sorted files written to %s: %d written, %d already up to date"
+        % (args.destDir, sum(written.values()),
+           len(written) - sum(written.values())))
 
 
 if __name__ == "__main__":
@@ -71,6 +61,11 @@ if __name__ == "__main__":
                       default=False,
                       action="store_true")
 
+  parser.add_argument("-n", "--numCPUs",
+                      type=int,
+                      default=None,
+                      help="The number of CPUs to use. If not specified all "
+                      "CPUs will be used.")
+
   args = parser.parse_args()
   main(args)
-
@@ -20,6 +20,7 @@
 # ----------------------------------------------------------------------
 
 import copy
+import functools
 import numpy as np
 import os
 import pandas
@@ -156,5 +157,60 @@ class CorpusTest(unittest.TestCase):
       self.assertIn(query2, relativePath)
 
 
+  def testTransform(self):
+    """
+    Test the transform() function, specifically check that the transformed
+    files are written to the new root, that unchanged files are not rewritten
+    and that the files transformed in place are reloaded.
+    """
+    copyLocation = os.path.join(tempfile.mkdtemp(), "test")
+    copyCorpus = self.corpus.copy(copyLocation)
+
+    # Writing the files again leaves them unchanged
+    written = copyCorpus.transform(nab.corpus.sortRows)
+    self.assertEqual(sorted(written), sorted(self.corpus.dataFiles))
+    self.assertFalse(any(written.values()))
+
+    relativePath = "realAWSCloudwatch/ec2_cpu_utilization_5f5533.csv"
+    srcPath = os.path.join(copyLocation, relativePath)
+    with open(srcPath) as srcFile:
+      lines = srcFile.read().splitlines()
+    with open(srcPath, "w") as srcFile:
+      srcFile.write("\n".join([lines[0]] + lines[:0:-1]) + "\n")
+    os.chmod(srcPath, 0o644)
+
+    newLocation = os.path.join(tempfile.mkdtemp(), "test")
+    written = copyCorpus.transform(nab.corpus.sortRows, newLocation)
+    self.assertTrue(all(written.values()))
+    with open(os.path.join(newLocation, relativePath)) as newFile:
+      self.assertEqual(newFile.read().splitlines(), lines)
+
+    windows = {relativePath: [["2014-02-14 14:27:00", "2014-02-14 15:27:00"]]}
+    written = copyCorpus.transform(
+      functools.partial(nab.corpus.addLabels, windows=windows))
+    self.assertEqual([p for p in written if written[p]], [relativePath])
+    # Rewritten files keep their mode, new files get the default one
+    self.assertEqual(os.stat(srcPath).st_mode & 0o777, 0o644)
+    umask = os.umask(0)
+    os.umask(umask)
+    self.assertEqual(
+      os.stat(os.path.join(newLocation, relativePath)).st_mode & 0o777,
+      0o666 & ~umask)
+    data = copyCorpus.dataFiles[relativePath].data
+    self.assertEqual(list(data.columns), ["timestamp", "value", "label"])
+    self.assertEqual(data["label"].sum(), 13)
+
+    copyCorpus.transform(
+      functools.partial(nab.corpus.removeColumns, columnNames=["label"]))
+    self.assertEqual(list(copyCorpus.dataFiles[relativePath].data.columns),
+                     ["timestamp", "value"])
+    self.assertEqual(
+      [p for p in os.listdir(os.path.dirname(srcPath)) if p.endswith(".tmp")],
+      [])
+
+    shutil.rmtree(copyLocation)
+    shutil.rmtree(newLocation)
+
+
 if __name__ == '__main__':
   unittest.main()
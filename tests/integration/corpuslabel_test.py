@@ -161,6 +161,46 @@ class CorpusLabelTest(unittest.TestCase):
               "Incorrect label value for timestamp %r" % t)
 
 
+  def testLabelIntervals(self):
+    """
+    Labels are stored as row intervals of the windows, the dense labels and
+    the timestamps are those of the data file.
+    """
+    data = pandas.DataFrame({"timestamp" :
+      generateTimestamps(strp("2014-01-01"),
+      datetime.timedelta(minutes=5), 20)})
+
+    windows = [["2014-01-01 00:10", "2014-01-01 00:20"],
+               ["2014-01-01 01:00", "2014-01-01 01:35"]]
+
+    writeCorpus(self.tempCorpusPath, {"test_data_file.csv" : data})
+    writeCorpusLabel(self.tempCorpusLabelPath, {"test_data_file.csv": windows})
+
+    corpus = nab.corpus.Corpus(self.tempCorpusPath)
+    corpusLabel = nab.labeler.CorpusLabel(self.tempCorpusLabelPath, corpus)
+
+    self.assertEqual(
+      corpusLabel.intervals["test_data_file.csv"].tolist(), [[2, 4], [12, 19]])
+    self.assertEqual(
+      corpusLabel.getLabelVector("test_data_file.csv").tolist(),
+      [0] * 2 + [1] * 3 + [0] * 7 + [1] * 8)
+    self.assertIs(corpusLabel.getTimestamps("test_data_file.csv"),
+                  corpus.dataFiles["test_data_file.csv"].data["timestamp"])
+    self.assertEqual(list(corpusLabel.labels), ["test_data_file.csv"])
+    self.assertNotIn("other_data_file.csv", corpusLabel.labels)
+
+    # Rows out of chronological order split the intervals of a window
+    timestamps = pandas.Series(pandas.to_datetime(
+      ["2014-01-01 00:00", "2014-01-01 00:10", "2014-01-01 00:05",
+       "2014-01-01 00:30", "2014-01-01 00:15"]))
+    windows = [[strp("2014-01-01 00:05"), strp("2014-01-01 00:15")]]
+
+    self.assertEqual(
+      nab.labeler.windowIntervals(timestamps, windows).tolist(),
+      [[1, 2], [4, 4]])
+    self.assertEqual(nab.labeler.windowIntervals(timestamps, []).shape, (0, 2))
+
+
   def testRedundantTimestampsRaiseException(self):
     data = pandas.DataFrame({"timestamp" :
       generateTimestamps(strp("2015-01-01"),
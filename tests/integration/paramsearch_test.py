@@ -0,0 +1,198 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014-2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+from functools import partial
+
+import pandas
+
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+from nab.detectors.base import AnomalyDetector
+from nab.paramsearch import mergeParameters, ParameterSearch
+from nab.runner import Runner
+from nab.util import recur
+
+
+
+class ScaledValueDetector(AnomalyDetector):
+  """Scores records by their value scaled with the given parameters."""
+
+  def __init__(self, *args, **kwargs):
+    self.parameters = kwargs.pop("parameters")
+    super(ScaledValueDetector, self).__init__(*args, **kwargs)
+
+
+  def handleRecord(self, inputData):
+    scale = self.parameters["scale"]
+    value = (inputData["value"] - self.inputMin) / (self.inputMax -
+                                                    self.inputMin)
+    return [min(1.0, scale * value + self.parameters["offset"])]
+
+
+
+class ParameterSearchTest(unittest.TestCase):
+
+
+  @classmethod
+  def setUpClass(cls):
+    cls.root = recur(os.path.dirname, os.path.realpath(__file__), 3)
+    cls.dataDir = os.path.join(cls.root, "tests", "test_data")
+    cls.profilesPath = os.path.join(cls.root, "config", "profiles.json")
+
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+
+    # One window of 20 records in each test data file
+    windows = {}
+    for dirName, _, fileNames in os.walk(self.dataDir):
+      for fileName in fileNames:
+        data = pandas.read_csv(os.path.join(dirName, fileName))
+        start = int(len(data) * 0.6)
+        relativePath = os.path.relpath(os.path.join(dirName, fileName),
+                                       self.dataDir).replace(os.sep, "/")
+        windows[relativePath] = [[data["timestamp"][start] + ".000000",
+                                  data["timestamp"][start + 20] + ".000000"]]
+    self.labelPath = os.path.join(self.tmpDir, "windows.json")
+    with open(self.labelPath, "w") as f:
+      json.dump(windows, f)
+
+    self.logPath = os.path.join(self.tmpDir, "log.json")
+    self.search = ParameterSearch(dataDir=self.dataDir,
+                                  labelPath=self.labelPath,
+                                  profilesPath=self.profilesPath,
+                                  detectorClass=ScaledValueDetector,
+                                  detectorName="scaledValue",
+                                  numCPUs=2,
+                                  logPath=self.logPath)
+
+
+  def tearDown(self):
+    self.search.close()
+    shutil.rmtree(self.tmpDir)
+
+
+  def testMergeParameters(self):
+    """Overrides are merged recursively without modifying the defaults."""
+    defaults = {"sp": {"columnCount": 2048, "potentialPct": 0.4}, "seed": 1}
+    merged = mergeParameters(defaults, {"sp": {"potentialPct": 0.8}})
+
+    self.assertEqual(merged, {"sp": {"columnCount": 2048, "potentialPct": 0.8},
+                              "seed": 1})
+    self.assertEqual(defaults["sp"]["potentialPct"], 0.4)
+
+
+  def testNullCandidateNormalizesToZero(self):
+    """A candidate behaving like the null detector scores 0 on all profiles."""
+    scores, = self.search.evaluate([{"scale": 0.0, "offset": 0.5}])
+
+    for profileName in self.search.runner.profiles:
+      self.assertAlmostEqual(scores[profileName], 0.0)
+    # Only the results of the null detector are kept, for the baselines
+    self.assertEqual(list(self.search.cache), ["null"])
+
+    with open(self.logPath) as f:
+      logged = [json.loads(line) for line in f]
+    self.assertEqual(len(logged), 1)
+    self.assertEqual(logged[0]["parameters"], {"scale": 0.0, "offset": 0.5})
+
+
+  def testSuccessiveHalving(self):
+    """Only the best candidates reach the whole corpus and files already run
+    in earlier rungs are not run again."""
+    tasks = []
+    detect = self.search._detect
+    def recordingDetect(rungTasks):
+      tasks.append([relativePaths for _, relativePaths in rungTasks])
+      return detect(rungTasks)
+    self.search._detect = recordingDetect
+
+    candidates = [{"scale": scale, "offset": 0.0}
+                  for scale in (0.5, 1.0, 1.5, 2.0)]
+    ranked = self.search.successiveHalving(candidates, eta=2, numRungs=2)
+
+    allPaths = self.search.getRelativePaths()
+    subset, corpus = self.search.stratifiedSubsets(2, 2)
+    self.assertEqual(corpus, allPaths)
+    self.assertEqual(len(subset), 2)
+    self.assertEqual(set([p.split("/")[0] for p in subset]),
+                     set([p.split("/")[0] for p in allPaths]))
+
+    # 4 candidates and null on the subset, then the 2 best and null on the
+    # remaining file.
+    self.assertEqual([len(t) for t in tasks], [4, 1, 2, 1])
+    for relativePaths in tasks[2] + tasks[3]:
+      self.assertEqual(relativePaths, sorted(set(allPaths) - set(subset)))
+
+    self.assertEqual(len(ranked), 2)
+    self.assertGreaterEqual(ranked[0][1]["standard"],
+                            ranked[1][1]["standard"])
+    # The results of the candidates are dropped once they are not promoted
+    self.assertEqual(list(self.search.cache), ["null"])
+    fullScores = self.search.evaluate([ranked[0][0]])
+    self.assertEqual(fullScores[0], ranked[0][1])
+
+
+  def testScoresMatchRunner(self):
+    """Raw scores of candidates match the results files based Runner steps."""
+    candidates = [{"scale": 1.0, "offset": 0.0}, {"scale": 2.0, "offset": 0.1}]
+    candidateResults = self.search.detect(
+      [partial(ScaledValueDetector, parameters=p) for p in candidates])
+
+    resultsDir = os.path.join(self.tmpDir, "results")
+    thresholdPath = os.path.join(self.tmpDir, "thresholds.json")
+    with open(thresholdPath, "w") as f:
+      json.dump({}, f)
+    runner = Runner(dataDir=self.dataDir,
+                    resultsDir=resultsDir,
+                    labelPath=self.labelPath,
+                    profilesPath=self.profilesPath,
+                    thresholdPath=thresholdPath,
+                    numCPUs=2)
+    runner.initialize()
+
+    for i, (parameters, results) in enumerate(zip(candidates,
+                                                  candidateResults)):
+      detectorName = "candidate%d" % i
+      runner.detect(
+        {detectorName: partial(ScaledValueDetector, parameters=parameters)})
+      thresholds = runner.optimize([detectorName])
+      runner.score([detectorName], thresholds)
+
+      scores = self.search.score(detectorName, results)
+      for profileName in runner.profiles:
+        scoresPath = os.path.join(resultsDir, detectorName, "%s_%s_scores.csv"
+                                  % (detectorName, profileName))
+        expected = pandas.read_csv(scoresPath)["Score"].iloc[-1]
+        self.assertAlmostEqual(scores[profileName], expected)
+
+    runner.pool.close()
+    runner.pool.join()
+
+
+if __name__ == '__main__':
+  unittest.main()
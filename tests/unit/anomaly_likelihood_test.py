@@ -0,0 +1,165 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import collections
+import math
+import unittest
+
+import numpy
+import pandas
+
+from nab.detectors.anomaly_likelihood import (anomalyLikelihoods,
+                                              logLikelihoods,
+                                              nabLikelihoodParameters,
+                                              setLikelihoodScores)
+
+
+
+class StreamingLikelihood(object):
+  """Record by record anomaly likelihood, as computed by
+  AnomalyLikelihood.anomalyProbability() of NuPIC / htm.core."""
+
+  def __init__(self, learningPeriod, estimationSamples, historicWindowSize,
+               reestimationPeriod):
+    self.learningPeriod = learningPeriod
+    self.probationaryPeriod = learningPeriod + estimationSamples
+    self.reestimationPeriod = reestimationPeriod
+    self.history = collections.deque(maxlen=historicWindowSize)
+    self.iteration = 0
+    self.distribution = None
+    self.averageWindow = []
+    self.previousLikelihood = None
+
+
+  @staticmethod
+  def tailProbability(x, mean, stdev):
+    if x < mean:
+      return 1.0 - StreamingLikelihood.tailProbability(2 * mean - x, mean,
+                                                       stdev)
+    return 0.5 * math.erfc((x - mean) / stdev / 1.4142)
+
+
+  def estimate(self):
+    numShiftedOut = max(0, self.iteration - self.history.maxlen)
+    skip = min(self.iteration, max(0, self.learningPeriod - numShiftedOut))
+
+    window = []
+    averages = []
+    for _, score in self.history:
+      window = (window + [score])[-10:]
+      averages.append(sum(window) / len(window))
+    values = [value for value, _ in self.history]
+
+    if (len(averages) <= skip or
+        numpy.var(values[skip:]) < 1.5e-5):
+      mean, stdev = 0.5, 1000.0
+    else:
+      mean = max(numpy.mean(averages[skip:]), 0.03)
+      stdev = math.sqrt(max(numpy.var(averages[skip:]), 0.0003))
+    self.distribution = (mean, stdev)
+    self.averageWindow = window
+    self.previousLikelihood = self.tailProbability(averages[-1], mean, stdev)
+
+
+  def anomalyProbability(self, value, rawScore):
+    if self.iteration < self.probationaryPeriod:
+      likelihood = 0.5
+    else:
+      if (self.distribution is None or
+          self.iteration % self.reestimationPeriod == 0):
+        self.estimate()
+      self.averageWindow = (self.averageWindow + [rawScore])[-10:]
+      average = sum(self.averageWindow) / len(self.averageWindow)
+      tail = self.tailProbability(average, *self.distribution)
+      if tail <= 1e-5 and self.previousLikelihood <= 1e-5:
+        likelihood = 1.0 - 0.001
+      else:
+        likelihood = 1.0 - tail
+      self.previousLikelihood = tail
+    self.history.append((value, rawScore))
+    self.iteration += 1
+    return likelihood
+
+
+
+class AnomalyLikelihoodTest(unittest.TestCase):
+
+
+  def setUp(self):
+    rng = numpy.random.RandomState(42)
+    self.rawScores = rng.beta(0.5, 4.0, size=3000)
+    self.rawScores[[1200, 1201, 1202, 2500]] = 1.0
+    self.values = rng.normal(size=3000)
+    # Flat metric for a while, giving the null distribution
+    self.values[1500:2200] = 2.0
+
+
+  def _checkStreaming(self, **parameters):
+    streaming = StreamingLikelihood(**parameters)
+    expected = [streaming.anomalyProbability(v, s)
+                for v, s in zip(self.values, self.rawScores)]
+
+    likelihoods = anomalyLikelihoods(self.rawScores, self.values, **parameters)
+
+    numpy.testing.assert_allclose(likelihoods, expected, rtol=0, atol=1e-12)
+    return likelihoods
+
+
+  def testMatchesStreaming(self):
+    likelihoods = self._checkStreaming(learningPeriod=150,
+                                       estimationSamples=150,
+                                       historicWindowSize=8640,
+                                       reestimationPeriod=100)
+    self.assertTrue((likelihoods[:300] == 0.5).all())
+    # Consecutive likelihoods in the red zone are lowered
+    self.assertGreater(likelihoods[1201], 0.99999)
+    self.assertEqual(likelihoods[1202], 0.999)
+
+
+  def testMatchesStreamingWithShiftingWindow(self):
+    """The window of the estimates drops the learning period then records
+    averaged from the middle of their moving average window."""
+    self._checkStreaming(learningPeriod=137,
+                         estimationSamples=63,
+                         historicWindowSize=400,
+                         reestimationPeriod=37)
+
+
+  def testShortFile(self):
+    likelihoods = anomalyLikelihoods(self.rawScores[:100], self.values[:100],
+                                     **nabLikelihoodParameters(150))
+    self.assertTrue((likelihoods == 0.5).all())
+
+
+  def testSetLikelihoodScores(self):
+    results = pandas.DataFrame({"value": self.values,
+                                "anomaly_score": self.rawScores,
+                                "raw_score": self.rawScores})
+
+    setLikelihoodScores(results, **nabLikelihoodParameters(450))
+
+    expected = logLikelihoods(anomalyLikelihoods(
+      self.rawScores, self.values, learningPeriod=225, estimationSamples=225))
+    numpy.testing.assert_array_equal(results["anomaly_score"], expected)
+    self.assertAlmostEqual(logLikelihoods(0.99999), 0.5, places=4)
+
+
+if __name__ == '__main__':
+  unittest.main()
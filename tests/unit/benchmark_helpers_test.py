@@ -0,0 +1,104 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from nab.benchmark_helpers import (compareResults,
+                                   estimateSeconds,
+                                   generateSeries,
+                                   growthExponent,
+                                   measure,
+                                   writeCorpus)
+from nab.corpus import Corpus
+from nab.labeler import CorpusLabel
+
+
+
+class BenchmarkHelpersTest(unittest.TestCase):
+
+
+  def testMeasure(self):
+    measured = measure(lambda: numpy.ones(10 ** 6), repeat=2)
+    self.assertGreater(measured["seconds"], 0)
+    self.assertGreaterEqual(measured["peakMemory"], 8 * 10 ** 6)
+    self.assertEqual(len(measured["result"]), 10 ** 6)
+
+
+  def testGenerateSeries(self):
+    data, windows = generateSeries(1000, 4)
+    self.assertEqual(len(data), 1000)
+    self.assertEqual(len(windows), 4)
+
+    labelled = data["timestamp"][data["label"] == 1]
+    for t1, t2 in windows:
+      inWindow = labelled[(labelled >= t1) & (labelled <= t2)]
+      self.assertEqual(len(inWindow), 25)
+    self.assertEqual(len(labelled), 100)
+    self.assertGreaterEqual(windows[0][0], data["timestamp"][150])
+
+    with self.assertRaises(ValueError):
+      generateSeries(100, 50)
+
+
+  def testWriteCorpus(self):
+    root = tempfile.mkdtemp()
+    try:
+      dataDir, resultsDir, labelsPath = writeCorpus(root, 2000, 6, numFiles=3)
+      corpus = Corpus(dataDir)
+      corpusLabel = CorpusLabel(labelsPath, corpus)
+      self.assertEqual(corpus.numDataFiles, 3)
+
+      for relativePath, dataSet in corpus.dataFiles.items():
+        self.assertEqual(len(dataSet.data), 666)
+        self.assertEqual(len(corpusLabel.windows[relativePath]), 2)
+      self.assertEqual(Corpus(resultsDir).numDataFiles, 3)
+    finally:
+      shutil.rmtree(root)
+
+
+  def testGrowth(self):
+    self.assertIsNone(growthExponent([(1000, 1.0)]))
+    self.assertAlmostEqual(growthExponent([(1000, 1.0), (4000, 16.0)]), 2.0)
+
+    # Linear growth with a single timing, bounded between linear and quadratic
+    self.assertAlmostEqual(estimateSeconds([(1000, 1.0)], 3000), 3.0)
+    self.assertAlmostEqual(
+      estimateSeconds([(1000, 1.0), (2000, 1.5)], 4000), 3.0)
+    self.assertAlmostEqual(
+      estimateSeconds([(1000, 1.0), (2000, 8.0)], 4000), 32.0)
+
+
+  def testCompareResults(self):
+    baseline = [{"benchmark": "a", "seconds": 1.0},
+                {"benchmark": "b", "seconds": 1.0},
+                {"benchmark": "c", "seconds": 1.0}]
+    results = [{"benchmark": "a", "seconds": 1.2},
+               {"benchmark": "b", "seconds": 1.5},
+               {"benchmark": "d", "seconds": 9.0}]
+    self.assertEqual(compareResults(baseline, results),
+                     [(("b",), 1.0, 1.5)])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,99 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from nab.detectors.htmcore.encoding_cache import (EncodingCache, encodingKey,
+                                                  packEncoding, unpackEncoding)
+
+
+
+class EncodingCacheTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.cacheDir = os.path.join(tempfile.mkdtemp(), "cache")
+    self.data = pandas.DataFrame({
+      "timestamp": pandas.date_range("2014-04-01", periods=10, freq="5min"),
+      "value": numpy.arange(10, dtype=float)})
+    self.params = {"value": {"size": 4000, "sparsity": 0.1},
+                   "time": {"timeOfDay": [21, 9.49], "weekend": 0}}
+
+
+  def tearDown(self):
+    shutil.rmtree(os.path.dirname(self.cacheDir))
+
+
+  def testPackRoundTrip(self):
+    """Unpacking a packed encoding gives the indices of its active bits."""
+    dense = numpy.zeros(4021, dtype=numpy.uint8)
+    dense[[0, 7, 8, 2000, 4020]] = 1
+
+    packed = packEncoding(dense)
+
+    self.assertEqual(packed.shape, (503,))
+    numpy.testing.assert_array_equal(unpackEncoding(packed),
+                                     [0, 7, 8, 2000, 4020])
+
+
+  def testKeyDependsOnParametersAndData(self):
+    key = encodingKey(self.params, self.data)
+
+    self.assertEqual(key, encodingKey(dict(self.params), self.data.copy()))
+
+    otherParams = {"value": {"size": 4000, "sparsity": 0.2},
+                   "time": self.params["time"]}
+    self.assertNotEqual(key, encodingKey(otherParams, self.data))
+
+    otherData = self.data.copy()
+    otherData.loc[3, "value"] = 3.5
+    self.assertNotEqual(key, encodingKey(self.params, otherData))
+
+    otherData = self.data.copy()
+    otherData.loc[3, "timestamp"] += pandas.Timedelta("1s")
+    self.assertNotEqual(key, encodingKey(self.params, otherData))
+
+
+  def testGetOrComputeEncodesOnce(self):
+    """Encodings are computed on the first request only, and memory-mapped."""
+    calls = []
+    def encodeAll():
+      calls.append(1)
+      return numpy.arange(30, dtype=numpy.uint8).reshape(10, 3)
+
+    key = encodingKey(self.params, self.data)
+    first = EncodingCache(self.cacheDir).getOrCompute(key, encodeAll)
+    second = EncodingCache(self.cacheDir).getOrCompute(key, encodeAll)
+
+    self.assertEqual(len(calls), 1)
+    self.assertIsInstance(second, numpy.memmap)
+    numpy.testing.assert_array_equal(first, second)
+    numpy.testing.assert_array_equal(second[4], [12, 13, 14])
+    self.assertEqual(os.listdir(self.cacheDir), [key + ".npy"])
+
+
+if __name__ == '__main__':
+  unittest.main()
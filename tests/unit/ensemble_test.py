@@ -0,0 +1,116 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas
+
+from nab.corpus import DataFile
+from nab.detectors.ensemble.ensemble_detector import EnsembleDetector
+from nab.util import createPath
+from scripts.fit_ensemble_weights import weightGrid
+
+
+
+class EnsembleDetectorTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.dataDir = os.path.join(self.tmpDir, "data")
+    self.resultsDir = os.path.join(self.tmpDir, "results")
+
+    data = pandas.DataFrame({
+      "timestamp": pandas.date_range("2014-04-01", periods=4, freq="5min"),
+      "value": [1.0, 2.0, 3.0, 4.0]})
+    dataPath = os.path.join(self.dataDir, "category", "file.csv")
+    createPath(dataPath)
+    data.to_csv(dataPath, index=False)
+    self.dataSet = DataFile(dataPath)
+
+    for detectorName, scores in (("a", [0.1, 0.9, 0.2, 0.0]),
+                                 ("b", [0.3, 0.1, 0.6, 0.0])):
+      results = data.copy()
+      results["anomaly_score"] = scores
+      results["label"] = 0
+      resultsPath = os.path.join(self.resultsDir, detectorName, "category",
+                                 detectorName + "_file.csv")
+      createPath(resultsPath)
+      results.to_csv(resultsPath, index=False)
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+
+  def _run(self, **kwargs):
+    detector = EnsembleDetector(dataSet=self.dataSet,
+                                probationaryPercent=0.15,
+                                dataDir=self.dataDir,
+                                resultsDir=self.resultsDir,
+                                detectors=["a", "b"],
+                                **kwargs)
+    detector.initialize()
+    return detector.run()
+
+
+  def testCombine(self):
+    results = self._run(combine="max")
+    self.assertEqual(list(results.columns),
+                     ["timestamp", "value", "anomaly_score", "a_score",
+                      "b_score"])
+    self.assertEqual(results["anomaly_score"].tolist(), [0.3, 0.9, 0.6, 0.0])
+
+    results = self._run(combine="mean", weights=[3, 1])
+    for score, expected in zip(results["anomaly_score"],
+                               [0.15, 0.7, 0.3, 0.0]):
+      self.assertAlmostEqual(score, expected)
+
+
+  def testFittedWeights(self):
+    # The record of the fit in the ensembles file is not a detector argument
+    results = self._run(combine="mean", weights=[1.0, 0.0],
+                        fit={"profile": "standard"})
+    self.assertEqual(results["anomaly_score"].tolist(), [0.1, 0.9, 0.2, 0.0])
+
+
+  def testWeightGrid(self):
+    self.assertEqual(weightGrid(2, 0.25),
+                     [[1.0, 0.0], [0.75, 0.25], [0.5, 0.5], [0.25, 0.75],
+                      [0.0, 1.0]])
+
+    grid = weightGrid(3, 0.1)
+    self.assertEqual(len(grid), 66)
+    for weights in grid:
+      self.assertAlmostEqual(sum(weights), 1.0)
+
+
+  def testMissingResults(self):
+    shutil.rmtree(os.path.join(self.resultsDir, "b"))
+
+    with self.assertRaises(IOError):
+      self._run(combine="max")
+
+
+if __name__ == '__main__':
+  unittest.main()
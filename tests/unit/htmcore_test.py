@@ -0,0 +1,102 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import copy
+import os
+import unittest
+
+from nab.corpus import Corpus
+from nab.util import recur
+
+try:
+  from nab.detectors.htmcore.htmcore_detector import HtmcoreDetector
+except ImportError:
+  HtmcoreDetector = None
+
+# Records of the data file run through the detector
+NUM_RECORDS = 400
+
+
+
+@unittest.skipIf(HtmcoreDetector is None, "htm.core is not installed")
+class HtmcoreDetectorTest(unittest.TestCase):
+
+
+  @classmethod
+  def setUpClass(cls):
+    root = recur(os.path.dirname, os.path.realpath(__file__), 3)
+    corpus = Corpus(os.path.join(root, "tests", "test_data"))
+    cls.dataSet = corpus.dataFiles[
+      os.path.join("artificialWithAnomaly", "art_daily_nojump.csv")]
+
+
+  def _createDetector(self, collectMetrics=False):
+    dataSet = copy.deepcopy(self.dataSet)
+    dataSet.data = dataSet.data.iloc[:NUM_RECORDS].reset_index(drop=True)
+    detector = HtmcoreDetector(dataSet=dataSet, probationaryPercent=0.15)
+    detector.verbose = False
+    detector.collectMetrics = collectMetrics
+    detector.initialize()
+    return detector
+
+
+  def testReusedBuffers(self):
+    """Every record is encoded and pooled into the SDRs of initialize()."""
+    detector = self._createDetector()
+    buffers = [detector.dateBits, detector.valueBits, detector.encoding,
+               detector.activeColumns]
+
+    data = detector.dataSet.data
+    for ts, value in zip(data["timestamp"], data["value"]):
+      anomalyScore, rawScore = detector.modelRun(ts, value)
+      self.assertGreaterEqual(rawScore, 0.0)
+      self.assertLessEqual(rawScore, 1.0)
+
+    for buffer, current in zip(buffers, [detector.dateBits,
+                                         detector.valueBits,
+                                         detector.encoding,
+                                         detector.activeColumns]):
+      self.assertIs(current, buffer)
+    self.assertEqual(detector.encoding.size,
+                     detector.dateBits.size + detector.valueBits.size)
+    self.assertGreater(len(detector.activeColumns.sparse), 0)
+
+    self.assertIsNone(detector.enc_info)
+    self.assertIsNone(detector.sp_info)
+    self.assertIsNone(detector.tm_info)
+    self.assertFalse(hasattr(detector, "inputs_"))
+
+
+  def testMetricsDoNotChangeScores(self):
+    """Collecting metrics only observes the SDRs."""
+    results = self._createDetector().run()
+    withMetrics = self._createDetector(collectMetrics=True)
+    metricsResults = withMetrics.run()
+
+    self.assertEqual(len(results), NUM_RECORDS)
+    self.assertEqual(results["raw_score"].tolist(),
+                     metricsResults["raw_score"].tolist())
+    self.assertIsNotNone(withMetrics.enc_info)
+    self.assertIsNotNone(withMetrics.sp_info)
+    self.assertIsNotNone(withMetrics.tm_info)
+
+
+if __name__ == '__main__':
+  unittest.main()
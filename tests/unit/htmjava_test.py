@@ -0,0 +1,159 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from nab.detectors.htmjava import htmjava_worker
+from nab.detectors.htmjava.htmjava_worker import discardWorker, getWorker
+
+# Stands in for the JVM: speaks the protocol of HTMModelServer.java, scoring
+# each "timestamp,value" record value / 10, and dies on a "crash" record.
+FAKE_JAVA = """#!%s
+import struct
+import sys
+
+stdin = sys.stdin.buffer
+stdout = sys.stdout.buffer
+models = {}
+
+def error(message):
+  message = message.encode("utf-8")
+  stdout.write(b"E" + struct.pack(">H", len(message)) + message)
+
+while True:
+  opcode = stdin.read(1)
+  if opcode in (b"", b"Q"):
+    break
+  if opcode == b"C":
+    modelId, length = struct.unpack(">ii", stdin.read(8))
+    models[modelId] = stdin.read(length)
+  elif opcode == b"D":
+    models.pop(struct.unpack(">i", stdin.read(4))[0])
+  elif opcode == b"R":
+    modelId, count = struct.unpack(">ii", stdin.read(8))
+    records = []
+    for _ in range(count):
+      length, = struct.unpack(">H", stdin.read(2))
+      records.append(stdin.read(length).decode("utf-8"))
+    if "crash" in records:
+      sys.exit(1)
+    if modelId not in models:
+      error("Unknown model %%d" %% modelId)
+    else:
+      scores = [float(record.split(",")[1]) / 10 for record in records]
+      stdout.write(b"K" + struct.pack(">i%%dd" %% count, count, *scores))
+  stdout.flush()
+"""
+
+
+
+class HtmjavaWorkerTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    fakeJava = os.path.join(self.tmpDir, "java")
+    with open(fakeJava, "w") as f:
+      f.write(FAKE_JAVA % sys.executable)
+    os.chmod(fakeJava, os.stat(fakeJava).st_mode | stat.S_IXUSR)
+
+    patches = [
+      mock.patch.dict(os.environ, {
+        "PATH": self.tmpDir + os.pathsep + os.environ.get("PATH", "")}),
+      mock.patch.object(htmjava_worker, "_worker", None),
+      mock.patch.object(htmjava_worker, "_workerPid", None)]
+    for patch in patches:
+      patch.start()
+      self.addCleanup(patch.stop)
+
+
+  def tearDown(self):
+    if htmjava_worker._worker is not None:
+      htmjava_worker._worker.close()
+    shutil.rmtree(self.tmpDir)
+
+
+  def testProcess(self):
+    worker = getWorker()
+    self.assertIs(getWorker(), worker)
+
+    first = worker.createModel({"model": "first"})
+    second = worker.createModel({"model": "second"})
+    self.assertNotEqual(first, second)
+
+    records = ["2014-04-01 00:0%d:00,%d.0" % (i, i) for i in range(5)]
+    self.assertEqual(worker.process(first, records[:3]), [0.0, 0.1, 0.2])
+    self.assertEqual(worker.process(second, records[3:]), [0.3, 0.4])
+    self.assertEqual(worker.process(first, []), [])
+
+    worker.deleteModel(first)
+    with self.assertRaises(RuntimeError) as error:
+      worker.process(first, records)
+    self.assertIn("Unknown model", str(error.exception))
+
+    # An error frame leaves the worker usable
+    self.assertEqual(worker.process(second, records[:1]), [0.0])
+
+
+  def testRestartAfterFailure(self):
+    worker = getWorker()
+    modelId = worker.createModel({})
+
+    with self.assertRaises(IOError):
+      worker.process(modelId, ["2014-04-01 00:00:00,1.0", "crash"])
+    discardWorker()
+    self.assertIsNotNone(worker.jvm.poll())
+
+    # The next data file gets a new worker
+    newWorker = getWorker()
+    self.assertIsNot(newWorker, worker)
+    modelId = newWorker.createModel({})
+    self.assertEqual(newWorker.process(modelId, ["2014-04-01 00:00:00,2.0"]),
+                     [0.2])
+
+    # So does the next data file after the JVM died between files
+    newWorker.jvm.kill()
+    newWorker.jvm.wait()
+    worker = getWorker()
+    self.assertIsNot(worker, newWorker)
+    modelId = worker.createModel({})
+    self.assertEqual(worker.process(modelId, ["2014-04-01 00:00:00,3.0"]),
+                     [0.3])
+
+
+  def testDiscardOtherProcessWorker(self):
+    """A worker inherited from a parent process is left to the parent."""
+    worker = getWorker()
+    with mock.patch.object(htmjava_worker, "_workerPid", -1):
+      discardWorker()
+      self.assertIsNone(htmjava_worker._worker)
+    self.assertIsNone(worker.jvm.poll())
+    worker.close()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,87 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import copy
+import os
+import unittest
+from unittest import mock
+
+import numpy
+
+from nab.corpus import Corpus
+from nab.detectors.knncad.knncad_detector import KnncadDetector
+from nab.util import recur
+
+
+
+class KnncadDetectorTest(unittest.TestCase):
+
+
+  @classmethod
+  def setUpClass(cls):
+    root = recur(os.path.dirname, os.path.realpath(__file__), 3)
+    corpus = Corpus(os.path.join(root, "tests", "test_data"))
+    cls.dataSet = corpus.dataFiles[
+      os.path.join("artificialWithAnomaly", "art_daily_nojump.csv")]
+
+
+  def _createDetector(self, values=None):
+    dataSet = copy.deepcopy(self.dataSet)
+    if values is not None:
+      dataSet.data["value"] = values
+    detector = KnncadDetector(dataSet=dataSet, probationaryPercent=0.15)
+    detector.initialize()
+    return detector
+
+
+  def testSingularSigma(self):
+    """A flat line makes the training covariance singular: sigma is kept and
+    the detector runs to the end."""
+    detector = self._createDetector(values=0.0)
+    results = detector.run()
+
+    self.assertEqual(len(results), len(self.dataSet.data))
+    self.assertTrue((detector.sigma == numpy.eye(detector.dim)).all())
+
+
+  def testNotPositiveDefiniteSigma(self):
+    """When sigma has no Cholesky factor the Mahalanobis metric is evaluated
+    directly, giving the same distances."""
+    detector = self._createDetector()
+    for _, row in detector.dataSet.data.iloc[:detector.dim + 100].iterrows():
+      detector.handleRecord(row.to_dict())
+
+    detector.updateSigma()
+    item = detector.training[0] + 1.0
+    expected = detector.distances(item)
+
+    with mock.patch("numpy.linalg.cholesky",
+                    side_effect=numpy.linalg.LinAlgError("not definite")):
+      detector.updateSigma()
+
+    self.assertIsNone(detector.whitener)
+    numpy.testing.assert_allclose(detector.distances(item), expected,
+                                  rtol=1e-6)
+    self.assertAlmostEqual(detector.distances(item)[1],
+                           detector.metric(item, detector.training[1]))
+
+
+if __name__ == '__main__':
+  unittest.main()
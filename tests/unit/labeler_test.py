@@ -0,0 +1,86 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import datetime
+import unittest
+
+import numpy
+import pandas
+
+from nab.labeler import (bucket,
+                         bucketSorted,
+                         combineFileLabels,
+                         merge,
+                         mergeBuckets,
+                         toDatetime)
+
+
+
+class LabelerTest(unittest.TestCase):
+
+
+  def testBucketMergeMatchesLoops(self):
+    """The vectorized bucketing and merging give the results of bucket() and
+    merge()."""
+    rng = numpy.random.RandomState(0)
+    start = pandas.Timestamp("2015-01-01")
+    for _ in range(20):
+      minutes = numpy.sort(rng.randint(0, 5000, size=60)) * 5
+      rawTimes = [(start + pandas.Timedelta(minutes=int(m))).to_pydatetime()
+                  for m in minutes]
+      buffer = datetime.timedelta(minutes=int(rng.randint(10, 500)))
+      threshold = rng.randint(1, 4)
+
+      truths, passed = merge(bucket(rawTimes, buffer), threshold)
+      sortedTimes = numpy.array(rawTimes, dtype="datetime64[ns]")
+      fastTruths, fastPassed = mergeBuckets(
+        bucketSorted(sortedTimes, numpy.timedelta64(buffer)), threshold)
+
+      self.assertEqual([toDatetime(t) for t in fastTruths], truths)
+      self.assertEqual([[toDatetime(t) for t in b] for b in fastPassed],
+                       passed)
+
+
+  def testCombineFileLabels(self):
+    timestamps = pandas.date_range("2015-12-01", periods=31, freq="D").values
+    users = [numpy.array(labels, dtype="datetime64[ns]") for labels in
+             (["2015-12-24", "2015-12-31"],
+              ["2015-12-01", "2015-12-25", "2015-12-31"],
+              ["2015-12-25"])]
+    userLabels = [("user%d" % i, labels) for i, labels in enumerate(users)]
+
+    relativePath, trueAnomalies, indices, passed = combineFileLabels(
+      ("file.csv", timestamps, userLabels, userLabels, None, 0.5, 0.10))
+
+    self.assertEqual([str(t) for t in trueAnomalies],
+                     ["2015-12-25 00:00:00", "2015-12-31 00:00:00"])
+    self.assertEqual(indices, [24, 30])
+    self.assertEqual(len(passed), 2)
+
+    # Labels must be timestamps of the data file
+    with self.assertRaises(ValueError):
+      wrongLabels = [("user", numpy.array(["2015-12-24 12:00"],
+                                          dtype="datetime64[ns]"))]
+      combineFileLabels(("file.csv", timestamps, wrongLabels, wrongLabels,
+                         None, 0.5, 0.10))
+
+
+if __name__ == '__main__':
+  unittest.main()
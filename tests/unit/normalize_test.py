@@ -187,6 +187,40 @@ class NormalizationTest(unittest.TestCase):
         "normalized score of %f is not the expected 10.0" % score)
 
 
+  def testInMemoryScores(self):
+    """Tests that the scores of the scoring step are normalized without reading
+    score files."""
+
+    tmpResultsDir = self._createTemporaryResultsDir()
+    testRunner = createRunner(tmpResultsDir, 'standard')
+    testRunner.scores = {"null": {"standard": -5.0},
+                         "fake": {"standard": 2.0}}
+
+    finalResults = testRunner.normalize()
+    self.assertEqual(finalResults["fake"]["standard"], 70.0)
+    self.assertEqual(finalResults["null"]["standard"], 0.0)
+    self.assertEqual(os.listdir(tmpResultsDir), ["final_results.json"])
+
+
+  def testBatchNormalization(self):
+    """Tests normalizing many detectors at once, against the null scores of a
+    previous run."""
+
+    tmpResultsDir = self._createTemporaryResultsDir()
+    os.makedirs(os.path.join(tmpResultsDir,'null'))
+    nullData = [self.resultsHeaders, ['null','standard','-5.0']]
+    createCSV(tmpResultsDir, 'null/null_standard_scores.csv', nullData)
+
+    testRunner = createRunner(tmpResultsDir, 'standard')
+    scores = {"variant%d" % i: {"standard": float(i)} for i in range(100)}
+    finalResults = testRunner.normalize(scores)
+
+    self.assertEqual(len(finalResults), 100)
+    self.assertEqual(finalResults["variant2"]["standard"], 70.0)
+    with open(os.path.join(tmpResultsDir, "final_results.json")) as f:
+      self.assertEqual(json.load(f), finalResults)
+
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,125 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import cProfile
+import multiprocessing
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+from nab.profiling import StageProfiler, collapsedStacks, isPoolWait
+
+
+
+def square(x):
+  return sum(i * i for i in range(x))
+
+
+def leaf():
+  return sum(range(10 ** 5))
+
+
+def caller():
+  return leaf() + leaf()
+
+
+
+class ProfilingTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+
+
+  def tearDown(self):
+    shutil.rmtree(self.root)
+
+
+  def testStageProfiler(self):
+    pool = multiprocessing.Pool(2)
+    try:
+      for clear in (True, False):
+        with StageProfiler(self.root, "stage", pool, clear) as profiledPool:
+          results = profiledPool.map_async(square, [10 ** 4] * 4).get(60)
+        self.assertEqual(results, [square(10 ** 4)] * 4)
+    finally:
+      pool.close()
+      pool.join()
+
+    processes = os.listdir(os.path.join(self.root, "stage"))
+    self.assertIn("main.prof", processes)
+    self.assertTrue(any(p.startswith("worker-") for p in processes))
+
+    # Both runs of the stage are in the merged profile of the workers
+    merged = pstats.Stats(os.path.join(self.root, "stage-workers.prof"))
+    calls = [stats[1] for function, stats in merged.stats.items()
+             if function[2] == "square"]
+    self.assertEqual(calls, [8])
+
+    with open(os.path.join(self.root, "stage-workers.txt")) as reportFile:
+      self.assertIn("square", reportFile.read())
+
+    # The main process waited for the tasks, but only ran map_async
+    main = pstats.Stats(os.path.join(self.root, "stage-main.prof"))
+    self.assertTrue(any(isPoolWait(function) for function in main.stats))
+    self.assertFalse(any(function[2] == "square" for function in main.stats))
+    with open(os.path.join(self.root, "stage-main.txt")) as reportFile:
+      self.assertIn("map_async", reportFile.read())
+
+    with open(os.path.join(self.root, "stage.collapsed")) as stacksFile:
+      stacks = stacksFile.read().splitlines()
+    self.assertTrue(any(s.startswith("worker-") and "(square)" in s
+                        for s in stacks))
+    # Its waits for the pool are left out of the collapsed stacks, they would
+    # count the time of the tasks twice
+    mainStacks = [s for s in stacks if s.startswith("main;")]
+    self.assertTrue(any("(map_async)" in s for s in mainStacks))
+    self.assertFalse(any("pool.py" in s and ("(get)" in s or "(wait)" in s)
+                         for s in mainStacks))
+    for stack in stacks:
+      frames, microseconds = stack.rsplit(" ", 1)
+      self.assertGreaterEqual(int(microseconds), 0)
+
+
+  def testCollapsedStacks(self):
+    profile = cProfile.Profile()
+    profile.runcall(caller)
+    stacks = dict(collapsedStacks(pstats.Stats(profile), "main"))
+
+    leafStack = [s for s in stacks if s.endswith("(leaf)")]
+    self.assertEqual(len(leafStack), 1)
+    self.assertTrue(leafStack[0].startswith("main;"))
+    self.assertIn("(caller);", leafStack[0])
+
+    # The time of the stacks is the time of the profile
+    total = sum(stats[2] for stats in pstats.Stats(profile).stats.values())
+    self.assertAlmostEqual(sum(stacks.values()), total, places=4)
+
+    # Excluded functions are left out with their callees
+    stacks = dict(collapsedStacks(pstats.Stats(profile), "main",
+                                  lambda function: function[2] == "leaf"))
+    self.assertTrue(any(s.endswith("(caller)") for s in stacks))
+    self.assertFalse(any("(leaf)" in s for s in stacks))
+
+
+if __name__ == '__main__':
+  unittest.main()
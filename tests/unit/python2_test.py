@@ -0,0 +1,138 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+from functools import partial
+from unittest import mock
+
+import pandas
+
+from nab.corpus import DataFile
+from nab.detectors import python2
+from nab.detectors.python2 import Python2Detector, Python2Worker
+from nab.util import createPath
+
+# Stands in for the Python 2 interpreter: runs the worker loop of python2.py
+# with a "fake" detector, which kills the worker on negative values.
+FAKE_PYTHON = """#!%s
+import os
+from nab.detectors import python2
+from nab.detectors.base import AnomalyDetector
+
+class FakeDetector(AnomalyDetector):
+  def initialize(self):
+    self.task = "|".join([self.dataSet.srcPath, self.dataSet.fileName,
+                          self.detectorName, self.relativePath])
+  def getAdditionalHeaders(self):
+    return ["task"]
+  def handleRecord(self, inputData):
+    if inputData["value"] < 0:
+      os._exit(1)
+    return (inputData["value"] / 10.0, self.task)
+
+python2.PYTHON2_DETECTORS["fake"] = ("__main__", "FakeDetector")
+python2.main()
+"""
+
+
+
+class Python2DetectorTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    fakePython = os.path.join(self.tmpDir, "python")
+    with open(fakePython, "w") as f:
+      f.write(FAKE_PYTHON % sys.executable)
+    os.chmod(fakePython, os.stat(fakePython).st_mode | stat.S_IXUSR)
+
+    patches = [
+      mock.patch.object(python2, "Python2Worker",
+                        partial(Python2Worker, python=fakePython)),
+      mock.patch.dict(python2.PYTHON2_DETECTORS,
+                      {"fake": ("__main__", "FakeDetector")}),
+      mock.patch.object(python2, "_worker", None),
+      mock.patch.object(python2, "_workerPid", None)]
+    for patch in patches:
+      patch.start()
+      self.addCleanup(patch.stop)
+
+
+  def tearDown(self):
+    if python2._worker is not None:
+      python2._worker.close()
+    shutil.rmtree(self.tmpDir)
+
+
+  def _run(self, values):
+    dataPath = os.path.join(self.tmpDir, "data", "category", "file.csv")
+    createPath(dataPath)
+    pandas.DataFrame({
+      "timestamp": pandas.date_range("2014-04-01", periods=len(values),
+                                     freq="5min"),
+      "value": values}).to_csv(dataPath, index=False)
+    dataSet = DataFile(dataPath)
+
+    detector = Python2Detector("fake", dataSet, 0.15)
+    detector.setTask("fake", os.path.join("category", "file.csv"))
+    detector.initialize()
+    return dataSet, detector.run()
+
+
+  def testRunDetector(self):
+    dataSet, results = self._run([1.0, 2.0, 3.0])
+
+    self.assertEqual(list(results.columns),
+                     ["timestamp", "value", "anomaly_score", "task"])
+    self.assertEqual(results["anomaly_score"].tolist(), [0.1, 0.2, 0.3])
+    # The worker's detector runs on the data file, with the task of the proxy
+    self.assertEqual(results["task"].iloc[0],
+                     "|".join([dataSet.srcPath, "file.csv", "fake",
+                               os.path.join("category", "file.csv")]))
+
+
+  def testRestartAfterFailure(self):
+    self._run([1.0])
+    worker = python2.getWorker()
+
+    with self.assertRaises(RuntimeError):
+      self._run([1.0, -1.0])
+    self.assertIsNotNone(worker.process.poll())
+
+    # The next file gets a new worker
+    _, results = self._run([2.0])
+    self.assertIsNot(python2.getWorker(), worker)
+    self.assertEqual(results["anomaly_score"].tolist(), [0.2])
+
+    # So does the next file after a worker died between files
+    worker = python2.getWorker()
+    worker.kill()
+    _, results = self._run([3.0])
+    self.assertIsNot(python2.getWorker(), worker)
+    self.assertEqual(results["anomaly_score"].tolist(), [0.3])
+
+
+if __name__ == '__main__':
+  unittest.main()
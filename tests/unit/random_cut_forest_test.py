@@ -0,0 +1,101 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import unittest
+
+import numpy
+
+from nab.detectors.random_cut_forest.forest import RandomCutForest
+
+
+
+class RandomCutForestTest(unittest.TestCase):
+
+
+  def setUp(self):
+    rng = numpy.random.RandomState(0)
+    # Rounded so that the sample holds copies of the same point
+    self.points = numpy.round(rng.normal(size=(2000, 2)), 1)
+    self.points[1500] = [8.0, -8.0]
+
+
+  def _newForest(self):
+    return RandomCutForest(numberOfTrees=10, sampleSize=64, timeDecay=500,
+                           dimensions=2, seed=7)
+
+
+  def _checkNode(self, tree, node):
+    """Checks the subtree of node, returns its (mass, minValues, maxValues)."""
+    d = tree.dimensions
+    minValues = tree.minValues[node * d:node * d + d]
+    maxValues = tree.maxValues[node * d:node * d + d]
+    if tree.left[node] == -1:
+      self.assertEqual(minValues, maxValues)
+      return tree.mass[node], minValues, maxValues
+
+    left, right = tree.left[node], tree.right[node]
+    self.assertEqual(tree.parent[left], node)
+    self.assertEqual(tree.parent[right], node)
+    leftMass, leftMin, leftMax = self._checkNode(tree, left)
+    rightMass, rightMin, rightMax = self._checkNode(tree, right)
+
+    self.assertEqual(tree.mass[node], leftMass + rightMass)
+    self.assertEqual(minValues, [min(a, b) for a, b in zip(leftMin, rightMin)])
+    self.assertEqual(maxValues, [max(a, b) for a, b in zip(leftMax, rightMax)])
+    dimension = tree.cutDimension[node]
+    self.assertTrue(leftMax[dimension] <= tree.cutValue[node] <
+                    rightMin[dimension])
+    return tree.mass[node], minValues, maxValues
+
+
+  def testTreesHoldTheirSample(self):
+    """Masses, bounding boxes and cuts of the trees stay consistent while
+    points are inserted and evicted."""
+    forest = self._newForest()
+    forest.process(self.points)
+
+    for tree in forest.trees:
+      mass, _, _ = self._checkNode(tree, tree.root)
+      self.assertEqual(mass, 64)
+      self.assertEqual(len(tree.sample), 64)
+      self.assertEqual(sorted(tree.leaves), sorted(s for _, s in tree.sample))
+
+
+  def testBatchSizeDoesNotChangeScores(self):
+    scores = self._newForest().process(self.points)
+
+    forest = self._newForest()
+    batchScores = [forest.process(self.points[i:i + 37])
+                   for i in range(0, 999, 37)]
+    batchScores.extend(forest.update(p) for p in self.points[999:])
+
+    numpy.testing.assert_array_equal(numpy.hstack(batchScores), scores)
+
+
+  def testOutlierHasHighestScore(self):
+    scores = self._newForest().process(self.points)
+
+    self.assertEqual(numpy.argmax(scores[100:]) + 100, 1500)
+    self.assertLess(numpy.median(scores), 1.5)
+    self.assertLessEqual(scores.max(), numpy.log2(65))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,97 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import os
+import unittest
+
+import numpy
+
+from nab.corpus import Corpus
+from nab.detectors.random.random_detector import RandomDetector
+from nab.detectors.random_cut_forest.random_cut_forest_detector import (
+  RandomCutForestDetector)
+from nab.util import recur
+
+
+
+class RandomStreamsTest(unittest.TestCase):
+  """Stochastic detectors draw from streams derived from their seed, their
+  name and the data file, independent of the other tasks of the worker."""
+
+
+  @classmethod
+  def setUpClass(cls):
+    root = recur(os.path.dirname, os.path.realpath(__file__), 3)
+    cls.corpus = Corpus(os.path.join(root, "tests", "test_data"))
+
+
+  def _runTasks(self, detectorClass, detectorName, relativePaths):
+    scores = {}
+    for relativePath in relativePaths:
+      detector = detectorClass(dataSet=self.corpus.dataFiles[relativePath],
+                               probationaryPercent=0.15)
+      detector.setTask(detectorName, relativePath)
+      detector.initialize()
+      scores[relativePath] = detector.run()["anomaly_score"].values
+    return scores
+
+
+  def testIndependentOfOrder(self):
+    relativePaths = sorted(self.corpus.dataFiles.keys())
+    for detectorClass in (RandomDetector, RandomCutForestDetector):
+      inOrder = self._runTasks(detectorClass, "detector", relativePaths)
+      reversedOrder = self._runTasks(detectorClass, "detector",
+                                     relativePaths[::-1])
+      for relativePath in relativePaths:
+        numpy.testing.assert_array_equal(inOrder[relativePath],
+                                         reversedOrder[relativePath])
+
+
+  def testStreamsOfTasksDiffer(self):
+    relativePaths = sorted(self.corpus.dataFiles.keys())
+    dataSet = self.corpus.dataFiles[relativePaths[0]]
+    detector = RandomDetector(dataSet=dataSet, probationaryPercent=0.15)
+
+    draws = set()
+    for detectorName in ("random", "otherRandom"):
+      for relativePath in relativePaths:
+        detector.setTask(detectorName, relativePath)
+        draws.add(detector.getRandomGenerator(42).random())
+      detector.setTask(detectorName, relativePaths[0])
+      draws.add(detector.getRandomGenerator(7).random())
+    self.assertEqual(len(draws), 2 * (len(relativePaths) + 1))
+
+
+  def testIndependentOfPathSeparator(self):
+    dataSet = self.corpus.dataFiles["realAWSCloudwatch/"
+                                    "ec2_cpu_utilization_5f5533.csv"]
+    detector = RandomDetector(dataSet=dataSet, probationaryPercent=0.15)
+
+    detector.setTask("random", "realAWSCloudwatch/"
+                               "ec2_cpu_utilization_5f5533.csv")
+    expected = detector.getSeedSequence(42).generate_state(4)
+    detector.setTask("random", os.path.join("realAWSCloudwatch",
+                                            "ec2_cpu_utilization_5f5533.csv"))
+    numpy.testing.assert_array_equal(
+      detector.getSeedSequence(42).generate_state(4), expected)
+
+
+if __name__ == '__main__':
+  unittest.main()
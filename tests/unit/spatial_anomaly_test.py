@@ -0,0 +1,82 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import unittest
+
+import numpy
+import pandas
+
+from nab.detectors.spatial_anomaly import (setSpatialAnomalies,
+                                           spatialAnomalies,
+                                           SPATIAL_TOLERANCE)
+
+
+
+def streamingSpatialAnomalies(values):
+  """Record by record tracking of the range of values, as the detectors did."""
+  minVal = maxVal = None
+  anomalies = []
+  for value in values:
+    spatialAnomaly = False
+    if minVal != maxVal:
+      tolerance = (maxVal - minVal) * SPATIAL_TOLERANCE
+      if value > maxVal + tolerance or value < minVal - tolerance:
+        spatialAnomaly = True
+    if maxVal is None or value > maxVal:
+      maxVal = value
+    if minVal is None or value < minVal:
+      minVal = value
+    anomalies.append(spatialAnomaly)
+  return anomalies
+
+
+
+class SpatialAnomalyTest(unittest.TestCase):
+
+
+  def testMatchesStreamingRange(self):
+    rng = numpy.random.RandomState(0)
+    for values in (rng.normal(size=500).cumsum(),
+                   rng.randint(0, 5, size=500),
+                   numpy.array([3.0, 3.0, 3.0, 10.0, 3.1, 2.0, 2.0])):
+      numpy.testing.assert_array_equal(spatialAnomalies(values),
+                                       streamingSpatialAnomalies(values))
+
+
+  def testConstantStartAndTolerance(self):
+    # No anomaly while all the previous values are equal, then values within
+    # 5% of the range outside of it are not anomalies.
+    values = [1.0, 1.0, 100.0, 0.0, 105.0, 110.5, -6.0]
+    self.assertEqual(spatialAnomalies(values).tolist(),
+                     [False, False, False, False, False, True, True])
+    self.assertEqual(spatialAnomalies([]).tolist(), [])
+
+
+  def testSetSpatialAnomalies(self):
+    results = pandas.DataFrame({"value": [1.0, 2.0, 5.0, 1.5],
+                                "anomaly_score": [0.1, 0.2, 0.3, 0.4]})
+
+    setSpatialAnomalies(results)
+
+    self.assertEqual(results["anomaly_score"].tolist(), [0.1, 0.2, 1.0, 0.4])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,120 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import filecmp
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from nab.corpus import Corpus
+from nab.labeler import CorpusLabel
+from nab.synthetic import (ANOMALY_TYPES,
+                           TIMESTAMP_FORMAT,
+                           anomalyWindows,
+                           generateCorpus,
+                           generateDataFile,
+                           writeCsv)
+from nab.util import getProbationPeriod
+
+
+
+class SyntheticTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+
+
+  def tearDown(self):
+    shutil.rmtree(self.root)
+
+
+  def testDataFile(self):
+    for anomalyType in ANOMALY_TYPES:
+      data, anomalies, windows = generateDataFile(
+        10000, 3, anomalyTypes=[anomalyType], seed=1)
+      self.assertEqual(len(data), 10000)
+      self.assertEqual(len(anomalies), 3)
+      self.assertEqual(len(windows), 3)
+
+      probationaryPeriod = getProbationPeriod(0.15, 10000)
+      previousLast = probationaryPeriod
+      for anomaly, (first, last) in zip(anomalies, windows):
+        self.assertTrue(previousLast < first <= anomaly <= last)
+        self.assertEqual(last - first, 332)
+        previousLast = last
+
+    same, _, _ = generateDataFile(10000, 3, anomalyTypes=[anomalyType], seed=1)
+    numpy.testing.assert_array_equal(same["value"], data["value"])
+
+
+  def testSpike(self):
+    data, anomalies, _ = generateDataFile(5000, 1, anomalyTypes=["spike"])
+    values = data["value"].values
+    jumps = numpy.abs(numpy.diff(values))
+    self.assertEqual(jumps.argmax(), anomalies[0] - 1)
+
+
+  def testAnomalyWindows(self):
+    # Like LabelCombiner, the first window is dropped if it overlaps the
+    # probationary period and overlapping windows are merged
+    self.assertEqual(anomalyWindows(1000, [100, 500, 520, 900]),
+                     [[488, 532], [888, 912]])
+    self.assertEqual(anomalyWindows(1000, []), [])
+
+
+  def testWriteCsv(self):
+    data, _, _ = generateDataFile(500, 1)
+    writeCsv(os.path.join(self.root, "fast.csv"), data)
+    data.to_csv(os.path.join(self.root, "pandas.csv"), index=False,
+                date_format=TIMESTAMP_FORMAT, float_format="%.6f")
+    self.assertTrue(filecmp.cmp(os.path.join(self.root, "fast.csv"),
+                                os.path.join(self.root, "pandas.csv"),
+                                shallow=False))
+
+
+  def testCorpus(self):
+    corpora = []
+    for numCPUs in (1, 2):
+      outputDir = os.path.join(self.root, str(numCPUs))
+      dataDir, windowsPath = generateCorpus(
+        outputDir, 6, lengths=(1000, 3000), anomalies=(0, 3),
+        intervals=("5min", "1h"), numCPUs=numCPUs)
+
+      corpus = Corpus(dataDir)
+      corpusLabel = CorpusLabel(windowsPath, corpus)
+      self.assertEqual(corpus.numDataFiles, 6)
+      self.assertEqual(sorted(corpusLabel.labels), sorted(corpus.dataFiles))
+      corpora.append((dataDir, windowsPath))
+
+    # The corpus does not depend on the number of processes
+    (dataDir1, windowsPath1), (dataDir2, windowsPath2) = corpora
+    self.assertTrue(filecmp.cmp(windowsPath1, windowsPath2, shallow=False))
+    for relativePath in Corpus(dataDir1).dataFiles:
+      self.assertTrue(filecmp.cmp(os.path.join(dataDir1, relativePath),
+                                  os.path.join(dataDir2, relativePath),
+                                  shallow=False))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -19,9 +19,10 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
+import numpy
 import unittest
 
-from nab.util import getProbationPeriod
+from nab.util import getProbationPeriod, minMaxDownsample, windowDetections
 
 
 
@@ -38,6 +39,34 @@ class CorpusLabelTest(unittest.TestCase):
         "got {}.".format(idx, probationIndex))
 
 
+  def testWindowDetections(self):
+    intervals = numpy.array([[2, 5], [6, 8], [9, 12]])
+    truePositives, falsePositives = windowDetections([1, 3, 5, 9, 12, 14],
+                                                     intervals)
+
+    self.assertEqual(truePositives.tolist(), [3, 9])
+    self.assertEqual(falsePositives.tolist(), [1, 14])
+
+    truePositives, falsePositives = windowDetections([1, 3], [])
+    self.assertEqual(truePositives.tolist(), [])
+    self.assertEqual(falsePositives.tolist(), [1, 3])
+
+
+  def testMinMaxDownsample(self):
+    values = numpy.sin(numpy.arange(10000) / 100.0)
+    values[4321] = 5.0
+    values[1234] = numpy.nan
+
+    rows = minMaxDownsample(values, 100)
+
+    self.assertLessEqual(len(rows), 200)
+    self.assertIn(4321, rows)
+    self.assertIn(numpy.nanargmin(values), rows)
+    self.assertTrue((numpy.diff(rows) > 0).all())
+    self.assertEqual(minMaxDownsample(values[:150], 100).tolist(),
+                     list(range(150)))
+
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,71 @@
+# ----------------------------------------------------------------------
+# Copyright (C) 2014, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import os
+import unittest
+
+import pandas
+
+from nab.corpus import Corpus
+from nab.detectors.base import AnomalyDetector
+from nab.detectors.null.null_detector import NullDetector
+from nab.detectors.random.random_detector import RandomDetector
+from nab.detectors.threshold.threshold_detector import ThresholdDetector
+from nab.util import recur
+
+
+
+class VectorizedDetectorsTest(unittest.TestCase):
+  """Detectors computing whole files at once give the results of the per
+  record AnomalyDetector.run()."""
+
+
+  @classmethod
+  def setUpClass(cls):
+    root = recur(os.path.dirname, os.path.realpath(__file__), 3)
+    cls.corpus = Corpus(os.path.join(root, "tests", "test_data"))
+
+
+  def _checkDetector(self, detectorClass):
+    for dataSet in self.corpus.dataFiles.values():
+      vectorized = detectorClass(dataSet=dataSet, probationaryPercent=0.15)
+      vectorized.initialize()
+      perRecord = detectorClass(dataSet=dataSet, probationaryPercent=0.15)
+      perRecord.initialize()
+
+      pandas.testing.assert_frame_equal(vectorized.run(),
+                                        AnomalyDetector.run(perRecord),
+                                        check_exact=True)
+
+
+  def testNullDetector(self):
+    self._checkDetector(NullDetector)
+
+
+  def testRandomDetector(self):
+    self._checkDetector(RandomDetector)
+
+
+  def testThresholdDetector(self):
+    self._checkDetector(ThresholdDetector)
+
+
+if __name__ == '__main__':
+  unittest.main()